@@ -0,0 +1,72 @@
+"""Measures the cost of a token cache hit in generate_authentication_token and how it scales with threads.
+
+Run from the repository root:
+
+    python -m benchmark.cache_hit --keys 1000 --threads 1,2,4,8,16,32,64
+
+The tokens are put in the cache up front, no CAM request is sent. For each thread count, the report gives the wall time
+per call across all threads (ns/op) and the number of calls per second.
+"""
+import argparse
+import threading
+import time
+
+from tencentcloud.common import credential
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+def make_requests(count):
+    cred = credential.Credential("AKIDbenchmark", "benchmarkSecretKey")
+    requests = [GenerateAuthenticationTokenRequest("ap-guangzhou", f"cdb-{i}", "bench", cred) for i in range(count)]
+    for request in requests:
+        Signer.token_cache.set_auth_token(request.get_auth_key(), Token("password", 2 ** 62, 60 * 60 * 1000))
+    return requests
+
+
+def run(requests, threads, calls_per_thread):
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(offset):
+        generate = DBAuthentication.generate_authentication_token
+        count = len(requests)
+        barrier.wait()
+        for i in range(calls_per_thread):
+            generate(requests[(offset + i) % count])
+        barrier.wait()
+
+    workers = [threading.Thread(target=worker, args=(n * 7919,)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter_ns()
+    barrier.wait()
+    elapsed = time.perf_counter_ns() - start
+    for thread in workers:
+        thread.join()
+    return elapsed / (threads * calls_per_thread)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=1000, help="number of cached keys")
+    parser.add_argument("--threads", default="1,2,4,8,16,32,64", help="comma separated thread counts")
+    parser.add_argument("--calls", type=int, default=200000, help="calls per thread count, split between threads")
+    args = parser.parse_args()
+
+    requests = make_requests(args.keys)
+    # Warm up the memoized auth keys and the interpreter
+    run(requests, 1, min(args.calls, 10000))
+
+    print(f"{'threads':>8} {'ns/op':>10} {'calls/s':>12}")
+    for threads in [int(value) for value in args.threads.split(",")]:
+        ns_per_op = run(requests, threads, max(1, args.calls // threads))
+        print(f"{threads:>8} {ns_per_op:>10.0f} {1e9 / ns_per_op:>12.0f}")
+    Signer.timer_manager.shutdown()
+
+
+if __name__ == '__main__':
+    main()
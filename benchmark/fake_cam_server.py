@@ -0,0 +1,163 @@
+"""A local fake of the CAM BuildDataFlowAuthToken API for benchmarks and end-to-end tests.
+
+The server answers the TencentCloud API v3 JSON protocol over plain HTTP. Tokens are encrypted in the AuthTokenParser
+format with the key derived from the instance, region and user name. The password of a key changes at every rotation,
+each rotation_interval milliseconds.
+"""
+import json
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
+
+import dbauth.proto.auth_token_info_pb2 as proto
+from dbauth.internal.auth_token_parser import AuthTokenParser
+
+
+class FakeCamServer:
+    """FakeCamServer serves BuildDataFlowAuthToken on 127.0.0.1 with configurable latency, errors and rotations."""
+    # The default time in milliseconds between two rotations of a password
+    DEFAULT_ROTATION_INTERVAL = 60 * 60 * 1000
+
+    def __init__(self, latency=0, error_rate=0.0, error_code="InternalError",
+                 rotation_interval=DEFAULT_ROTATION_INTERVAL):
+        # The time in milliseconds to wait before answering
+        self.latency = latency
+        # The probability of answering with error_code
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.rotation_interval = rotation_interval
+        # Whether every request fails, as during an outage
+        self.outage = False
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+        # The open client connections, closed when the server stops
+        self.connections = set()
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # The headers and the body are written separately, do not let them wait for a delayed ACK
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with fake.lock:
+                    fake.connections.add(self.connection)
+
+            def finish(self):
+                with fake.lock:
+                    fake.connections.discard(self.connection)
+                super().finish()
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, response = fake.handle(self.headers.get("X-TC-Action"), json.loads(body or b"{}"))
+                data = json.dumps({"Response": response}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="fake-cam-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        with self.lock:
+            connections, self.connections = self.connections, set()
+        # End the keep-alive connections, their handler threads would wait for the clients to close them
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    @property
+    def endpoint(self):
+        return f"127.0.0.1:{self.server.server_address[1]}"
+
+    def client_profile(self, req_timeout=5):
+        """Returns a client profile sending the requests to this server."""
+        return ClientProfile(httpProfile=HttpProfile(protocol="http", endpoint=self.endpoint, reqTimeout=req_timeout))
+
+    def handle(self, action, params):
+        """Returns the HTTP status and the response of a request."""
+        request_id = str(uuid.uuid4())
+        if self.latency:
+            time.sleep(self.latency / 1000)
+        if action != "BuildDataFlowAuthToken":
+            return 200, self.error("InvalidAction", f"Unsupported action {action}", request_id)
+
+        key = (params.get("ResourceId"), params.get("ResourceRegion"), params.get("ResourceAccount"))
+        with self.lock:
+            self.calls[key] = self.calls.get(key, 0) + 1
+        if self.outage or random.random() < self.error_rate:
+            return 200, self.error(self.error_code, "The fake server failed the request", request_id)
+
+        now = int(time.time() * 1000)
+        rotation = now // self.rotation_interval
+        password = self.password(*key, rotation)
+        return 200, {
+            "Credentials": {
+                "Token": self.encrypt_token(*key, password),
+                "CurrentTime": now,
+                "NextRotationTime": (rotation + 1) * self.rotation_interval,
+            },
+            "RequestId": request_id,
+        }
+
+    @staticmethod
+    def password(instance_id, region, user_name, rotation):
+        return f"{instance_id}-{region}-{user_name}-{rotation}"
+
+    def current_password(self, instance_id, region, user_name):
+        return self.password(instance_id, region, user_name, int(time.time() * 1000) // self.rotation_interval)
+
+    @staticmethod
+    def encrypt_token(instance_id, region, user_name, password):
+        """Encrypts the password as CAM does: a 4-byte header then an AuthTokenInfo message."""
+        info = proto.AuthTokenInfo(instanceId=instance_id, region=region, username=user_name, password=password,
+                                   createTime=int(time.time()), randNum=random.getrandbits(32))
+        plaintext = struct.pack(">I", 0) + info.SerializeToString()
+        key, iv = AuthTokenParser._derive_key(instance_id, region, user_name)
+        return AuthTokenParser._sha256(plaintext) + AuthTokenParser._encrypt(plaintext, key, iv)
+
+    @staticmethod
+    def error(code, message, request_id):
+        return {"Error": {"Code": code, "Message": message}, "RequestId": request_id}
+
+    def call_count(self, key=None):
+        """Returns the number of requests of a (instance, region, user) key, or of all keys."""
+        with self.lock:
+            return self.calls.get(key, 0) if key else sum(self.calls.values())
+
+    def reset(self):
+        with self.lock:
+            self.calls.clear()
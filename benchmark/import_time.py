@@ -0,0 +1,56 @@
+"""Measures the import time of a module with python -X importtime and lists the modules it loads.
+
+Run from the repository root:
+
+    python -m benchmark.import_time --module dbauth.db_authentication --top 15
+
+Each measurement runs in a new interpreter. The report gives the cumulative import time of the module in microseconds,
+the number of modules it loaded and the slowest of them.
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Modules loaded only when a token is requested from CAM or decrypted
+LAZY_MODULES = ("tencentcloud.cam.v20190116.cam_client", "tencentcloud.common.abstract_client",
+                "tencentcloud.common.credential", "requests", "Crypto", "google.protobuf", "asyncio")
+
+
+def measure(module, code=""):
+    """Imports module in a new interpreter, runs code, and returns the import times and the loaded modules."""
+    script = f"import {module}\n{code}\nimport sys\nprint('\\n' + __import__('json').dumps(sorted(sys.modules)))"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", script], capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return {"module": module, "cumulative_us": times.get(module), "times": times,
+            "modules": json.loads(result.stdout.splitlines()[-1])}
+
+
+def loaded(modules, names=LAZY_MODULES):
+    """Returns the names, or submodules of the names, found in modules."""
+    return sorted({name for name in names for module in modules if module == name or module.startswith(name + ".")})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="dbauth.db_authentication")
+    parser.add_argument("--top", type=int, default=15, help="number of the slowest imports to report")
+    args = parser.parse_args()
+
+    result = measure(args.module)
+    slowest = sorted(result["times"].items(), key=lambda item: item[1], reverse=True)[:args.top]
+    print(json.dumps({"module": args.module, "cumulative_us": result["cumulative_us"],
+                      "modules": len(result["modules"]), "lazy_modules_loaded": loaded(result["modules"]),
+                      "slowest_us": dict(slowest)}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
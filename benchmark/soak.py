@@ -0,0 +1,191 @@
+"""Runs the SDK against a local fake CAM server and reports latency, CAM load, resources and outage behavior as JSON.
+
+Run from the repository root:
+
+    python -m benchmark.soak --keys 200 --duration 60 --output soak.json
+
+The scenarios are:
+
+- latency: the latency percentiles of cache misses and cache hits of generate_authentication_token
+- refresh: the CAM requests per key per hour while the tokens are kept fresh in the background
+- resources: the thread count and the RSS growth after caching many keys
+- outage: the calls served and failed while CAM is down, and the time to get fresh tokens once it is back
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import threading
+import time
+
+from tencentcloud.common import credential
+
+from benchmark.fake_cam_server import FakeCamServer
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.circuit_breaker import CircuitBreakerRegistry
+from dbauth.internal.negative_cache import NegativeCache
+from dbauth.internal.signer import Signer
+from dbauth.internal.single_flight import SingleFlight
+from dbauth.internal.token_cache import TokenCache
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+def percentiles(samples):
+    """Returns the percentiles of latency samples in nanoseconds, in microseconds."""
+    if not samples:
+        return {}
+    samples = sorted(samples)
+
+    def at(fraction):
+        return round(samples[min(len(samples) - 1, int(len(samples) * fraction))] / 1000, 1)
+
+    return {"count": len(samples), "p50_us": at(0.5), "p90_us": at(0.9), "p99_us": at(0.99), "p999_us": at(0.999),
+            "max_us": round(samples[-1] / 1000, 1)}
+
+
+def rss_bytes():
+    """Returns the resident set size of the process."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # The peak RSS, in kilobytes on Linux and in bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def reset_sdk():
+    """Drops the tokens, timers and breaker states of the previous scenario."""
+    Signer.timer_manager.shutdown()
+    Signer.token_cache = TokenCache()
+    Signer.single_flight = SingleFlight()
+    Signer.circuit_breakers = CircuitBreakerRegistry()
+    Signer.negative_cache = NegativeCache()
+    Signer.client_pool.invalidate()
+
+
+def make_requests(server, count, prefix):
+    cred = credential.Credential("AKIDbenchmark", "benchmarkSecretKey")
+    profile = server.client_profile()
+    return [GenerateAuthenticationTokenRequest("ap-guangzhou", f"{prefix}-{i}", "bench", cred, profile)
+            for i in range(count)]
+
+
+def timed_generate(request):
+    start = time.perf_counter_ns()
+    DBAuthentication.generate_authentication_token(request)
+    return time.perf_counter_ns() - start
+
+
+def run_latency(server, keys, hits_per_key):
+    reset_sdk()
+    requests = make_requests(server, keys, "latency")
+    misses = [timed_generate(request) for request in requests]
+    hits = [timed_generate(request) for _ in range(hits_per_key) for request in requests]
+    return {"keys": keys, "miss": percentiles(misses), "hit": percentiles(hits)}
+
+
+def run_refresh(server, keys, duration):
+    reset_sdk()
+    requests = make_requests(server, keys, "refresh")
+    server.reset()
+    start = time.monotonic()
+    while time.monotonic() - start < duration:
+        # Keep the keys requested so that they are not evicted as idle
+        for request in requests:
+            DBAuthentication.generate_authentication_token(request)
+        time.sleep(0.5)
+    elapsed = time.monotonic() - start
+    calls = server.call_count()
+    return {"keys": keys, "duration_s": round(elapsed, 1), "rotation_interval_ms": server.rotation_interval,
+            "cam_calls": calls, "cam_calls_per_key_per_hour": round(calls / keys * 3600 / elapsed, 1)}
+
+
+def sdk_threads():
+    """Returns the number of threads started by the SDK, the threads of the fake server are not counted."""
+    return sum(1 for thread in threading.enumerate() if thread.name.startswith("dbauth"))
+
+
+def run_resources(server, keys):
+    reset_sdk()
+    requests = make_requests(server, keys, "resources")
+    threads_before, rss_before = sdk_threads(), rss_bytes()
+    for request in requests:
+        DBAuthentication.generate_authentication_token(request)
+    threads_after, rss_after = sdk_threads(), rss_bytes()
+    return {"keys": keys, "sdk_threads_before": threads_before, "sdk_threads_after": threads_after,
+            "rss_before_bytes": rss_before, "rss_after_bytes": rss_after,
+            "rss_growth_per_key_bytes": round((rss_after - rss_before) / keys)}
+
+
+def run_outage(server, keys, duration):
+    reset_sdk()
+    requests = make_requests(server, keys, "outage")
+    for request in requests:
+        DBAuthentication.generate_authentication_token(request)
+
+    server.outage = True
+    server.reset()
+    served, failed = 0, 0
+    start = time.monotonic()
+    try:
+        while time.monotonic() - start < duration:
+            for request in requests:
+                try:
+                    DBAuthentication.generate_authentication_token(request)
+                    served += 1
+                except Exception:
+                    failed += 1
+            time.sleep(0.1)
+    finally:
+        server.outage = False
+    cam_calls = server.call_count()
+
+    # Wait until every key serves the current password again
+    recovery_start = time.monotonic()
+    stale = set(range(keys))
+    while stale and time.monotonic() - recovery_start < duration + 60:
+        for i in list(stale):
+            request = requests[i]
+            password = DBAuthentication.generate_authentication_token(request)
+            if password == server.current_password(request.instance_id, request.region, request.user_name):
+                stale.discard(i)
+        time.sleep(0.1)
+    return {"keys": keys, "outage_s": duration, "calls_served": served, "calls_failed": failed,
+            "cam_calls_during_outage": cam_calls, "recovered_keys": keys - len(stale),
+            "recovery_ms": round((time.monotonic() - recovery_start) * 1000)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--keys", type=int, default=200, help="number of keys per scenario")
+    parser.add_argument("--hits", type=int, default=50, help="cache hits per key in the latency scenario")
+    parser.add_argument("--duration", type=float, default=60, help="seconds of the refresh and outage scenarios")
+    parser.add_argument("--rotation-interval", type=int, default=20 * 1000, help="password rotation interval in ms")
+    parser.add_argument("--latency", type=int, default=5, help="latency of the fake CAM server in ms")
+    parser.add_argument("--output", help="file to write the JSON report to, stdout by default")
+    parser.add_argument("--verbose", action="store_true", help="log the errors of the SDK, expected during the outage")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR if args.verbose else logging.CRITICAL)
+
+    report = {"python": platform.python_version(), "platform": platform.platform(), "started_at": int(time.time())}
+    with FakeCamServer(latency=args.latency, rotation_interval=args.rotation_interval) as server:
+        report["latency"] = run_latency(server, args.keys, args.hits)
+        report["refresh"] = run_refresh(server, args.keys, args.duration)
+        report["resources"] = run_resources(server, args.keys * 10)
+        report["outage"] = run_outage(server, args.keys, args.duration)
+    reset_sdk()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
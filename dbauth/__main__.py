@@ -0,0 +1,54 @@
+"""Runs a token broker serving the authentication tokens of the host over a Unix domain socket.
+
+    TENCENTCLOUD_SECRET_ID=... TENCENTCLOUD_SECRET_KEY=... python -m dbauth --socket /run/dbauth/broker.sock
+
+Processes get the tokens from the broker with DBAuthentication.enable_broker_client.
+"""
+import argparse
+import logging
+import os
+import signal
+
+from tencentcloud.common import credential
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
+
+from dbauth.internal.broker import TokenBroker
+
+DEFAULT_SOCKET = f"/tmp/dbauth-broker-{os.getuid()}.sock" if hasattr(os, "getuid") else "dbauth-broker.sock"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dbauth", description="Serves DB authentication tokens over a "
+                                                                          "Unix domain socket.")
+    parser.add_argument("--socket", default=os.environ.get("DBAUTH_BROKER_SOCKET", DEFAULT_SOCKET),
+                        help="path of the Unix domain socket")
+    parser.add_argument("--endpoint", help="CAM endpoint, cam.tencentcloudapi.com by default")
+    parser.add_argument("--protocol", default="https", help="protocol of the CAM endpoint")
+    parser.add_argument("--log-level", default="INFO", help="logging level")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(),
+                        format="[%(asctime)s] - [%(threadName)s] - %(name)s %(levelname)s - %(message)s")
+    secret_id = os.environ.get("TENCENTCLOUD_SECRET_ID")
+    secret_key = os.environ.get("TENCENTCLOUD_SECRET_KEY")
+    if not secret_id or not secret_key:
+        parser.error("TENCENTCLOUD_SECRET_ID and TENCENTCLOUD_SECRET_KEY must be set")
+    cred = credential.Credential(secret_id, secret_key, os.environ.get("TENCENTCLOUD_SESSION_TOKEN"))
+
+    client_profile = None
+    if args.endpoint:
+        client_profile = ClientProfile(httpProfile=HttpProfile(protocol=args.protocol, endpoint=args.endpoint,
+                                                               reqTimeout=30, keepAlive=True))
+
+    broker = TokenBroker(args.socket, cred, client_profile)
+    # Stop on SIGTERM like on Ctrl-C, removing the socket
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        broker.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
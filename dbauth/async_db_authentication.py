@@ -0,0 +1,34 @@
+import logging
+
+from .internal.async_token_manager import AsyncTokenManager
+from .internal.fork_handler import ForkHandler
+from .model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+class AsyncDBAuthentication:
+    """AsyncDBAuthentication provides the methods of DBAuthentication for asyncio applications.
+
+    Tokens are cached and refreshed per event loop, CAM requests never block the event loop.
+    """
+    log = logging.getLogger(__name__)
+
+    @staticmethod
+    async def generate_authentication_token(token_request: GenerateAuthenticationTokenRequest, timeout=None) -> str:
+        """Generates an authentication token using the provided request.
+
+        timeout is the maximum time in milliseconds to wait for a token requested from CAM, as in DBAuthentication.
+        """
+        return await AsyncTokenManager.current().get_auth_token(token_request, timeout)
+
+    @staticmethod
+    def get_single_flight_stats() -> dict:
+        """Returns how many token builds were executed and how many callers were coalesced on the running loop."""
+        return AsyncTokenManager.current().stats()
+
+    @staticmethod
+    def shutdown():
+        """Cancels the scheduled token refreshes of the running event loop, must be called from the loop."""
+        AsyncTokenManager.current().shutdown()
+
+
+ForkHandler.register()
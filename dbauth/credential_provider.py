@@ -0,0 +1,101 @@
+import logging
+import threading
+import weakref
+from abc import ABC, abstractmethod
+
+from dbauth.internal.utils import Utils
+
+
+class CredentialProvider(ABC):
+    """CredentialProvider supplies the credential of token requests, resolved each time a token is requested from CAM.
+
+    Pass a provider in place of the credential of a GenerateAuthenticationTokenRequest. The tokens are cached under
+    the identity of the provider instead of the secret id, so a rotation of the credential does not make every cached
+    token miss at once: the tokens are refreshed in the background with the new credential. Implement get_credential
+    and give each provider an identity that stays the same across rotations, e.g. the role ARN.
+    """
+
+    # The providers created in the process, their locks are replaced in a forked child
+    instances = weakref.WeakSet()
+
+    def __init__(self, identity):
+        if not identity:
+            raise ValueError(f"Invalid identity: {identity}")
+        self.identity = identity
+        CredentialProvider.instances.add(self)
+
+    @abstractmethod
+    def get_credential(self):
+        """Returns the current credential, an object of tencentcloud.common.credential."""
+
+    def reset_after_fork(self):
+        """Replaces the locks inherited by a forked child process, where the threads holding them do not exist."""
+
+
+class SdkCredentialProvider(CredentialProvider):
+    """Supplies a credential object of the SDK.
+
+    The refreshing credentials of the SDK, e.g. STSAssumeRoleCredential, CVMRoleCredential or OIDCRoleArnCredential,
+    rotate their secret id themselves. Wrapping them keeps the tokens cached under the given identity.
+    """
+
+    def __init__(self, credential, identity=None):
+        super().__init__(identity or credential.secret_id)
+        self.credential = credential
+
+    def get_credential(self):
+        return self.credential
+
+
+class RefreshingCredentialProvider(CredentialProvider):
+    """Loads a credential with load and loads it again refresh_ahead milliseconds before it expires.
+
+    load returns a tuple (credential, expires_at), expires_at is a Unix timestamp in milliseconds, None if the
+    credential does not expire. If loading fails, the previous credential is used until it expires.
+    """
+    # The default time in milliseconds before the expiry of a credential at which it is loaded again
+    DEFAULT_REFRESH_AHEAD = 5 * 60 * 1000
+
+    def __init__(self, identity, load, refresh_ahead=DEFAULT_REFRESH_AHEAD):
+        super().__init__(identity)
+        if refresh_ahead < 0:
+            raise ValueError(f"Invalid refresh ahead: {refresh_ahead}")
+        self.load = load
+        self.refresh_ahead = refresh_ahead
+        # The current credential and its expiry time, a Unix timestamp in milliseconds
+        self.credential = None
+        self.expires_at = None
+        self.lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def get_credential(self):
+        if self.credential is not None and not self.needs_refresh(self.refresh_ahead):
+            return self.credential
+        with self.lock:
+            # Another thread may have loaded the credential while this one was waiting
+            if self.credential is not None and not self.needs_refresh(self.refresh_ahead):
+                return self.credential
+            try:
+                credential, expires_at = self.load()
+            except Exception as e:
+                if self.credential is not None and not self.needs_refresh(0):
+                    self.log.error(f"Failed to load the credential of {self.identity}, using the previous one",
+                                   exc_info=e)
+                    return self.credential
+                raise
+            self.log.info(f"Loaded the credential of {self.identity}")
+            self.credential, self.expires_at = credential, expires_at
+            return credential
+
+    def reset_after_fork(self):
+        # A load running in the parent when it forked never completes in the child
+        self.lock = threading.Lock()
+
+    def needs_refresh(self, refresh_ahead):
+        return self.expires_at is not None and self.expires_at - refresh_ahead <= Utils.get_wall_time_millis()
+
+    def invalidate(self):
+        """Forgets the credential, it is loaded again on the next request."""
+        with self.lock:
+            self.credential = None
+            self.expires_at = None
@@ -1,29 +1,77 @@
+import atexit
 import logging
+import os
 from dbauth.internal.utils import Utils
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+from .fallback_provider import FileFallbackProvider
+from .internal.broker import BrokerClient
+from .internal.constants import Constants
 from .internal.error_code_matcher import ErrorCodeMatcher
+from .internal.fork_handler import ForkHandler
+from .internal.shared_token_store import SharedTokenStore
 from .internal.signer import Signer
+from .internal.token_prefetcher import TokenPrefetcher
+from .internal.token_snapshot import TokenSnapshot
+from .metrics import Metrics
 from .model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
 
 
 class DBAuthentication:
     """DBAuthentication is a utility class that provides methods for generating authentication tokens."""
     log = logging.getLogger(__name__)
+    # The time in milliseconds before expiry from which a cached token is returned while it is refreshed in the
+    # background, 0 disables stale-while-revalidate
+    stale_while_revalidate = 0
+    # The time in milliseconds after expiry during which a cached token is still returned while it is refreshed in the
+    # background, callers block on a refresh once it has passed
+    hard_expiry_grace = 0
+    # The environment variable holding the path of the token snapshot enabled on import
+    TOKEN_SNAPSHOT_ENV = "DBAUTH_TOKEN_SNAPSHOT"
+    snapshot_exit_registered = False
+    # The client of the token broker asked before fetching a token in process, None to disable
+    broker_client = None
 
     @staticmethod
-    def generate_authentication_token(token_request: GenerateAuthenticationTokenRequest) -> str:
-        """Generates an authentication token using the provided request."""
-        # Create a new Signer with the provided token request.
-        signer = Signer(token_request)
-        # Get the authentication token from the cache.
-        cached_token = signer.get_auth_token_from_cache()
+    def generate_authentication_token(token_request: GenerateAuthenticationTokenRequest, timeout=None) -> str:
+        """Generates an authentication token using the provided request.
+
+        timeout is the maximum time in milliseconds to wait for a token requested from CAM, None to wait until the
+        request completes. When it passes, the cached token or the fallback password is returned, otherwise
+        TencentCloudSDKException is raised with the code Constants.TIMEOUT_ERROR. The request continues in the
+        background and caches its token.
+        """
+        broker_client = DBAuthentication.broker_client
+        if broker_client is not None:
+            # Ask the token broker of the host first, fetch in process if it is unavailable.
+            auth_token = broker_client.get_token(token_request)
+            if auth_token:
+                return auth_token
+        return DBAuthentication._generate_in_process(token_request, timeout)
+
+    @staticmethod
+    def _generate_in_process(token_request: GenerateAuthenticationTokenRequest, timeout=None) -> str:
+        """Generates the token in this process, bypassing the token broker."""
+        # Get the authentication token from the cache, a cache hit creates no Signer.
+        cached_token = Signer.token_cache.get_auth_token(token_request.get_auth_key())
         if cached_token:
-            if cached_token.get_expires() > Utils.get_current_time_millis():
+            now = Utils.get_current_time_millis()
+            if cached_token.get_expires() - DBAuthentication.stale_while_revalidate > now:
                 # If the token has not expired, return the token.
+                Metrics.collector.increment(Metrics.CACHE_HITS)
                 return cached_token.get_auth_token()
+        # Create a new Signer with the provided token request.
+        signer = Signer(token_request)
+        if cached_token and cached_token.get_expires() + DBAuthentication.hard_expiry_grace > now:
+            # If the token is stale but within the hard deadline, return it and refresh it in the background.
+            Metrics.collector.increment(Metrics.CACHE_STALE_HITS)
+            DBAuthentication._revalidate(signer)
+            return cached_token.get_auth_token()
+        Metrics.collector.increment(Metrics.CACHE_MISSES)
         try:
-            signer.build_auth_token()
-            return signer.get_auth_token_from_cache().get_auth_token()
+            # Only one caller per key builds the token, the others wait for its result.
+            if timeout is None:
+                return signer.build_auth_token_once().get_auth_token()
+            return signer.build_auth_token_within(timeout).get_auth_token()
         except TencentCloudSDKException as e:
             DBAuthentication.log.error("Error occurred while generating authentication token", exc_info=e)
             if cached_token:
@@ -31,4 +79,155 @@ class DBAuthentication:
                     raise e
                 else:
                     return cached_token.get_auth_token()
+            if e.code == Constants.TIMEOUT_ERROR:
+                # The build has not failed yet, it did not get to the fallback password
+                fallback_token = signer.token_cache.fallback(token_request)
+                if fallback_token:
+                    DBAuthentication.log.info("Using the fallback token, the deadline passed")
+                    return fallback_token.get_auth_token()
             raise e
+
+    @staticmethod
+    def refresh_authentication_token(token_request: GenerateAuthenticationTokenRequest) -> str:
+        """Requests a new authentication token even if the cached one has not expired, e.g. after the database
+        rejected it, and returns it."""
+        signer = Signer(token_request)
+        Metrics.collector.increment(Metrics.CACHE_MISSES)
+        return signer.build_auth_token_once(force=True).get_auth_token()
+
+    @staticmethod
+    def get_token_lifetime(token_request: GenerateAuthenticationTokenRequest):
+        """Returns the validity period in milliseconds of the cached token of the request, None if it is not cached or
+        was not issued by CAM."""
+        cached_token = Signer.token_cache.peek_auth_token(token_request.get_auth_key())
+        return cached_token.get_lifetime() if cached_token else None
+
+    @staticmethod
+    def prefetch_authentication_tokens(token_requests, max_concurrency=TokenPrefetcher.DEFAULT_MAX_CONCURRENCY) -> dict:
+        """Fetches the tokens of many requests in parallel, fills the cache and schedules their refreshes.
+
+        Returns a dict mapping each request to its TokenPrefetchResult.
+        """
+        return TokenPrefetcher.prefetch(token_requests, DBAuthentication.generate_authentication_token,
+                                        max_concurrency)
+
+    @staticmethod
+    def prefetch_authentication_tokens_from_file(path, credential, client_profile=None,
+                                                 max_concurrency=TokenPrefetcher.DEFAULT_MAX_CONCURRENCY) -> dict:
+        """Fetches the tokens of the requests listed in a JSON file, see TokenPrefetcher.load_requests."""
+        token_requests = TokenPrefetcher.load_requests(path, credential, client_profile)
+        return DBAuthentication.prefetch_authentication_tokens(token_requests, max_concurrency)
+
+    @staticmethod
+    def enable_shared_cache(path, lease_timeout=SharedTokenStore.DEFAULT_LEASE_TIMEOUT,
+                            wait_timeout=SharedTokenStore.DEFAULT_WAIT_TIMEOUT):
+        """Shares the tokens between the processes of the host through the SQLite database at path.
+
+        One process requests the token of a key from CAM, the others read it from the database.
+        """
+        DBAuthentication.disable_shared_cache()
+        Signer.shared_store = SharedTokenStore(path, lease_timeout, wait_timeout)
+
+    @staticmethod
+    def disable_shared_cache():
+        shared_store, Signer.shared_store = Signer.shared_store, None
+        if shared_store:
+            shared_store.close()
+
+    @staticmethod
+    def enable_token_snapshot(path, write_delay=TokenSnapshot.DEFAULT_WRITE_DELAY) -> int:
+        """Keeps the tokens in an encrypted file at path, written after refreshes and at exit, so that a restarted
+        process serves the unexpired tokens without requesting them again.
+
+        Returns the number of tokens loaded from the file. Also enabled on import when the DBAUTH_TOKEN_SNAPSHOT
+        environment variable holds a path.
+        """
+        DBAuthentication.disable_token_snapshot()
+        token_snapshot = TokenSnapshot(path, write_delay)
+        loaded = token_snapshot.load()
+        Signer.token_snapshot = token_snapshot
+        if not DBAuthentication.snapshot_exit_registered:
+            atexit.register(DBAuthentication._write_token_snapshot)
+            DBAuthentication.snapshot_exit_registered = True
+        return loaded
+
+    @staticmethod
+    def disable_token_snapshot():
+        """Writes the token snapshot a last time and stops keeping it."""
+        DBAuthentication._write_token_snapshot()
+        Signer.token_snapshot = None
+
+    @staticmethod
+    def _write_token_snapshot():
+        token_snapshot = Signer.token_snapshot
+        if token_snapshot is not None:
+            Signer.timer_manager.cancel_timer(TokenSnapshot.TIMER_KEY)
+            token_snapshot.write()
+
+    @staticmethod
+    def enable_broker_client(socket_path, timeout=BrokerClient.DEFAULT_TIMEOUT):
+        """Gets the tokens from the token broker listening on socket_path (python -m dbauth), the tokens are fetched
+        in process while the broker is unavailable."""
+        DBAuthentication.disable_broker_client()
+        DBAuthentication.broker_client = BrokerClient(socket_path, timeout)
+
+    @staticmethod
+    def disable_broker_client():
+        broker_client, DBAuthentication.broker_client = DBAuthentication.broker_client, None
+        if broker_client:
+            broker_client.close()
+
+    @staticmethod
+    def set_fallback_provider(provider):
+        """Installs the provider of the passwords used when no token can be requested, see dbauth.fallback_provider.
+
+        None restores the provider reading the .pwd files under the current working directory.
+        """
+        Signer.token_cache.fallback_provider = provider or FileFallbackProvider()
+
+    @staticmethod
+    def set_metrics_collector(collector):
+        """Installs the collector receiving the metrics of the SDK, see dbauth.metrics."""
+        Metrics.set_collector(collector)
+
+    @staticmethod
+    def get_single_flight_stats() -> dict:
+        """Returns how many token builds were executed and how many callers were coalesced into them."""
+        return Signer.single_flight.stats()
+
+    @staticmethod
+    def clear_negative_cache(token_request: GenerateAuthenticationTokenRequest = None):
+        """Forgets the cached terminal CAM error of the request, or of all requests if token_request is None.
+
+        Call it once the cause of the error (e.g. a missing permission) is fixed to request the token again
+        immediately.
+        """
+        Signer.negative_cache.clear(Signer(token_request).authKey if token_request else None)
+
+    @staticmethod
+    def subscribe(callback, token_request: GenerateAuthenticationTokenRequest = None):
+        """Calls callback with a TokenEvent when the token of the request, or of any request if token_request is None,
+        rotates, falls back to the fallback password or is removed.
+
+        Callbacks run on a small thread pool shared by all subscriptions and must not block for long. Returns the
+        subscription to pass to unsubscribe.
+        """
+        return Signer.token_events.subscribe(callback, token_request.get_auth_key() if token_request else None)
+
+    @staticmethod
+    def unsubscribe(subscription):
+        Signer.token_events.unsubscribe(subscription)
+
+    @staticmethod
+    def _revalidate(signer: Signer):
+        """Triggers a background refresh of the token unless one is already running or due.
+
+        A retry after failed refreshes keeps its backoff, the stale hits do not request CAM on each call.
+        """
+        if not signer.single_flight.in_flight(signer.authKey):
+            signer.timer_manager.expedite(signer.authKey, 1, signer.auth_token_update_callback)
+
+
+ForkHandler.register()
+if os.environ.get(DBAuthentication.TOKEN_SNAPSHOT_ENV):
+    DBAuthentication.enable_token_snapshot(os.environ[DBAuthentication.TOKEN_SNAPSHOT_ENV])
@@ -0,0 +1,150 @@
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+
+from dbauth.internal.constants import Constants
+from dbauth.internal.utils import Utils
+
+
+class FallbackProvider:
+    """FallbackProvider supplies the password used when no token can be requested from CAM.
+
+    Implement get_password and install the provider with DBAuthentication.set_fallback_provider.
+    """
+
+    def get_password(self, request):
+        """Returns the fallback password of the request, None if there is none."""
+        return None
+
+
+class FileFallbackProvider(FallbackProvider):
+    """Reads the fallback password from <base_dir>/.com.tencentcloudapi/tencentcloud-dbauth-sdk-python/input/
+    <region>_<instance_id>_<user_name>.pwd, a file with the password on a single line.
+
+    The parsed files are cached and checked for changes (modification time, inode and size) at most once per poll
+    interval, so that a CAM outage does not read the disk on every retry.
+    """
+    MAX_PASSWORD_SIZE = 200
+    # The default time in milliseconds during which a file is not checked again
+    DEFAULT_POLL_INTERVAL = 60 * 1000
+
+    class Entry:
+        """A fallback file as last seen: its stat signature and password."""
+
+        def __init__(self, signature, password, checked_at):
+            self.signature = signature
+            self.password = password
+            self.checked_at = checked_at
+
+    def __init__(self, base_dir=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        if poll_interval < 0:
+            raise ValueError(f"Invalid poll interval: {poll_interval}")
+        # The directory holding the input directory, the current working directory of each lookup if None
+        self.base_dir = Path(base_dir) if base_dir is not None else None
+        self.poll_interval = poll_interval
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def get_password(self, request):
+        path = self.path(request)
+        if path is None:
+            return None
+        now = Utils.get_current_time_millis()
+        entry = self.entries.get(path)
+        if entry and now - entry.checked_at < self.poll_interval:
+            return entry.password
+
+        try:
+            stat = path.stat()
+            signature = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+        except OSError as e:
+            self.log.error(f"Failed to read password: {path}", exc_info=e)
+            signature = None
+
+        if entry and entry.signature == signature:
+            entry.checked_at = now
+            return entry.password
+
+        password = self.read_password(path, signature[2]) if signature else None
+        with self.lock:
+            self.entries[path] = FileFallbackProvider.Entry(signature, password, now)
+        return password
+
+    def read_password(self, path, file_size):
+        try:
+            self.log.info(f"File Name: {path}, File Size: {file_size}")
+            if file_size == 0 or file_size > self.MAX_PASSWORD_SIZE:
+                self.log.error(f"Invalid file size: {path}")
+                return None
+
+            lines = path.read_text().splitlines()
+            if len(lines) == 0:
+                return None
+            if len(lines) > 1:
+                self.log.error(f"The file has more than one line, skip the file: {path}")
+                return None
+
+            self.log.info(f"Reading password: {path}")
+            return lines[0] or None
+        except Exception as e:
+            self.log.error(f"Failed to read password: {path}", exc_info=e)
+            return None
+
+    def path(self, request):
+        try:
+            region, instance_id, user_name = request.region, request.instance_id, request.user_name
+            path = Path(Constants.INPUT_PATH_DIR).joinpath(
+                f"{region}{Constants.DELIMITER}{instance_id}{Constants.DELIMITER}{user_name}.pwd")
+            return (self.base_dir if self.base_dir is not None else Path(os.getcwd())).joinpath(path)
+        except Exception as e:
+            self.log.error("Failed to decode key", exc_info=e)
+            return None
+
+    def invalidate(self):
+        """Forgets the cached files, they are read again on the next lookup."""
+        with self.lock:
+            self.entries = {}
+
+    def reset_after_fork(self):
+        """Replaces the lock inherited by a forked child process."""
+        self.lock = threading.Lock()
+
+
+class MemoryFallbackProvider(FallbackProvider):
+    """Holds the fallback passwords in memory, keyed by region, instance id and user name."""
+
+    def __init__(self, passwords=None):
+        self.passwords = dict(passwords or {})
+
+    def set_password(self, region, instance_id, user_name, password):
+        self.passwords[(region, instance_id, user_name)] = password
+
+    def remove_password(self, region, instance_id, user_name):
+        self.passwords.pop((region, instance_id, user_name), None)
+
+    def get_password(self, request):
+        return self.passwords.get((request.region, request.instance_id, request.user_name))
+
+
+class EnvFallbackProvider(FallbackProvider):
+    """Reads the fallback passwords from environment variables named <prefix><REGION>_<INSTANCE_ID>_<USER_NAME>.
+
+    The name is upper-cased and every character other than a letter, a digit or an underscore is replaced by an
+    underscore, e.g. DBAUTH_FALLBACK_AP_GUANGZHOU_CDB_123456_CAMTEST.
+    """
+    DEFAULT_PREFIX = "DBAUTH_FALLBACK_"
+
+    def __init__(self, prefix=DEFAULT_PREFIX):
+        self.prefix = prefix
+
+    def variable_name(self, request):
+        name = Constants.DELIMITER.join([request.region, request.instance_id, request.user_name])
+        return self.prefix + re.sub(r"[^A-Za-z0-9_]", "_", name).upper()
+
+    def get_password(self, request):
+        return os.environ.get(self.variable_name(request)) or None
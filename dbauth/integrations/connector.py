@@ -0,0 +1,56 @@
+import logging
+
+from dbauth.db_authentication import DBAuthentication
+
+
+class TokenConnector:
+    """TokenConnector opens database connections authenticated with the cached token of a request."""
+    # The MySQL error returned for a wrong password (ER_ACCESS_DENIED_ERROR)
+    MYSQL_ACCESS_DENIED = 1045
+    # The PostgreSQL SQLSTATEs of a rejected authentication (invalid_password, invalid_authorization_specification)
+    POSTGRES_AUTH_FAILURES = ("28P01", "28000")
+    # The pool recycle time in seconds when the lifetime of the token is unknown
+    DEFAULT_POOL_RECYCLE = 3600
+
+    log = logging.getLogger(__name__)
+
+    @staticmethod
+    def is_auth_failure(error) -> bool:
+        """Returns whether a driver error means the database rejected the password."""
+        args = getattr(error, "args", ())
+        if args and args[0] == TokenConnector.MYSQL_ACCESS_DENIED:
+            return True
+        if getattr(error, "pgcode", None) in TokenConnector.POSTGRES_AUTH_FAILURES:
+            return True
+        # psycopg2 reports the failures of the connection startup without a SQLSTATE
+        return "password authentication failed" in str(error)
+
+    @staticmethod
+    def connect(token_request, connect):
+        """Calls connect with the cached token of the request and returns the connection.
+
+        If the database rejects the token, connect is called once more with a new token: the token cached since then
+        if another connection refreshed it, otherwise a token requested from CAM.
+        """
+        password = DBAuthentication.generate_authentication_token(token_request)
+        try:
+            return connect(password)
+        except Exception as e:
+            if not TokenConnector.is_auth_failure(e):
+                raise
+            TokenConnector.log.warning("The database rejected the authentication token, retrying with a new token")
+
+        refreshed = DBAuthentication.generate_authentication_token(token_request)
+        if refreshed == password:
+            refreshed = DBAuthentication.refresh_authentication_token(token_request)
+        return connect(refreshed)
+
+    @staticmethod
+    def pool_recycle(token_request, default=DEFAULT_POOL_RECYCLE) -> int:
+        """Returns the time in seconds after which a pooled connection should be replaced: the lifetime of the token of
+        the request, so that connections do not outlive the password they were opened with.
+
+        default is returned when the token is not cached or its lifetime is unknown.
+        """
+        lifetime = DBAuthentication.get_token_lifetime(token_request)
+        return max(1, lifetime // 1000) if lifetime else default
@@ -0,0 +1,18 @@
+from dbauth.integrations.connector import TokenConnector
+
+
+class PyMySQLConnector:
+    """PyMySQLConnector opens PyMySQL connections authenticated with CAM tokens."""
+
+    @staticmethod
+    def connect(token_request, connect_fn=None, **kwargs):
+        """Opens a connection authenticated with the token of the request.
+
+        kwargs are passed to connect_fn, pymysql.connect by default, the user defaults to the user name of the request.
+        The connection is retried once with a new token if the database rejects the token.
+        """
+        if connect_fn is None:
+            import pymysql
+            connect_fn = pymysql.connect
+        kwargs.setdefault("user", token_request.user_name)
+        return TokenConnector.connect(token_request, lambda password: connect_fn(password=password, **kwargs))
@@ -0,0 +1,52 @@
+from dbauth.db_authentication import DBAuthentication
+from dbauth.integrations.connector import TokenConnector
+
+
+class SQLAlchemyIntegration:
+    """SQLAlchemyIntegration makes SQLAlchemy engines connect with CAM tokens."""
+
+    @staticmethod
+    def do_connect_handler(token_request):
+        """Returns a handler of the do_connect event connecting with the token of the request.
+
+        The handler opens the connection itself so that it can retry once with a new token if the database rejects
+        the token.
+        """
+
+        def do_connect(dialect, connection_record, cargs, cparams):
+            def connect(password):
+                params = dict(cparams)
+                params["password"] = password
+                params.setdefault("user", token_request.user_name)
+                return dialect.connect(*cargs, **params)
+
+            return TokenConnector.connect(token_request, connect)
+
+        return do_connect
+
+    @staticmethod
+    def register(engine, token_request):
+        """Makes the engine connect with the token of the request, the URL of the engine needs no password."""
+        from sqlalchemy import event
+        handler = SQLAlchemyIntegration.do_connect_handler(token_request)
+        event.listen(engine, "do_connect", handler)
+        return handler
+
+    @staticmethod
+    def creator(token_request, connect_fn, **kwargs):
+        """Returns a function for create_engine(creator=...) calling connect_fn with the token of the request."""
+        kwargs.setdefault("user", token_request.user_name)
+
+        def create():
+            return TokenConnector.connect(token_request, lambda password: connect_fn(password=password, **kwargs))
+
+        return create
+
+    @staticmethod
+    def pool_recycle(token_request, default=TokenConnector.DEFAULT_POOL_RECYCLE) -> int:
+        """Returns the pool_recycle of create_engine replacing the connections when the token of the request rotates.
+
+        The token is requested if it is not cached yet.
+        """
+        DBAuthentication.generate_authentication_token(token_request)
+        return TokenConnector.pool_recycle(token_request, default)
@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.constants import Constants
+from dbauth.internal.error_code_matcher import ErrorCodeMatcher
+from dbauth.internal.signer import Signer
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.metrics import Metrics
+from dbauth.model.token_event import TokenEvent
+
+
+class AsyncTokenManager:
+    """AsyncTokenManager caches and refreshes authentication tokens on an asyncio event loop.
+
+    Each event loop has its own manager, which holds its loop weakly and is dropped with it. The tokens are bounded
+    and evicted when idle like those of Signer.token_cache. Blocking CAM requests, which share the request, decryption
+    and error code semantics of Signer, run on a bounded thread pool shared by all managers.
+    """
+    # The default number of threads running blocking CAM requests
+    DEFAULT_MAX_WORKERS = 4
+
+    log = logging.getLogger(__name__)
+    # The number of threads running blocking CAM requests, takes effect before the first request
+    max_workers = DEFAULT_MAX_WORKERS
+    executor = None
+    executor_lock = threading.Lock()
+    managers = weakref.WeakKeyDictionary()
+
+    def __init__(self, loop):
+        # The loop owns the manager through the managers dict and its scheduled refreshes, a strong reference back
+        # would keep both alive after the loop is closed
+        self.loop_ref = weakref.ref(loop)
+        self.token_cache = TokenCache(Signer.token_cache.max_size, Signer.token_cache.idle_timeout,
+                                      Signer.token_cache.fallback_provider)
+        self.in_flight = {}
+        # The scheduled refreshes, held by the loop until they run or are cancelled
+        self.timer_handles = weakref.WeakValueDictionary()
+        # The number of token builds and the number of callers coalesced into them
+        self.executions = 0
+        self.coalesced = 0
+
+    @property
+    def loop(self):
+        return self.loop_ref()
+
+    @classmethod
+    def current(cls):
+        """Returns the manager of the running event loop, must be called from a coroutine or callback of the loop."""
+        loop = asyncio.get_running_loop()
+        manager = cls.managers.get(loop)
+        if manager is None:
+            manager = cls.managers[loop] = cls(loop)
+        return manager
+
+    @classmethod
+    def reset_after_fork(cls):
+        """Drops the thread pool and the event loops of a forked parent process."""
+        cls.executor = None
+        cls.executor_lock = threading.Lock()
+        cls.managers = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def get_executor(cls):
+        with cls.executor_lock:
+            if cls.executor is None:
+                cls.executor = ThreadPoolExecutor(max_workers=cls.max_workers, thread_name_prefix="dbauth-async")
+            return cls.executor
+
+    async def get_auth_token(self, token_request, timeout=None):
+        """Returns a cached token, or builds one when the cache misses or the token expired.
+
+        timeout is the maximum time in milliseconds to wait for the build, which continues in the background.
+        """
+        cached_token = self.token_cache.get_auth_token(token_request.get_auth_key())
+        if cached_token and cached_token.get_expires() > Utils.get_current_time_millis():
+            return cached_token.get_auth_token()
+        signer = Signer(token_request)
+        try:
+            await self.build_auth_token_within(signer, timeout)
+            return self.token_cache.peek_auth_token(signer.authKey).get_auth_token()
+        except TencentCloudSDKException as e:
+            self.log.error("Error occurred while generating authentication token", exc_info=e)
+            if cached_token and not ErrorCodeMatcher.is_user_notification_required(e.code):
+                return cached_token.get_auth_token()
+            if not cached_token and e.code == Constants.TIMEOUT_ERROR:
+                fallback_token = await self.loop.run_in_executor(self.get_executor(), signer.token_cache.fallback,
+                                                                 signer.request)
+                if fallback_token:
+                    self.log.info("Using the fallback token, the deadline passed")
+                    return fallback_token.get_auth_token()
+            raise e
+
+    async def build_auth_token_within(self, signer, timeout):
+        """Builds the token like build_auth_token, waiting for it at most timeout milliseconds if it is not None."""
+        if timeout is None:
+            return await self.build_auth_token(signer)
+        try:
+            # The build is shielded, it is not cancelled when the deadline passes
+            await asyncio.wait_for(self.build_auth_token(signer), max(0, timeout) / 1000)
+        except asyncio.TimeoutError:
+            Metrics.collector.increment(Metrics.DEADLINE_EXCEEDED)
+            raise TencentCloudSDKException(Constants.TIMEOUT_ERROR, f"The token was not built within {timeout} ms", "")
+
+    async def build_auth_token(self, signer):
+        """Builds the token once for all concurrent callers of the same key."""
+        task = self.in_flight.get(signer.authKey)
+        if task:
+            self.coalesced += 1
+            signer.promote_refresh()
+        else:
+            self.executions += 1
+            task = self.in_flight[signer.authKey] = asyncio.ensure_future(self._build_auth_token(signer))
+            task.add_done_callback(lambda _: self.in_flight.pop(signer.authKey, None))
+        # Shield the shared build from the cancellation of a single caller
+        await asyncio.shield(task)
+
+    async def _build_auth_token(self, signer):
+        try:
+            token = await self.loop.run_in_executor(self.get_executor(), signer.get_auth_token)
+            self.set_token_and_update_task(signer, token)
+        except TencentCloudSDKException as e:
+            if ErrorCodeMatcher.is_user_notification_required(e.code):
+                raise e
+
+            fallback_token = await self.loop.run_in_executor(self.get_executor(), signer.token_cache.fallback,
+                                                             signer.request)
+            if fallback_token:
+                self.log.info("Using the fallback token")
+                self.set_token_and_update_task(signer, fallback_token)
+            else:
+                raise e
+
+    def set_token_and_update_task(self, signer, token):
+        previous_token = self.token_cache.peek_auth_token(signer.authKey)
+        evicted_keys = self.token_cache.set_auth_token(signer.authKey, token)
+        # Stop refreshing the tokens evicted from the cache
+        for key in evicted_keys:
+            if key != signer.authKey:
+                self.cancel(key)
+                signer.token_events.publish(TokenEvent(TokenEvent.REMOVED, key))
+        if signer.authKey not in evicted_keys:
+            self.schedule(signer, signer.next_update_delay(token))
+            signer.publish_token_change(previous_token, token)
+
+    def cancel(self, key):
+        handle = self.timer_handles.pop(key, None)
+        if handle:
+            handle.cancel()
+
+    def schedule(self, signer, delay):
+        self.cancel(signer.authKey)
+        self.log.debug("Scheduling next token key update in %s ms", delay)
+        self.timer_handles[signer.authKey] = self.loop.call_later(
+            delay / 1000, lambda: asyncio.ensure_future(self.auth_token_update_callback(signer)))
+
+    async def auth_token_update_callback(self, signer):
+        self.timer_handles.pop(signer.authKey, None)
+        cached_token = self.token_cache.peek_auth_token(signer.authKey)
+        if self.token_cache.evict_idle(signer.authKey):
+            # Stop refreshing a token that is no longer requested
+            self.log.info("The authentication token is idle or evicted, stop updating the token")
+            if cached_token:
+                signer.publish_token_removal()
+            return
+        signer.refreshing_expiry = cached_token.get_expires() if cached_token else Utils.get_current_time_millis()
+        try:
+            await self.build_auth_token(signer)
+        except TencentCloudSDKException as e:
+            if ErrorCodeMatcher.is_user_notification_required(e.code):
+                # If a user notification is required, remove the token from the cache
+                self.log.error("Failed to update the authentication token, error: %s", e)
+                if self.token_cache.peek_auth_token(signer.authKey):
+                    self.token_cache.remove_auth_token(signer.authKey)
+                    signer.publish_token_removal()
+            else:
+                # If an internal error occurs, try to update the token again
+                self.log.error("Failed to update the authentication token, Retry to update the token, error: %s", e)
+                self.schedule(signer, signer.next_retry_delay())
+        finally:
+            signer.refreshing_expiry = None
+
+    def stats(self):
+        return {"executions": self.executions, "coalesced": self.coalesced}
+
+    def shutdown(self):
+        """Cancels the scheduled refreshes and clears the cache."""
+        for handle in list(self.timer_handles.values()):
+            handle.cancel()
+        self.timer_handles.clear()
+        for key in list(self.token_cache.token_map):
+            self.token_cache.remove_auth_token(key)
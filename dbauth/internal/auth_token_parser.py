@@ -1,33 +1,78 @@
 import hashlib
 import base64
-from Crypto.Cipher import AES
-from Crypto.Util.Padding import unpad
-from google.protobuf.message import DecodeError
-import dbauth.proto.auth_token_info_pb2 as proto
+import time
+from typing import TYPE_CHECKING
+
 from dbauth.internal.constants import Constants
+from dbauth.metrics import Metrics
+
+if TYPE_CHECKING:
+    # protobuf is imported on the first decryption
+    from dbauth.proto.auth_token_info_pb2 import AuthTokenInfo
 
 
 class AuthTokenParser:
+    """AuthTokenParser decrypts the tokens returned by CAM.
+
+    pycryptodome and protobuf are imported on the first decryption, a process served from the cache never loads them.
+    """
     class AuthTokenParserError(Exception):
         pass
 
     @staticmethod
-    def parse_auth_token(instance_id: str, region: str, user_name: str, token: str) -> proto.AuthTokenInfo:
+    def parse_auth_token(instance_id: str, region: str, user_name: str, token: str) -> "AuthTokenInfo":
         if not all([instance_id, region, user_name, token]):
             raise AuthTokenParser.AuthTokenParserError("param empty")
 
-        seed_key = AuthTokenParser._sha256(
-            f"{instance_id}{Constants.DELIMITER}{region}{Constants.DELIMITER}{user_name}".encode())
-        key, iv = seed_key[:32], seed_key[33:49]
+        start = time.perf_counter()
+        try:
+            return AuthTokenParser._parse_auth_token(instance_id, region, user_name, token)
+        finally:
+            Metrics.collector.observe(Metrics.DECRYPT_TIME, (time.perf_counter() - start) * 1000)
+
+    @staticmethod
+    def _parse_auth_token(instance_id: str, region: str, user_name: str, token: str) -> "AuthTokenInfo":
+        decrypted_token = AuthTokenParser._open(instance_id, region, user_name, token)
+        return AuthTokenParser._get_auth_token_info(decrypted_token)
 
+    @staticmethod
+    def seal(instance_id: str, region: str, user_name: str, data: str) -> str:
+        """Encrypts data in the token format, with the key derived from the instance, region and user name."""
+        if not all([instance_id, region, user_name, data]):
+            raise AuthTokenParser.AuthTokenParserError("param empty")
+        key, iv = AuthTokenParser._derive_key(instance_id, region, user_name)
+        plaintext = data.encode()
+        return AuthTokenParser._sha256(plaintext) + AuthTokenParser._encrypt(plaintext, key, iv)
+
+    @staticmethod
+    def unseal(instance_id: str, region: str, user_name: str, sealed: str) -> str:
+        """Decrypts data encrypted by seal."""
+        if not all([instance_id, region, user_name, sealed]):
+            raise AuthTokenParser.AuthTokenParserError("param empty")
+        try:
+            return AuthTokenParser._open(instance_id, region, user_name, sealed).decode()
+        except (ValueError, UnicodeDecodeError) as e:
+            raise AuthTokenParser.AuthTokenParserError("Failed to decrypt sealed data") from e
+
+    @staticmethod
+    def _open(instance_id: str, region: str, user_name: str, token: str) -> bytes:
+        key, iv = AuthTokenParser._derive_key(instance_id, region, user_name)
         decrypted_token = AuthTokenParser._decrypt(token[64:], key, iv)
         if token[:64] != AuthTokenParser._sha256(decrypted_token):
             raise AuthTokenParser.AuthTokenParserError("token not compare")
+        return decrypted_token
 
-        return AuthTokenParser._get_auth_token_info(decrypted_token)
+    @staticmethod
+    def _derive_key(instance_id: str, region: str, user_name: str):
+        seed_key = AuthTokenParser._sha256(
+            f"{instance_id}{Constants.DELIMITER}{region}{Constants.DELIMITER}{user_name}".encode())
+        return seed_key[:32], seed_key[33:49]
 
     @staticmethod
-    def _get_auth_token_info(decrypted_token: bytes) -> proto.AuthTokenInfo:
+    def _get_auth_token_info(decrypted_token: bytes) -> "AuthTokenInfo":
+        from google.protobuf.message import DecodeError
+        import dbauth.proto.auth_token_info_pb2 as proto
+
         try:
             auth_token_info = proto.AuthTokenInfo()
             auth_token_info.ParseFromString(decrypted_token[4:])
@@ -41,10 +86,22 @@ class AuthTokenParser:
 
     @staticmethod
     def _decrypt(encrypted_data: str, key: str, iv: str) -> bytes:
+        from Crypto.Cipher import AES
+        from Crypto.Util.Padding import unpad
+
         cipher = AES.new(key.encode(), AES.MODE_CBC, iv.encode())
         decrypted_padded_plaintext = cipher.decrypt(AuthTokenParser._base64_decode(encrypted_data))
         return unpad(decrypted_padded_plaintext, AES.block_size)
 
+    @staticmethod
+    def _encrypt(plaintext: bytes, key: str, iv: str) -> str:
+        from Crypto.Cipher import AES
+        from Crypto.Util.Padding import pad
+
+        cipher = AES.new(key.encode(), AES.MODE_CBC, iv.encode())
+        encrypted_data = cipher.encrypt(pad(plaintext, AES.block_size))
+        return base64.b64encode(encrypted_data).decode().replace("+", "-").replace("/", "_").rstrip("=")
+
     @staticmethod
     def _base64_decode(data: str) -> bytes:
         data = data.replace("-", "+").replace("_", "/")
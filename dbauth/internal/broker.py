@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.utils import Utils
+
+
+class TokenBroker:
+    """TokenBroker serves the authentication tokens of a host to its processes over a Unix domain socket.
+
+    The broker holds the credential, caches and refreshes the tokens, the processes only send the region, instance id
+    and user name of a token. The protocol is one JSON object per line in each direction:
+
+        {"op": "get", "region": "ap-guangzhou", "instance_id": "cdb-123456", "user_name": "camtest"}
+        {"ok": true, "token": "...", "expires_in": 1799000}
+        {"ok": false, "code": "AuthFailure.SecretIdNotFound", "message": "..."}
+
+    expires_in is 0 for a fallback password, which the processes do not cache, so that they receive the CAM token as
+    soon as the broker gets one. The socket is only accessible to the user running the broker.
+    """
+    # The maximum size in bytes of a request line
+    MAX_REQUEST_SIZE = 4096
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, socket_path, credential, client_profile=None):
+        self.socket_path = str(socket_path)
+        self.credential = credential
+        self.client_profile = client_profile
+        self.server = None
+
+    def start(self):
+        """Binds the socket and serves the requests on a background thread."""
+        self.bind()
+        threading.Thread(target=self.server.serve_forever, name="dbauth-broker", daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        self.bind()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stop()
+
+    def bind(self):
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline(TokenBroker.MAX_REQUEST_SIZE)
+                    if not line:
+                        return
+                    response = broker.handle(line)
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+
+        self.remove_stale_socket()
+        # Create the socket with owner-only permissions, there is no window where another user can connect
+        umask = os.umask(0o177)
+        try:
+            self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        finally:
+            os.umask(umask)
+        self.server.daemon_threads = True
+        self.log.info(f"Token broker listening on {self.socket_path}")
+
+    def remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.remove(self.socket_path)
+                return
+        raise OSError(f"A token broker is already listening on {self.socket_path}")
+
+    def stop(self):
+        server, self.server = self.server, None
+        if server:
+            server.shutdown()
+            server.server_close()
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+
+    def handle(self, line):
+        """Returns the response to a request line."""
+        # Imported here, dbauth.db_authentication imports the client side of this module
+        from dbauth.db_authentication import DBAuthentication
+        from dbauth.internal.signer import Signer
+        from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+        try:
+            message = json.loads(line)
+            if message.get("op") == "ping":
+                return {"ok": True}
+            if message.get("op") != "get":
+                return {"ok": False, "code": "InvalidParameter", "message": f"Unknown op: {message.get('op')}"}
+            request = GenerateAuthenticationTokenRequest(message.get("region"), message.get("instance_id"),
+                                                         message.get("user_name"), self.credential,
+                                                         self.client_profile)
+            # Bypass the broker client, the broker must not ask itself
+            auth_token = DBAuthentication._generate_in_process(request)
+        except TencentCloudSDKException as e:
+            return {"ok": False, "code": e.code, "message": e.message}
+        except (ValueError, AttributeError) as e:
+            return {"ok": False, "code": "InvalidParameter", "message": f"Invalid request: {e}"}
+
+        cached_token = Signer.token_cache.peek_auth_token(request.get_auth_key())
+        if cached_token and cached_token.get_lifetime():
+            expires_in = cached_token.get_expires() - Utils.get_current_time_millis()
+        else:
+            # A token not issued by CAM, e.g. the fallback password, expires far in the future but is replaced by the
+            # next successful refresh
+            expires_in = 0
+        return {"ok": True, "token": auth_token, "expires_in": max(0, expires_in)}
+
+
+class BrokerClient:
+    """BrokerClient gets tokens from a TokenBroker and caches them until they expire.
+
+    When the broker cannot be reached, get_token returns None and the broker is not tried again for retry_interval.
+    """
+    # The default time in milliseconds to wait for the broker
+    DEFAULT_TIMEOUT = 1000
+    # The default time in milliseconds during which an unreachable broker is not tried again
+    DEFAULT_RETRY_INTERVAL = 5 * 1000
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, socket_path, timeout=DEFAULT_TIMEOUT, retry_interval=DEFAULT_RETRY_INTERVAL):
+        self.socket_path = str(socket_path)
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.token_map = {}
+        self.unavailable_until = 0
+        self.local = threading.local()
+
+    def get_token(self, request):
+        """Returns the token of the request from the broker, None if the broker is unavailable.
+
+        Raises TencentCloudSDKException if the broker failed to get the token.
+        """
+        key = request.get_auth_key()
+        now = Utils.get_current_time_millis()
+        cached = self.token_map.get(key)
+        if cached and cached[1] > now:
+            return cached[0]
+        if now < self.unavailable_until:
+            return None
+
+        try:
+            response = self.call({"op": "get", "region": request.region, "instance_id": request.instance_id,
+                                  "user_name": request.user_name})
+        except (OSError, ValueError) as e:
+            self.log.warning(f"The token broker {self.socket_path} is unavailable, fetching in process: {e}")
+            self.unavailable_until = now + self.retry_interval
+            self.close()
+            return None
+
+        if not response.get("ok"):
+            raise TencentCloudSDKException(response.get("code"), response.get("message"))
+        self.token_map[key] = (response["token"], now + response.get("expires_in", 0))
+        return response["token"]
+
+    def call(self, message):
+        """Sends a request on the connection of the thread and returns the response."""
+        connection = getattr(self.local, "connection", None)
+        if connection is not None and connection[2] != os.getpid():
+            # A connection inherited from the parent process must not be used in the child
+            connection = None
+        if connection is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout / 1000)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            connection = self.local.connection = (sock, sock.makefile("rb"), os.getpid())
+        sock, reader, _ = connection
+        try:
+            sock.sendall(json.dumps(message).encode() + b"\n")
+            line = reader.readline()
+            if not line:
+                raise ConnectionError("The token broker closed the connection")
+            return json.loads(line)
+        except (OSError, ValueError):
+            self.close()
+            raise
+
+    def close(self):
+        """Closes the connection of the thread."""
+        connection = getattr(self.local, "connection", None)
+        self.local.connection = None
+        if connection and connection[2] == os.getpid():
+            connection[1].close()
+            connection[0].close()
@@ -0,0 +1,100 @@
+import logging
+import threading
+
+from dbauth.internal.utils import Utils
+
+
+class CircuitBreaker:
+    """CircuitBreaker stops sending requests to a CAM endpoint that keeps failing.
+
+    After failure_threshold consecutive failures the circuit opens and requests fail fast. Once open_timeout has
+    passed, one request is let through: the circuit closes if it succeeds and opens again if it fails. A breaker is
+    shared by all keys using the same region and endpoint.
+    """
+    # The default number of consecutive failures opening the circuit
+    DEFAULT_FAILURE_THRESHOLD = 5
+    # The default time in milliseconds the circuit stays open before a request is let through
+    DEFAULT_OPEN_TIMEOUT = 30 * 1000
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, open_timeout=DEFAULT_OPEN_TIMEOUT):
+        if failure_threshold <= 0:
+            raise ValueError(f"Invalid failure threshold: {failure_threshold}")
+        if open_timeout <= 0:
+            raise ValueError(f"Invalid open timeout: {open_timeout}")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.open_timeout = open_timeout
+        self.state = CircuitBreaker.CLOSED
+        self.failures = 0
+        self.opened_at = 0
+        self.lock = threading.Lock()
+
+    def allow_request(self):
+        """Returns whether a request may be sent, False while the circuit is open."""
+        with self.lock:
+            if self.state == CircuitBreaker.CLOSED:
+                return True
+            if self.state == CircuitBreaker.OPEN and \
+                    Utils.get_current_time_millis() - self.opened_at >= self.open_timeout:
+                # Let one request probe the endpoint
+                self.state = CircuitBreaker.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CircuitBreaker.CLOSED:
+                self.log.info("Circuit closed for CAM endpoint %s", self.name)
+            self.state = CircuitBreaker.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == CircuitBreaker.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != CircuitBreaker.OPEN:
+                    self.log.warning("Circuit opened for CAM endpoint %s after %s failures", self.name, self.failures)
+                self.state = CircuitBreaker.OPEN
+                self.opened_at = Utils.get_current_time_millis()
+
+
+class CircuitBreakerRegistry:
+    """CircuitBreakerRegistry holds one breaker per CAM endpoint, shared by all keys using the endpoint."""
+    # The endpoint of the requests whose client profile does not set one
+    DEFAULT_ENDPOINT = "cam.tencentcloudapi.com"
+
+    def __init__(self, failure_threshold=CircuitBreaker.DEFAULT_FAILURE_THRESHOLD,
+                 open_timeout=CircuitBreaker.DEFAULT_OPEN_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.open_timeout = open_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, region, client_profile=None):
+        """Returns the breaker of the region and of the endpoint set by the client profile."""
+        http_profile = getattr(client_profile, "httpProfile", None)
+        endpoint = getattr(http_profile, "endpoint", None) or self.DEFAULT_ENDPOINT
+        key = (region, endpoint)
+        with self.lock:
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                breaker = self.breakers[key] = CircuitBreaker(f"{endpoint}/{region}", self.failure_threshold,
+                                                              self.open_timeout)
+            return breaker
+
+    def reset_after_fork(self):
+        """Replaces the locks inherited by a forked child process."""
+        self.lock = threading.Lock()
+        for breaker in self.breakers.values():
+            breaker.lock = threading.Lock()
+
+    def reset(self):
+        """Closes all circuits."""
+        with self.lock:
+            self.breakers.clear()
@@ -0,0 +1,109 @@
+import hashlib
+import logging
+import threading
+
+from dbauth.internal.constants import Constants
+from dbauth.internal.utils import Utils
+
+
+class ClientPool:
+    """ClientPool reuses CAM clients, and the HTTP connections they keep alive, across token requests.
+
+    Clients are keyed by (credential identity, region, client profile), the identity is the secret id unless a credential
+    provider gives one. A client is replaced when the secret behind its credential identity changes and closed once it
+    has been idle for longer than the idle timeout.
+    """
+    # The default time in milliseconds after which an unused client is closed
+    DEFAULT_IDLE_TIMEOUT = 5 * 60 * 1000
+
+    class Entry:
+        """A pooled client with the fingerprint of the credential it was created with."""
+
+        def __init__(self, client, fingerprint, last_used):
+            self.client = client
+            self.fingerprint = fingerprint
+            self.last_used = last_used
+
+    def __init__(self, idle_timeout=DEFAULT_IDLE_TIMEOUT):
+        if idle_timeout <= 0:
+            raise ValueError(f"Invalid idle timeout: {idle_timeout}")
+        self.idle_timeout = idle_timeout
+        self.clients = {}
+        self.last_sweep = Utils.get_current_time_millis()
+        self.lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def get_client(self, credential, region, client_profile, factory, identity=None):
+        """Returns a pooled client for the credential, region and profile, creating it with factory if needed."""
+        secret_id, secret_key, token = credential.get_credential_info()
+        key = (identity or secret_id, region, self.profile_key(client_profile))
+        fingerprint = self.fingerprint(secret_id, secret_key, token)
+        now = Utils.get_current_time_millis()
+
+        stale_clients = []
+        with self.lock:
+            if now - self.last_sweep >= self.idle_timeout // 2:
+                stale_clients.extend(self._sweep(now))
+
+            entry = self.clients.get(key)
+            if entry and entry.fingerprint != fingerprint:
+                # The credential changed, the client signs with the old secret
+                self.log.info("Credential changed, invalidating the CAM client")
+                stale_clients.append(self.clients.pop(key).client)
+                entry = None
+
+            if not entry:
+                entry = self.clients[key] = ClientPool.Entry(factory(), fingerprint, now)
+            entry.last_used = now
+
+        for client in stale_clients:
+            self._close(client)
+        return entry.client
+
+    def invalidate(self, identity=None):
+        """Closes the clients of a credential identity, or all clients if identity is None."""
+        with self.lock:
+            keys = [key for key in self.clients if identity is None or key[0] == identity]
+            stale_clients = [self.clients.pop(key).client for key in keys]
+        for client in stale_clients:
+            self._close(client)
+
+    def reset_after_fork(self):
+        """Drops the clients of a forked parent process, their connections must not be shared with the child."""
+        self.lock = threading.Lock()
+        self.clients = {}
+
+    def size(self):
+        return len(self.clients)
+
+    def _sweep(self, now):
+        """Removes the idle clients, must be called with the lock held."""
+        self.last_sweep = now
+        keys = [key for key, entry in self.clients.items() if now - entry.last_used >= self.idle_timeout]
+        return [self.clients.pop(key).client for key in keys]
+
+    def _close(self, client):
+        try:
+            session = getattr(getattr(getattr(client, "request", None), "conn", None), "_session", None)
+            if session:
+                session.close()
+        except Exception as e:
+            self.log.warning("Failed to close the CAM client", exc_info=e)
+
+    @staticmethod
+    def fingerprint(secret_id, secret_key, token):
+        data = Constants.DELIMITER.join([secret_id or "", secret_key or "", token or ""])
+        return hashlib.sha256(data.encode()).hexdigest()
+
+    @staticmethod
+    def profile_key(client_profile):
+        """Returns a hashable key built from the scalar settings of a client profile."""
+        if client_profile is None:
+            return None
+
+        def scalars(obj):
+            return tuple(sorted((name, value) for name, value in vars(obj).items()
+                                if value is None or isinstance(value, (str, int, float, bool))))
+
+        http_profile = getattr(client_profile, "httpProfile", None)
+        return scalars(client_profile), scalars(http_profile) if http_profile is not None else None
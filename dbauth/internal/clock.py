@@ -0,0 +1,67 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+
+
+class Clock(ABC):
+    """Clock is the time source of the expiry and scheduling math.
+
+    Expiry and scheduling use a monotonic time, which does not jump when the wall clock is stepped. The wall time is
+    only used to display or persist an expiry.
+    """
+
+    @abstractmethod
+    def millis(self):
+        """Returns the monotonic time in milliseconds."""
+
+    @abstractmethod
+    def wall_millis(self):
+        """Returns the wall time in milliseconds since the epoch."""
+
+    def real_timeout(self, delay):
+        """Returns the real time in seconds to wait for a delay in milliseconds, None to wait until notified."""
+        return delay / 1000
+
+    def add_listener(self, listener):
+        """Registers a callback invoked when the time moves other than by itself."""
+
+
+class SystemClock(Clock):
+    """The clock of the operating system."""
+
+    def millis(self):
+        return int(time.monotonic() * 1000)
+
+    def wall_millis(self):
+        return int(time.time() * 1000)
+
+
+class ManualClock(Clock):
+    """A clock that only moves when it is advanced, used to test the scheduling with simulated time."""
+
+    def __init__(self, millis=0, wall_millis=0):
+        self.now = millis
+        self.wall_offset = wall_millis - millis
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def millis(self):
+        return self.now
+
+    def wall_millis(self):
+        return self.now + self.wall_offset
+
+    def real_timeout(self, delay):
+        return None
+
+    def add_listener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def advance(self, millis):
+        """Moves the time forward and wakes up the listeners."""
+        with self.lock:
+            self.now += millis
+            listeners = list(self.listeners)
+        for listener in listeners:
+            listener()
@@ -1,4 +1,6 @@
 class Constants:
+    CIRCUIT_OPEN_ERROR = "InternalError.CircuitOpen"
+    TIMEOUT_ERROR = "InternalError.Timeout"
     DELIMITER = "_"
     INPUT_PATH_DIR = ".com.tencentcloudapi/tencentcloud-dbauth-sdk-python/input/"
     MAX_DELAY = 24 * 60 * 60 * 1000
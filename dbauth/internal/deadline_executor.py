@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.constants import Constants
+from dbauth.metrics import Metrics
+
+
+class DeadlineExecutor:
+    """DeadlineExecutor runs token builds on a bounded thread pool so that their callers can stop waiting at a deadline.
+
+    Only the single-flight leader of a key takes a thread of the pool, the callers that join its build wait in their
+    own threads, so a slow key does not hold up the builds of the other keys. A build that outlives the deadline of its
+    callers is not cancelled, it completes in the background and caches its token for the next call.
+    """
+    # The default number of threads running the builds
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        if max_workers <= 0:
+            raise ValueError(f"Invalid max workers: {max_workers}")
+        self.max_workers = max_workers
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def run(self, single_flight, key, fn, timeout, on_join=None):
+        """Runs fn once for all concurrent callers of key and returns its result, or raises TencentCloudSDKException
+        with the code Constants.TIMEOUT_ERROR when it has not completed within timeout milliseconds."""
+        call = single_flight.start(key, fn, self.get_executor().submit, on_join)
+        if not call.done.wait(max(0, timeout) / 1000):
+            Metrics.collector.increment(Metrics.DEADLINE_EXCEEDED)
+            raise TencentCloudSDKException(Constants.TIMEOUT_ERROR,
+                                           f"The token was not built within {timeout} ms", "")
+        return call.outcome()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dbauth-deadline")
+            return self.executor
+
+    def reset_after_fork(self):
+        """Drops the thread pool of a forked parent process, whose threads do not exist in the child."""
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def shutdown(self, wait=True):
+        """Stops the thread pool once the running builds complete, it is started again on the next build."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=wait)
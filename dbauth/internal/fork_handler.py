@@ -0,0 +1,84 @@
+import logging
+import os
+import sys
+
+from dbauth.credential_provider import CredentialProvider
+from dbauth.internal.signer import Signer
+from dbauth.metrics import Metrics
+
+
+class ForkHandler:
+    """ForkHandler keeps the token cache and its refresh scheduling working across os.fork.
+
+    Before a fork, the locks of the SDK are taken so that no structure is forked in the middle of an update. In the
+    child, the locks are replaced, the state tied to the threads and connections of the parent is dropped and the
+    refresh timers of the cached keys are armed again on a new scheduler thread.
+    """
+    log = logging.getLogger(__name__)
+    # Whether a child process keeps serving the still valid tokens of its parent, otherwise it requests them again
+    reuse_tokens = True
+    registered = False
+    held_locks = []
+
+    @staticmethod
+    def register():
+        """Registers the fork handlers once, on platforms supporting os.register_at_fork."""
+        if ForkHandler.registered or not hasattr(os, "register_at_fork"):
+            return
+        os.register_at_fork(before=ForkHandler.before_fork,
+                            after_in_parent=ForkHandler.after_fork_in_parent,
+                            after_in_child=ForkHandler.after_fork_in_child)
+        ForkHandler.registered = True
+
+    @staticmethod
+    def components():
+        components = [Signer.token_cache, Signer.timer_manager, Signer.single_flight, Signer.client_pool,
+                      Signer.refresh_queue, Signer.hedging_policy, Signer.deadline_executor, Signer.circuit_breakers,
+                      Signer.negative_cache, Signer.token_events, Signer.shared_store, Signer.token_snapshot,
+                      Metrics.collector]
+        return [component for component in components if hasattr(component, "reset_after_fork")]
+
+    @staticmethod
+    def async_token_manager():
+        """Returns the AsyncTokenManager class if it was imported, asyncio is not loaded for synchronous users."""
+        module = sys.modules.get("dbauth.internal.async_token_manager")
+        return getattr(module, "AsyncTokenManager", None)
+
+    @staticmethod
+    def before_fork():
+        locks = [getattr(component, "lock", None) for component in ForkHandler.components()]
+        async_token_manager = ForkHandler.async_token_manager()
+        if async_token_manager:
+            locks.append(async_token_manager.executor_lock)
+        ForkHandler.held_locks = []
+        for lock in locks:
+            if lock is not None:
+                lock.acquire()
+                ForkHandler.held_locks.append(lock)
+
+    @staticmethod
+    def after_fork_in_parent():
+        for lock in reversed(ForkHandler.held_locks):
+            lock.release()
+        ForkHandler.held_locks = []
+
+    @staticmethod
+    def after_fork_in_child():
+        ForkHandler.held_locks = []
+        for component in ForkHandler.components():
+            if component is Signer.token_cache:
+                component.reset_after_fork(keep_tokens=ForkHandler.reuse_tokens)
+            elif component is Signer.timer_manager and not ForkHandler.reuse_tokens:
+                # The refreshes would only find the dropped tokens missing
+                component.timer_map.clear()
+                component.running_map.clear()
+                component.reset_after_fork()
+            else:
+                component.reset_after_fork()
+        # The providers are not locked before the fork, a load may hold their lock for a network call
+        for provider in list(CredentialProvider.instances):
+            provider.reset_after_fork()
+        async_token_manager = ForkHandler.async_token_manager()
+        if async_token_manager:
+            async_token_manager.reset_after_fork()
+        ForkHandler.log.debug("Reset the token cache and scheduler after fork, pid: %s", os.getpid())
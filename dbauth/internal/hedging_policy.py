@@ -0,0 +1,100 @@
+import collections
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dbauth.metrics import Metrics
+
+
+class HedgingPolicy:
+    """HedgingPolicy sends a second CAM request when the first one is slower than most recent requests.
+
+    The hedging delay is a percentile of the latencies of the last successful requests. When the first request has
+    not completed after the delay, a hedge is sent and the first successful response of the two is used, the other
+    request completes in the background and is ignored.
+    """
+    # The default percentile of the recent latencies after which a hedge is sent
+    DEFAULT_PERCENTILE = 95
+    # The default number of recent latencies the percentile is computed from
+    DEFAULT_WINDOW = 100
+    # The default number of latencies needed before the percentile is used
+    DEFAULT_MIN_SAMPLES = 20
+    # The default hedging delay in milliseconds until enough latencies are recorded
+    DEFAULT_INITIAL_DELAY = 1000
+    # The default lower bound of the hedging delay in milliseconds
+    DEFAULT_MIN_DELAY = 50
+    # The default number of threads sending the hedged requests
+    DEFAULT_MAX_WORKERS = 8
+
+    def __init__(self, percentile=DEFAULT_PERCENTILE, window=DEFAULT_WINDOW, min_samples=DEFAULT_MIN_SAMPLES,
+                 initial_delay=DEFAULT_INITIAL_DELAY, min_delay=DEFAULT_MIN_DELAY, max_workers=DEFAULT_MAX_WORKERS):
+        if not 0 < percentile < 100:
+            raise ValueError(f"Invalid percentile: {percentile}")
+        if window <= 0 or not 0 < min_samples <= window:
+            raise ValueError(f"Invalid window: {window}, min samples: {min_samples}")
+        if min_delay < 0 or initial_delay < min_delay:
+            raise ValueError(f"Invalid delays: {initial_delay}, {min_delay}")
+        if max_workers <= 0:
+            raise ValueError(f"Invalid max workers: {max_workers}")
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+        self.latencies = collections.deque(maxlen=window)
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def call(self, request, hedge, allow_hedge):
+        """Returns the response of request, or of hedge if request is slower than the hedging delay.
+
+        allow_hedge is called before sending the hedge, which is not sent if it returns False. If both requests fail,
+        the error of the last one is raised.
+        """
+        first = self.get_executor().submit(self._timed, request)
+        done, _ = wait([first], timeout=self.delay() / 1000)
+        if done or not allow_hedge():
+            return first.result()
+
+        Metrics.collector.increment(Metrics.CAM_REQUEST_HEDGES)
+        pending = {first, self.get_executor().submit(self._timed, hedge)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def delay(self):
+        """Returns the hedging delay in milliseconds."""
+        with self.lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_delay
+            latencies = sorted(self.latencies)
+        # The nearest-rank percentile
+        return max(self.min_delay, latencies[math.ceil(len(latencies) * self.percentile / 100) - 1])
+
+    def record(self, latency):
+        """Records the latency in milliseconds of a successful request."""
+        with self.lock:
+            self.latencies.append(latency)
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dbauth-hedge")
+            return self.executor
+
+    def reset_after_fork(self):
+        """Drops the thread pool of a forked parent process, whose threads do not exist in the child."""
+        self.lock = threading.Lock()
+        self.executor = None
+
+    def _timed(self, request):
+        start = time.perf_counter()
+        response = request()
+        self.record((time.perf_counter() - start) * 1000)
+        return response
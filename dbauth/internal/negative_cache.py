@@ -0,0 +1,58 @@
+import threading
+
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.utils import Utils
+
+
+class NegativeCache:
+    """NegativeCache remembers the terminal CAM errors of the keys for a short time.
+
+    While an error is cached, token requests of its key fail with the same error without calling CAM, so that a
+    misconfigured service does not send a CAM request on every call.
+    """
+    # The default time in milliseconds a terminal error is cached
+    DEFAULT_TTL = 10 * 1000
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        if ttl < 0:
+            raise ValueError(f"Invalid ttl: {ttl}")
+        self.ttl = ttl
+        # The cached errors and their expiry times, by key
+        self.error_map = {}
+        self.lock = threading.Lock()
+
+    def get_error(self, key):
+        """Returns a copy of the cached error of the key, None if there is none or it has expired."""
+        entry = self.error_map.get(key)
+        if entry is None:
+            return None
+        error, expires = entry
+        if expires <= Utils.get_current_time_millis():
+            with self.lock:
+                if self.error_map.get(key) is entry:
+                    del self.error_map[key]
+            return None
+        # A new exception, re-raising the cached one would keep growing its traceback
+        return TencentCloudSDKException(error.code, error.message, error.requestId)
+
+    def set_error(self, key, error):
+        if self.ttl == 0:
+            return
+        with self.lock:
+            self.error_map[key] = (error, Utils.get_current_time_millis() + self.ttl)
+
+    def clear(self, key=None):
+        """Forgets the error of the key, or all errors if key is None."""
+        with self.lock:
+            if key is None:
+                self.error_map.clear()
+            else:
+                self.error_map.pop(key, None)
+
+    def reset_after_fork(self):
+        """Replaces the lock inherited by a forked child process."""
+        self.lock = threading.Lock()
+
+    def size(self):
+        return len(self.error_map)
@@ -0,0 +1,54 @@
+import random
+
+
+class RefreshPolicy:
+    """RefreshPolicy decides when a cached authentication token should be refreshed."""
+    # The default fraction of the token lifetime after which the token is refreshed
+    DEFAULT_REFRESH_FRACTION = 0.5
+    # The default fraction of the refresh delay that is randomized
+    DEFAULT_JITTER_FRACTION = 0.1
+    # The default lower bound of the refresh delay in milliseconds
+    DEFAULT_MIN_DELAY = 5 * 1000
+    # The default upper bound of the refresh delay in milliseconds
+    DEFAULT_MAX_DELAY = 15 * 60 * 1000
+    # The default delay before retrying a failed refresh in milliseconds
+    DEFAULT_RETRY_INTERVAL = 5 * 1000
+
+    def __init__(self, refresh_fraction=DEFAULT_REFRESH_FRACTION, jitter_fraction=DEFAULT_JITTER_FRACTION,
+                 min_delay=DEFAULT_MIN_DELAY, max_delay=DEFAULT_MAX_DELAY, retry_interval=DEFAULT_RETRY_INTERVAL):
+        if not 0 < refresh_fraction <= 1:
+            raise ValueError(f"Invalid refresh fraction: {refresh_fraction}")
+        if not 0 <= jitter_fraction < 1:
+            raise ValueError(f"Invalid jitter fraction: {jitter_fraction}")
+        if min_delay <= 0 or max_delay < min_delay:
+            raise ValueError(f"Invalid delay bounds: [{min_delay}, {max_delay}]")
+        if retry_interval <= 0:
+            raise ValueError(f"Invalid retry interval: {retry_interval}")
+
+        self.refresh_fraction = refresh_fraction
+        self.jitter_fraction = jitter_fraction
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.retry_interval = retry_interval
+
+    def next_refresh_delay(self, lifetime, remaining):
+        """Returns the delay in milliseconds before refreshing a token.
+
+        lifetime is the validity period reported by the server when the token was issued, remaining is the time left
+        before the token expires locally. The token is refreshed once the fraction of its lifetime has passed, so a
+        token that was issued a while ago, e.g. restored from a snapshot or shared by another process, is refreshed
+        sooner than a new one.
+        """
+        delay = remaining - lifetime * (1 - self.refresh_fraction)
+        if self.jitter_fraction:
+            # Spread the refreshes of tokens issued at the same moment
+            delay += lifetime * self.refresh_fraction * random.uniform(-self.jitter_fraction, self.jitter_fraction)
+        delay = max(self.min_delay, min(delay, self.max_delay))
+        # Never wait beyond the expiry of the token
+        if 0 < remaining < delay:
+            delay = remaining
+        return int(delay)
+
+    def next_retry_delay(self):
+        """Returns the delay in milliseconds before retrying a failed refresh."""
+        return self.retry_interval
@@ -0,0 +1,134 @@
+import heapq
+import itertools
+import threading
+
+from dbauth.internal.utils import Utils
+from dbauth.metrics import Metrics
+
+
+class RefreshQueue:
+    """RefreshQueue limits the CAM requests of the process with a token bucket.
+
+    Each CAM request waits in a priority queue for a permit. Requests of callers that missed the cache go first, in
+    arrival order, then the background refreshes, the refresh of the token closest to its expiry first. A caller that
+    waits for the background refresh of its key promotes the refresh to its own priority.
+    """
+    # The priority of a token requested by a caller
+    ON_DEMAND = 0
+    # The priority of a token refreshed in the background
+    BACKGROUND = 1
+    # The default number of permits added per second
+    DEFAULT_RATE = 50
+    # The default maximum number of permits, the size of a burst of requests
+    DEFAULT_BURST = 100
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, clock=None):
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}")
+        if burst < 1:
+            raise ValueError(f"Invalid burst: {burst}")
+        self.rate = rate
+        self.burst = burst
+        # The time source of the refills, in milliseconds
+        self.clock = clock or Utils.clock
+        self.permits = burst
+        self.refilled_at = self.clock.millis()
+        # The waiting requests, [priority, order, arrival] lists ordered as such
+        self.waiters = []
+        # The waiting request of each key
+        self.waiting = {}
+        # The priority of the callers waiting for the request of each key
+        self.promotions = {}
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.clock.add_listener(self._wakeup)
+
+    def acquire(self, priority, order, key=None):
+        """Waits for a permit and returns the time waited in milliseconds.
+
+        Requests of the same priority are served by ascending order, the arrival time of a caller or the expiry time of
+        a refreshed token. The request of a key is served at least at the priority the key was promoted to.
+        """
+        start = self.clock.millis()
+        with self.condition:
+            entry = [*min((priority, order), self.promotions.get(key, (priority, order))), next(self.sequence)]
+            if key is not None:
+                self.waiting[key] = entry
+            heapq.heappush(self.waiters, entry)
+            Metrics.collector.gauge(Metrics.REFRESH_QUEUE_DEPTH, len(self.waiters))
+            # A request ahead of the current head must not wait for its timeout
+            self.condition.notify_all()
+            try:
+                while True:
+                    self._refill()
+                    if self.waiters[0] is not entry:
+                        self.condition.wait()
+                    elif self.permits < 1:
+                        self.condition.wait(self.clock.real_timeout((1 - self.permits) * 1000 / self.rate))
+                    else:
+                        break
+                heapq.heappop(self.waiters)
+                self.permits -= 1
+            except BaseException:
+                self.waiters.remove(entry)
+                heapq.heapify(self.waiters)
+                raise
+            finally:
+                if key is not None and self.waiting.get(key) is entry:
+                    del self.waiting[key]
+                Metrics.collector.gauge(Metrics.REFRESH_QUEUE_DEPTH, len(self.waiters))
+                # Let the next request check for a permit
+                self.condition.notify_all()
+        waited = self.clock.millis() - start
+        Metrics.collector.observe(Metrics.REFRESH_QUEUE_WAIT, waited)
+        return waited
+
+    def promote(self, key, priority, order):
+        """Serves the requests of the key at least at the priority and order of a caller waiting for them, until the
+        key is forgotten."""
+        with self.condition:
+            promotion = min((priority, order), self.promotions.get(key, (priority, order)))
+            self.promotions[key] = promotion
+            entry = self.waiting.get(key)
+            if entry is not None and promotion < (entry[0], entry[1]):
+                entry[0], entry[1] = promotion
+                heapq.heapify(self.waiters)
+                # The promoted request may now be the head
+                self.condition.notify_all()
+
+    def forget(self, key):
+        """Drops the promotion of the key once its requests are done."""
+        with self.condition:
+            self.promotions.pop(key, None)
+
+    def try_acquire(self):
+        """Takes a permit if one is available and no request is waiting, returns whether it was taken."""
+        with self.condition:
+            self._refill()
+            if self.waiters or self.permits < 1:
+                return False
+            self.permits -= 1
+            return True
+
+    def depth(self):
+        """Returns the number of requests waiting for a permit."""
+        return len(self.waiters)
+
+    def reset_after_fork(self):
+        """Replaces the lock inherited by a forked child process, the waiting threads do not exist in the child."""
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.waiters = []
+        self.waiting = {}
+        self.promotions = {}
+
+    def _refill(self):
+        """Adds the permits accrued since the last refill, must be called with the lock held."""
+        now = self.clock.millis()
+        self.permits = min(self.burst, self.permits + (now - self.refilled_at) * self.rate / 1000)
+        self.refilled_at = now
+
+    def _wakeup(self):
+        with self.condition:
+            self.condition.notify_all()
@@ -0,0 +1,49 @@
+import random
+
+
+class RetryPolicy:
+    """RetryPolicy decides how failed CAM requests are retried.
+
+    Within a call, retries wait an exponential backoff with full jitter and stop at the call deadline. Failed
+    background refreshes are retried with an exponential backoff growing with the number of consecutive failures.
+    """
+    # The default number of attempts of a CAM request within a call
+    DEFAULT_MAX_ATTEMPTS = 3
+    # The default base of the backoff between two attempts in milliseconds
+    DEFAULT_BASE_DELAY = 100
+    # The default upper bound of the backoff between two attempts in milliseconds
+    DEFAULT_MAX_DELAY = 2 * 1000
+    # The default time in milliseconds after which a call stops retrying
+    DEFAULT_DEADLINE = 30 * 1000
+    # The default upper bound of the delay before retrying a failed background refresh in milliseconds
+    DEFAULT_MAX_BACKGROUND_DELAY = 5 * 60 * 1000
+
+    def __init__(self, max_attempts=DEFAULT_MAX_ATTEMPTS, base_delay=DEFAULT_BASE_DELAY, max_delay=DEFAULT_MAX_DELAY,
+                 deadline=DEFAULT_DEADLINE, max_background_delay=DEFAULT_MAX_BACKGROUND_DELAY):
+        if max_attempts <= 0:
+            raise ValueError(f"Invalid max attempts: {max_attempts}")
+        if base_delay < 0 or max_delay < base_delay:
+            raise ValueError(f"Invalid delay bounds: [{base_delay}, {max_delay}]")
+        if deadline <= 0:
+            raise ValueError(f"Invalid deadline: {deadline}")
+        if max_background_delay <= 0:
+            raise ValueError(f"Invalid max background delay: {max_background_delay}")
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.max_background_delay = max_background_delay
+
+    def backoff(self, retry):
+        """Returns the delay in milliseconds before the retry-th retry of a call, starting at 1."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (retry - 1)))
+
+    def next_background_delay(self, failures, retry_interval):
+        """Returns the delay in milliseconds before retrying a background refresh after consecutive failures.
+
+        The delay doubles from retry_interval with each failure, half of it is randomized so that the keys failing
+        together do not retry in lockstep.
+        """
+        delay = min(self.max_background_delay, retry_interval * 2 ** max(0, failures - 1))
+        return int(delay / 2 + random.uniform(0, delay / 2))
@@ -0,0 +1,191 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from dbauth.internal.auth_token_parser import AuthTokenParser
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+
+
+class SharedTokenStore:
+    """SharedTokenStore shares authentication tokens between the processes of a host through a SQLite database.
+
+    The database runs in WAL mode so that readers do not block the writer. Tokens are stored encrypted with the key
+    AuthTokenParser derives from the instance, region and user name. Before requesting a token, a process takes a
+    lease on its key, the other processes wait for the token it publishes instead of requesting their own.
+    """
+    # The default time in milliseconds after which the lease of a process that did not publish a token is released
+    DEFAULT_LEASE_TIMEOUT = 30 * 1000
+    # The default time in milliseconds a process waits for the token published by the lease holder
+    DEFAULT_WAIT_TIMEOUT = 5 * 1000
+    # The interval in milliseconds between two reads while waiting for the lease holder
+    POLL_INTERVAL = 100
+    # The time in milliseconds to wait for the database lock of another process
+    BUSY_TIMEOUT = 5 * 1000
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, path, lease_timeout=DEFAULT_LEASE_TIMEOUT, wait_timeout=DEFAULT_WAIT_TIMEOUT):
+        if lease_timeout <= 0:
+            raise ValueError(f"Invalid lease timeout: {lease_timeout}")
+        if wait_timeout < 0:
+            raise ValueError(f"Invalid wait timeout: {wait_timeout}")
+        self.path = str(path)
+        self.lease_timeout = lease_timeout
+        self.wait_timeout = wait_timeout
+        self.connection = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def get_or_fetch(self, request, auth_key, is_fresh, fetch):
+        """Returns the shared token of the key if is_fresh accepts it, otherwise a token returned by fetch.
+
+        Only the process holding the lease of the key calls fetch and publishes the token, the other processes wait
+        for it. They call fetch themselves if it is not published within the wait timeout or the store fails.
+        """
+        try:
+            token = self.get_token(request, auth_key)
+            if token and is_fresh(token):
+                return token
+            if not self.try_acquire_lease(auth_key):
+                token = self._wait_for_token(request, auth_key, is_fresh)
+                if token:
+                    return token
+                self.log.warning("The shared token was not published in time, requesting the token")
+                return self._fetch_and_publish(request, auth_key, fetch)
+        except sqlite3.Error as e:
+            self.log.error("Failed to read the shared token store", exc_info=e)
+            return fetch()
+
+        try:
+            return self._fetch_and_publish(request, auth_key, fetch)
+        finally:
+            try:
+                self.release_lease(auth_key)
+            except sqlite3.Error as e:
+                self.log.error("Failed to release the lease of the shared token", exc_info=e)
+
+    def get_token(self, request, auth_key):
+        """Returns the shared token of the key, None if there is none or it has expired."""
+        with self.lock:
+            row = self._connect().execute("SELECT token, expires_at, lifetime FROM tokens WHERE auth_key = ?",
+                                          (auth_key,)).fetchone()
+        if not row:
+            return None
+        sealed, expires_at, lifetime = row
+        remaining = expires_at - Utils.get_wall_time_millis()
+        if remaining <= 0:
+            return None
+        try:
+            auth_token = AuthTokenParser.unseal(request.instance_id, request.region, request.user_name, sealed)
+        except AuthTokenParser.AuthTokenParserError as e:
+            self.log.error("Failed to decrypt the shared token", exc_info=e)
+            return None
+        return Token(auth_token, Utils.get_current_time_millis() + remaining, lifetime)
+
+    def set_token(self, request, auth_key, token):
+        """Publishes the token of the key to the other processes."""
+        sealed = AuthTokenParser.seal(request.instance_id, request.region, request.user_name, token.get_auth_token())
+        now = Utils.get_wall_time_millis()
+        expires_at = Utils.get_wall_time_millis(token.get_expires())
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("INSERT OR REPLACE INTO tokens (auth_key, token, expires_at, lifetime, updated_at) "
+                                   "VALUES (?, ?, ?, ?, ?)", (auth_key, sealed, expires_at, token.get_lifetime(), now))
+
+    def try_acquire_lease(self, auth_key):
+        """Elects the process as the one requesting the token of the key, returns whether it was elected."""
+        now = Utils.get_wall_time_millis()
+        owner = self._owner()
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                # Take the write lock before reading the lease so that two processes cannot both take it
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute("SELECT owner, expires_at FROM leases WHERE auth_key = ?",
+                                         (auth_key,)).fetchone()
+                if row and row[0] != owner and row[1] > now:
+                    return False
+                connection.execute("INSERT OR REPLACE INTO leases (auth_key, owner, expires_at) VALUES (?, ?, ?)",
+                                   (auth_key, owner, now + self.lease_timeout))
+                return True
+
+    def release_lease(self, auth_key):
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM leases WHERE auth_key = ? AND owner = ?", (auth_key, self._owner()))
+
+    def remove_token(self, auth_key):
+        with self.lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("DELETE FROM tokens WHERE auth_key = ?", (auth_key,))
+
+    def publish(self, request, auth_key, token):
+        """Publishes the token like set_token, logging instead of raising the errors of the store."""
+        try:
+            self.set_token(request, auth_key, token)
+        except sqlite3.Error as e:
+            self.log.error("Failed to publish the shared token", exc_info=e)
+
+    def _fetch_and_publish(self, request, auth_key, fetch):
+        token = fetch()
+        self.publish(request, auth_key, token)
+        return token
+
+    def _wait_for_token(self, request, auth_key, is_fresh):
+        deadline = time.monotonic() + self.wait_timeout / 1000
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL / 1000)
+            token = self.get_token(request, auth_key)
+            if token and is_fresh(token):
+                return token
+        return None
+
+    def reset_after_fork(self):
+        """Replaces the lock inherited by a forked child process, the connection is reopened on next use."""
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def _owner(self):
+        return f"{os.getpid()}:{id(self)}"
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+            self.connection = None
+
+    def _connect(self):
+        """Returns the connection of the process, must be called with the lock held."""
+        if self.connection is not None and self.pid == os.getpid():
+            return self.connection
+
+        # A connection inherited from the parent process must not be used in the child. The tokens are only sealed
+        # with a key derived from the request, so the database, its WAL and shared memory files are created with
+        # owner-only permissions: SQLite creates the WAL files with the permissions of the database.
+        umask = os.umask(0o077)
+        try:
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            connection = sqlite3.connect(self.path, timeout=self.BUSY_TIMEOUT / 1000, isolation_level=None,
+                                         check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+        finally:
+            os.umask(umask)
+        for path in [self.path, self.path + "-wal", self.path + "-shm"]:
+            try:
+                os.chmod(path, 0o600)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.log.warning(f"Failed to restrict the permissions of {path}", exc_info=e)
+        connection.execute("CREATE TABLE IF NOT EXISTS tokens (auth_key TEXT PRIMARY KEY, token TEXT NOT NULL, "
+                           "expires_at INTEGER NOT NULL, lifetime INTEGER, updated_at INTEGER NOT NULL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS leases (auth_key TEXT PRIMARY KEY, owner TEXT NOT NULL, "
+                           "expires_at INTEGER NOT NULL)")
+        self.connection, self.pid = connection, os.getpid()
+        return connection
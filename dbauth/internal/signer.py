@@ -1,26 +1,33 @@
-import base64
 import json
 import logging
+import time
 from datetime import datetime
 
 from tencentcloud.cam.v20190116 import errorcodes
-from tencentcloud.cam.v20190116.cam_client import CamClient
-from tencentcloud.cam.v20190116.models import AuthToken
-from tencentcloud.cam.v20190116.models import BuildDataFlowAuthTokenRequest
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 
-from dbauth.internal.auth_token_parser import AuthTokenParser
+from dbauth.internal.circuit_breaker import CircuitBreakerRegistry
+from dbauth.internal.client_pool import ClientPool
 from dbauth.internal.constants import Constants
+from dbauth.internal.deadline_executor import DeadlineExecutor
 from dbauth.internal.error_code_matcher import ErrorCodeMatcher
+from dbauth.internal.negative_cache import NegativeCache
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.refresh_queue import RefreshQueue
+from dbauth.internal.retry_policy import RetryPolicy
+from dbauth.internal.single_flight import SingleFlight
 from dbauth.internal.timer_manager import TimerManager
 from dbauth.internal.token import Token
 from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.token_event_bus import TokenEventBus
 from dbauth.internal.utils import Utils
+from dbauth.metrics import Metrics
+from dbauth.model.token_event import TokenEvent
 
 
 class Signer:
     """Signer is a utility class that provides methods for generating and updating authentication tokens."""
-    # The interval to update the token in milliseconds
+    # The validity period assumed for a token whose rotation time is already past, in milliseconds
     TOKEN_UPDATE_INTERVAL = 5 * 1000
 
     log = logging.getLogger(__name__)
@@ -28,29 +35,76 @@ class Signer:
     timer_manager = TimerManager()
     # The token cache to store the authentication token
     token_cache = TokenCache()
+    # The policy to decide when the token is refreshed
+    refresh_policy = RefreshPolicy()
+    # The policy to decide how failed CAM requests and refreshes are retried
+    retry_policy = RetryPolicy()
+    # Limits the rate of the CAM requests of the process, callers that missed the cache go before background refreshes
+    refresh_queue = RefreshQueue()
+    # Sends a second CAM request when the first one is slow, None to disable
+    hedging_policy = None
+    # Runs the token builds of the callers waiting with a deadline
+    deadline_executor = DeadlineExecutor()
+    # The circuit breakers of the CAM endpoints
+    circuit_breakers = CircuitBreakerRegistry()
+    # The pool of CAM clients reused across token requests
+    client_pool = ClientPool()
+    # Coalesces concurrent builds of the same key into one CAM request
+    single_flight = SingleFlight()
+    # The terminal errors returned without calling CAM until they expire
+    negative_cache = NegativeCache()
+    # Delivers the token changes to their subscribers
+    token_events = TokenEventBus()
+    # The file keeping the tokens across restarts, None to disable
+    token_snapshot = None
+    # The store sharing the tokens between the processes of the host, None to disable
+    shared_store = None
 
     def __init__(self, request):
         # The request to generate the authentication token
         self.request = request
-        key = (request.region + Constants.DELIMITER + request.instance_id + Constants.DELIMITER + request.user_name
-               + Constants.DELIMITER + request.credential.secret_id)
         # The authentication key
-        self.authKey = base64.b64encode(key.encode()).decode()
+        self.authKey = request.get_auth_key()
+        # The number of consecutive failed refreshes of the key
+        self.consecutive_failures = 0
+        # The expiry time of the token being refreshed in the background, None while a caller is waiting for the token
+        self.refreshing_expiry = None
 
     def get_auth_token_from_cache(self):
         """Returns the authentication token from the cache."""
         return self.token_cache.get_auth_token(self.authKey)
 
-    def build_auth_token(self):
-        """Builds the authentication token."""
+    def build_auth_token_once(self, force=False):
+        """Builds the authentication token once for all concurrent callers of the key and returns it.
+
+        A forced build requests a new token from CAM even if a token is saved or shared, forced builds do not join the
+        regular builds, which may return the token being replaced.
+        """
+        if force:
+            return self.single_flight.do(self.authKey + Constants.DELIMITER + "force",
+                                         lambda: self.build_auth_token(force=True))
+        return self.single_flight.do(self.authKey, self.build_auth_token, self.promote_refresh)
+
+    def build_auth_token_within(self, timeout):
+        """Builds the authentication token like build_auth_token_once, waiting for it at most timeout milliseconds.
+
+        Raises TencentCloudSDKException with the code Constants.TIMEOUT_ERROR when the deadline passes, the build
+        continues in the background.
+        """
+        return self.deadline_executor.run(self.single_flight, self.authKey, self.build_auth_token, timeout,
+                                          self.promote_refresh)
+
+    def build_auth_token(self, force=False):
+        """Builds the authentication token and returns it."""
         self.log.debug("Building authentication token for key")
         try:
             # 1. Request the authentication token
-            token = self.get_auth_token()
-            dt = datetime.fromtimestamp(token.get_expires() / 1000.0)
+            token = self.fetch_auth_token(force)
+            dt = datetime.fromtimestamp(Utils.get_wall_time_millis(token.get_expires()) / 1000.0)
             self.log.debug("Successfully get the authentication token, expiry: %s",
                            dt.strftime("%Y-%m-%d %H:%M:%S"))
             self.set_token_and_update_task(token)
+            return token
         except TencentCloudSDKException as e:
             # 2. If the error code requires user notification, throw the exception
             if ErrorCodeMatcher.is_user_notification_required(e.code):
@@ -61,18 +115,90 @@ class Signer:
             if fallback_token:
                 self.log.info("Using the fallback token")
                 self.set_token_and_update_task(fallback_token)
+                return fallback_token
             else:
                 # 4. If there is no fallback token, throw the exception
                 raise e
 
     def set_token_and_update_task(self, token):
         """Sets the authentication token and updates the token update task."""
-        self.token_cache.set_auth_token(self.authKey, token)
-        self.update_auth_token_task(token.get_expires())
+        previous_token = self.token_cache.peek_auth_token(self.authKey)
+        evicted_keys = self.token_cache.set_auth_token(self.authKey, token)
+        # Stop refreshing the tokens evicted from the cache
+        for key in evicted_keys:
+            if key != self.authKey:
+                self.timer_manager.cancel_timer(key)
+                self.token_events.publish(TokenEvent(TokenEvent.REMOVED, key))
+                if self.token_snapshot is not None:
+                    self.token_snapshot.discard(key)
+        if self.authKey not in evicted_keys:
+            self.update_auth_token_task(token)
+            self.publish_token_change(previous_token, token)
+            if self.token_snapshot is not None and token.get_lifetime():
+                self.token_snapshot.record(self, token, self.timer_manager)
+
+    def publish_token_change(self, previous_token, token):
+        """Notifies the subscribers of the key when the token value changes or the fallback token is used."""
+        previous_value = previous_token.get_auth_token() if previous_token else None
+        if not token.get_lifetime():
+            # The token was not issued by the server, it is the fallback token
+            if previous_token is None or previous_token.get_lifetime() or previous_value != token.get_auth_token():
+                self.token_events.publish(TokenEvent(TokenEvent.FALLBACK, self.authKey, self.request,
+                                                     token.get_auth_token()))
+        elif previous_token is not None and previous_value != token.get_auth_token():
+            self.token_events.publish(TokenEvent(TokenEvent.ROTATED, self.authKey, self.request,
+                                                 token.get_auth_token()))
+
+    def publish_token_removal(self):
+        self.token_events.publish(TokenEvent(TokenEvent.REMOVED, self.authKey, self.request))
+        if self.token_snapshot is not None:
+            self.token_snapshot.discard(self.authKey)
+
+    def fetch_auth_token(self, force=False):
+        """Returns the authentication token saved before a restart or shared by another process, or requests it.
+
+        force skips the saved and shared tokens, the requested token replaces the shared one.
+        """
+        if force:
+            token = self.get_auth_token()
+            shared_store = self.shared_store
+            if shared_store is not None:
+                shared_store.publish(self.request, self.authKey, token)
+            return token
+        token_snapshot = self.token_snapshot
+        if token_snapshot is not None:
+            token = token_snapshot.restore(self)
+            if token:
+                self.log.debug("Restored the authentication token from the token snapshot")
+                return token
+        shared_store = self.shared_store
+        if shared_store is None:
+            return self.get_auth_token()
+        return shared_store.get_or_fetch(self.request, self.authKey, self.is_fresh, self.get_auth_token)
+
+    def is_fresh(self, token):
+        """Returns whether the token has not yet reached its refresh point."""
+        if not token.get_lifetime():
+            return False
+        elapsed = token.get_lifetime() - (token.get_expires() - Utils.get_current_time_millis())
+        return elapsed < token.get_lifetime() * self.refresh_policy.refresh_fraction
 
     def get_auth_token(self):
         """Returns the authentication token."""
-        response = self.request_auth_token()
+        error = self.negative_cache.get_error(self.authKey)
+        if error:
+            Metrics.collector.increment(Metrics.NEGATIVE_CACHE_HITS)
+            self.log.debug("Returning the cached terminal error without requesting AuthToken")
+            raise error
+        try:
+            response = self.request_auth_token()
+        except TencentCloudSDKException as e:
+            if ErrorCodeMatcher.is_user_notification_required(e.code):
+                self.negative_cache.set_error(self.authKey, e)
+            raise e
+        finally:
+            # The callers that joined the request have their answer
+            self.refresh_queue.forget(self.authKey)
         request_id = response.RequestId if response else ""  # Get the request ID
         if not response:
             self.log.error("Failed to request AuthToken, response is null")
@@ -80,6 +206,8 @@ class Signer:
                                            "Failed to request AuthToken, response is null",
                                            request_id)
 
+        from tencentcloud.cam.v20190116.models import AuthToken
+
         token_response = AuthToken()
         token_response.from_json_string(response.Credentials.to_json_string())
         if not token_response:
@@ -106,12 +234,14 @@ class Signer:
         cam_server_time = token_response.CurrentTime
         auth_token_expires = token_response.NextRotationTime
 
-        # Calculate the expiry time of the authToken
+        # Calculate the expiry time and the lifetime of the authToken
         expiry = self.expiry(cam_server_time, auth_token_expires)
-        return Token(auth_token, expiry)
+        return Token(auth_token, expiry, self.lifetime(cam_server_time, auth_token_expires))
 
     def decrypt_auth_token(self, enc_auth_token):
         """Decrypt the authentication token."""
+        from dbauth.internal.auth_token_parser import AuthTokenParser
+
         token_info = AuthTokenParser.parse_auth_token(self.request.instance_id, self.request.region,
                                                       self.request.user_name, enc_auth_token)
         return token_info.password
@@ -122,8 +252,16 @@ class Signer:
             return Utils.get_current_time_millis() + self.TOKEN_UPDATE_INTERVAL
         return Utils.get_current_time_millis() + (auth_token_expires - cam_server_time)
 
+    def lifetime(self, cam_server_time, auth_token_expires):
+        """Calculate the validity period of the authentication token reported by the server."""
+        if auth_token_expires < cam_server_time:
+            return self.TOKEN_UPDATE_INTERVAL
+        return auth_token_expires - cam_server_time
+
     def request_auth_token(self):
         """Requests an authentication token from the server."""
+        from tencentcloud.cam.v20190116.models import BuildDataFlowAuthTokenRequest
+
         req = BuildDataFlowAuthTokenRequest()
         params = {
             "ResourceId": self.request.instance_id,
@@ -133,19 +271,52 @@ class Signer:
         req.from_json_string(json.dumps(params))
 
         last_exception = None
-        client = self.create_client()
-        for _ in range(3):
+        retry_policy = self.retry_policy
+        breaker = self.circuit_breakers.get(self.request.region, self.request.client_profile)
+        deadline = Utils.get_current_time_millis() + retry_policy.deadline
+        credential = self.resolve_credential()
+        # Keyed by the identity of the credential, a rotated credential replaces the client signing with the old one
+        client = self.client_pool.get_client(credential, self.request.region, self.request.client_profile,
+                                             lambda: self.create_client(credential),
+                                             identity=self.request.get_identity())
+        for attempt in range(retry_policy.max_attempts):
+            if attempt:
+                delay = retry_policy.backoff(attempt)
+                if Utils.get_current_time_millis() + delay >= deadline:
+                    self.log.error("Failed to request AuthToken, the retry deadline is reached")
+                    break
+                Metrics.collector.increment(Metrics.CAM_REQUEST_RETRIES)
+                time.sleep(delay / 1000)
+            self.refresh_queue.acquire(*self.refresh_priority(), key=self.authKey)
+            if not breaker.allow_request():
+                # Fail fast while the endpoint is failing, the caller falls back to the cached or fallback token
+                Metrics.collector.increment(Metrics.CAM_REQUEST_REJECTIONS)
+                self.log.error("Failed to request AuthToken, the circuit of %s is open", breaker.name)
+                raise TencentCloudSDKException(Constants.CIRCUIT_OPEN_ERROR,
+                                               "The circuit of {} is open".format(breaker.name), "")
+            start = time.perf_counter()
             try:
-                return client.BuildDataFlowAuthToken(req)
+                response = self.send_request(client, req, credential)
+                Metrics.collector.observe(Metrics.CAM_REQUEST_LATENCY, (time.perf_counter() - start) * 1000)
+                breaker.record_success()
+                return response
             except TencentCloudSDKException as e:
+                Metrics.collector.observe(Metrics.CAM_REQUEST_LATENCY, (time.perf_counter() - start) * 1000)
+                Metrics.collector.increment(Metrics.CAM_REQUEST_ERRORS)
                 last_exception = e
                 if ErrorCodeMatcher.is_user_notification_required(e.code):
+                    # The endpoint answered, the failure is not its own
+                    breaker.record_success()
                     self.log.error("Failed to request AuthToken, error: %s", e)
                     break
                 else:
+                    breaker.record_failure()
                     self.log.error("Failed to request AuthToken, Retry to request the token,"
                                    " TencentCloudSDKException: %s", e)
             except Exception as e:
+                Metrics.collector.observe(Metrics.CAM_REQUEST_LATENCY, (time.perf_counter() - start) * 1000)
+                Metrics.collector.increment(Metrics.CAM_REQUEST_ERRORS)
+                breaker.record_failure()
                 self.log.error("Failed to request AuthToken, Retry to request the token, Exception: %s", e)
                 last_exception = TencentCloudSDKException(errorcodes.INTERNALERROR,
                                                           "Failed to request AuthToken, error: {}".format(e),
@@ -153,35 +324,110 @@ class Signer:
 
         raise last_exception
 
-    def create_client(self):
+    def send_request(self, client, req, credential):
+        """Sends the BuildDataFlowAuthToken request, hedged by a second request if the hedging policy is set."""
+        hedging_policy = self.hedging_policy
+        if hedging_policy is None:
+            return client.BuildDataFlowAuthToken(req)
+
+        def hedge():
+            # Send the hedge with another client, the first request may be stuck on its connection
+            hedge_client = self.client_pool.get_client(credential, self.request.region, self.request.client_profile,
+                                                       lambda: self.create_client(credential),
+                                                       identity=self.request.get_identity() + Constants.DELIMITER +
+                                                       "hedge")
+            return hedge_client.BuildDataFlowAuthToken(req)
+
+        # A hedge is only sent while the refresh queue has a spare permit
+        return hedging_policy.call(lambda: client.BuildDataFlowAuthToken(req), hedge, self.refresh_queue.try_acquire)
+
+    def refresh_priority(self):
+        """Returns the priority and the order of the CAM request in the refresh queue."""
+        if self.refreshing_expiry is None:
+            return RefreshQueue.ON_DEMAND, Utils.get_current_time_millis()
+        return RefreshQueue.BACKGROUND, self.refreshing_expiry
+
+    def promote_refresh(self):
+        """Serves the request of the key, e.g. a background refresh the caller joined, at the priority of the caller."""
+        self.refresh_queue.promote(self.authKey, *self.refresh_priority())
+
+    def resolve_credential(self):
+        """Returns the credential of the request, resolved from its provider at request time."""
+        try:
+            return self.request.get_credential()
+        except TencentCloudSDKException:
+            raise
+        except Exception as e:
+            self.log.error("Failed to resolve the credential, error: %s", e)
+            raise TencentCloudSDKException(errorcodes.INTERNALERROR,
+                                           "Failed to resolve the credential, error: {}".format(e), "")
+
+    def create_client(self, credential=None):
         """Creates a new CAM client."""
+        from tencentcloud.cam.v20190116.cam_client import CamClient
+        from tencentcloud.common.profile.client_profile import ClientProfile
+
+        if credential is None:
+            credential = self.request.get_credential()
         if self.request.client_profile:
-            return CamClient(self.request.credential, self.request.region, self.request.client_profile)
-        client = CamClient(self.request.credential, self.request.region)
-        client.profile.httpProfile.reqTimeout = 30  # Set the request timeout to 30 seconds
-        return client
+            return CamClient(credential, self.request.region, self.request.client_profile)
+        profile = ClientProfile()
+        profile.httpProfile.reqTimeout = 30  # Set the request timeout to 30 seconds
+        profile.httpProfile.keepAlive = True  # Keep the connection alive, the client is reused
+        return CamClient(credential, self.request.region, profile)
 
-    def update_auth_token_task(self, auth_token_expiry):
+    def update_auth_token_task(self, token):
         """Updates the authentication token task."""
-        # Calculate the remaining time before the token expires
-        remaining_time_before_expiry = auth_token_expiry - Utils.get_current_time_millis()
-        # Get the delay for the next token update
-        delay_for_next_token_update = min(remaining_time_before_expiry, self.TOKEN_UPDATE_INTERVAL)
-
+        delay_for_next_token_update = self.next_update_delay(token)
         self.log.debug("Scheduling next token key update in %s ms", delay_for_next_token_update)
 
-        # Save the timer for the next token update
-        self.timer_manager.save_timer(self.authKey, delay_for_next_token_update, self.auth_token_update_callback)
+        # Save the timer for the next token update, a token not issued by the server is retried with backoff
+        self.timer_manager.save_timer(self.authKey, delay_for_next_token_update, self.auth_token_update_callback,
+                                      not token.get_lifetime())
+
+    def retry_auth_token_task(self):
+        """Schedules a retry of a failed token update."""
+        delay_for_next_token_update = self.next_retry_delay()
+        self.log.debug("Scheduling token key update retry in %s ms", delay_for_next_token_update)
+        self.timer_manager.save_timer(self.authKey, delay_for_next_token_update, self.auth_token_update_callback,
+                                      True)
+
+    def next_update_delay(self, token):
+        """Returns the delay in milliseconds before the token should be updated."""
+        if not token.get_lifetime():
+            # The token was not issued by the server (e.g. the fallback token), keep retrying
+            return self.next_retry_delay()
+        self.consecutive_failures = 0
+        # Refresh at a fraction of the lifetime reported by the server
+        remaining_time_before_expiry = token.get_expires() - Utils.get_current_time_millis()
+        return self.refresh_policy.next_refresh_delay(token.get_lifetime(), remaining_time_before_expiry)
+
+    def next_retry_delay(self):
+        """Returns the delay in milliseconds before retrying a failed update, backing off with each failure."""
+        self.consecutive_failures += 1
+        return self.retry_policy.next_background_delay(self.consecutive_failures,
+                                                       self.refresh_policy.next_retry_delay())
 
     def auth_token_update_callback(self):
+        cached_token = self.token_cache.peek_auth_token(self.authKey)
+        if self.token_cache.evict_idle(self.authKey):
+            # Stop refreshing a token that is no longer requested
+            self.log.info("The authentication token is idle or evicted, stop updating the token")
+            if cached_token:
+                self.publish_token_removal()
+            return
+        self.refreshing_expiry = cached_token.get_expires() if cached_token else Utils.get_current_time_millis()
         try:
-            self.build_auth_token()
+            self.build_auth_token_once()
         except TencentCloudSDKException as e:
             if ErrorCodeMatcher.is_user_notification_required(e.code):
                 # If a user notification is required, remove the token from the cache
                 self.log.error("Failed to update the authentication token, error: %s", e)
                 self.token_cache.remove_auth_token(self.authKey)
+                self.publish_token_removal()
             else:
                 # If an internal error occurs, try to update the token again
                 self.log.error("Failed to update the authentication token, Retry to update the token, error: %s", e)
-                self.update_auth_token_task(Utils.get_current_time_millis() + self.TOKEN_UPDATE_INTERVAL)
+                self.retry_auth_token_task()
+        finally:
+            self.refreshing_expiry = None
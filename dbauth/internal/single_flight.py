@@ -0,0 +1,95 @@
+import threading
+
+from dbauth.metrics import Metrics
+
+
+class SingleFlight:
+    """SingleFlight coalesces concurrent calls for the same key into a single execution.
+
+    The first caller of a key runs the function, every caller that arrives while it is running waits for and receives
+    the same result or error.
+    """
+
+    class Call:
+        """An execution in flight and its outcome."""
+
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+        def outcome(self):
+            """Returns the result of the completed execution or raises its error."""
+            if self.error:
+                raise self.error
+            return self.result
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        # The number of executions of the function
+        self.executions = 0
+        # The number of callers that received the outcome of another caller's execution
+        self.coalesced = 0
+
+    def do(self, key, fn, on_join=None):
+        """Runs fn once for all concurrent callers of key and returns its result or raises its error.
+
+        on_join is called by the callers that join the execution of another caller, before they wait for it.
+        """
+        call, leader = self._join(key, on_join)
+        if leader:
+            self._execute(key, call, fn)
+        else:
+            call.done.wait()
+        return call.outcome()
+
+    def start(self, key, fn, submit, on_join=None):
+        """Starts fn once for all concurrent callers of key and returns the call without waiting for it.
+
+        Only the first caller of the key passes the execution to submit, e.g. the submit method of a thread pool, the
+        other callers receive the call in flight.
+        """
+        call, leader = self._join(key, on_join)
+        if leader:
+            submit(lambda: self._execute(key, call, fn))
+        return call
+
+    def _join(self, key, on_join):
+        """Returns the call in flight for key, or a new one, and whether the caller leads it."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = SingleFlight.Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+                Metrics.collector.increment(Metrics.SINGLE_FLIGHT_COALESCED)
+        if not leader and on_join is not None:
+            on_join()
+        return call, leader
+
+    def _execute(self, key, call, fn):
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+
+    def reset_after_fork(self):
+        """Forgets the executions of a forked parent process, whose threads do not exist in the child."""
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def in_flight(self, key):
+        """Returns whether an execution for key is running."""
+        return key in self.calls
+
+    def stats(self):
+        """Returns the execution and coalescing counters."""
+        with self.lock:
+            return {"executions": self.executions, "coalesced": self.coalesced}
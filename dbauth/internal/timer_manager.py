@@ -1,19 +1,63 @@
+import heapq
+import itertools
 import logging
+import queue
 import threading
 
 from dbauth.internal.constants import Constants
+from dbauth.internal.utils import Utils
+from dbauth.metrics import Metrics
 
 
 class TimerManager:
-    """TimerManager is a utility class that provides methods for managing timer tasks."""
+    """TimerManager is a utility class that provides methods for managing timer tasks.
 
-    def __init__(self):
+    All timers share a single scheduler thread backed by a priority queue, due tasks run on a bounded pool of worker
+    threads.
+    """
+    # The default number of worker threads running the due tasks
+    DEFAULT_MAX_WORKERS = 4
+
+    class Timer:
+        """A scheduled task, kept in the priority queue until it is due or cancelled."""
+
+        def __init__(self, key, deadline, task, backoff=False):
+            self.key = key
+            self.deadline = deadline
+            self.task = task
+            # Whether the timer retries a failed task, it must not be run earlier
+            self.backoff = backoff
+            self.cancelled = False
+
+        def cancel(self):
+            self.cancelled = True
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, clock=None):
+        if max_workers <= 0:
+            raise ValueError(f"Invalid max workers: {max_workers}")
+        self.max_workers = max_workers
+        # The time source of the deadlines, in milliseconds
+        self.clock = clock or Utils.clock
         self.timer_map = {}
+        # The timers dispatched to the workers and not finished yet
+        self.running_map = {}
+        self.timer_queue = []
+        self.cancelled_count = 0
+        self.sequence = itertools.count()
         self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.scheduler_thread = None
+        self.task_queue = queue.Queue()
+        self.workers = []
+        self.idle_workers = 0
         self.log = logging.getLogger(__name__)
+        self.clock.add_listener(self._wakeup)
 
-    def save_timer(self, key, delay, task):
-        """Saves a timer task that runs after a specified interval."""
+    def save_timer(self, key, delay, task, backoff=False):
+        """Saves a timer task that runs after a specified interval.
+
+        backoff marks the retry of a failed task, expedite does not run it earlier.
+        """
         if not key:
             self.log.warning("Key is empty, skipping timer creation.")
             return
@@ -23,22 +67,47 @@ class TimerManager:
             return
 
         with self.lock:
-            timer = threading.Timer(delay / 1000, task)
-            timer.daemon = True  # Set the timer thread as a daemon
-            timer.start()
+            self._save(key, delay, task, backoff)
 
-            # If a timer with the same key exists, cancel it and remove it from the map
-            if key in self.timer_map:
-                self.timer_map[key].cancel()
-                del self.timer_map[key]
+    def expedite(self, key, delay, task):
+        """Runs task after delay unless the timer of the key is running, is due by then or backs off after a failure.
 
-            self.timer_map[key] = timer
+        Returns whether the task was scheduled.
+        """
+        if not key or delay <= 0 or delay > Constants.MAX_DELAY:
+            self.log.warning(f"Invalid key or delay: {key}, {delay}, skipping timer creation.")
+            return False
+
+        with self.lock:
+            if key in self.running_map:
+                return False
+            timer = self.timer_map.get(key)
+            if timer and (timer.backoff or timer.deadline <= self.clock.millis() + delay):
+                return False
+            self._save(key, delay, task, False)
+            return True
+
+    def _save(self, key, delay, task, backoff):
+        """Saves a timer, replacing the timer of the key, must be called with the lock held."""
+        # If a timer with the same key exists, cancel it and remove it from the map
+        if key in self.timer_map:
+            self._cancel(self.timer_map.pop(key))
+
+        timer = TimerManager.Timer(key, self.clock.millis() + delay, task, backoff)
+        heapq.heappush(self.timer_queue, (timer.deadline, next(self.sequence), timer))
+        self.timer_map[key] = timer
+        Metrics.collector.gauge(Metrics.LIVE_TIMERS, len(self.timer_map))
+
+        self._ensure_scheduler()
+        # Wake up the scheduler if the new timer is the earliest one
+        if self.timer_queue[0][2] is timer:
+            self.condition.notify()
 
     def cancel_timer(self, key):
         with self.lock:
             if key in self.timer_map:
-                self.timer_map[key].cancel()
-                del self.timer_map[key]
+                self._cancel(self.timer_map.pop(key))
+                Metrics.collector.gauge(Metrics.LIVE_TIMERS, len(self.timer_map))
                 self.log.info(f"Timer cancelled for key: {key}")
             else:
                 self.log.warning(f"No timer found for key: {key}")
@@ -48,4 +117,120 @@ class TimerManager:
             for timer in self.timer_map.values():
                 timer.cancel()
             self.timer_map.clear()
+            self.running_map.clear()
+            Metrics.collector.gauge(Metrics.LIVE_TIMERS, 0)
+            self.timer_queue = []
+            self.cancelled_count = 0
+            # Stop the scheduler thread, it is started again by the next timer
+            self.scheduler_thread = None
+            self.condition.notify_all()
+            # Stop the workers once the pending tasks are discarded
+            task_queue, workers = self.task_queue, self.workers
+            self.task_queue, self.workers, self.idle_workers = queue.Queue(), [], 0
+        self._drain(task_queue)
+        for _ in workers:
+            task_queue.put(None)
         self.log.info("TimerManager shutdown complete.")
+
+    def _cancel(self, timer):
+        timer.cancel()
+        self.cancelled_count += 1
+        # Rebuild the queue once most of its entries are cancelled
+        if self.cancelled_count > len(self.timer_queue) // 2:
+            self.timer_queue = [entry for entry in self.timer_queue if not entry[2].cancelled]
+            heapq.heapify(self.timer_queue)
+            self.cancelled_count = 0
+
+    def _wakeup(self):
+        with self.condition:
+            self.condition.notify_all()
+
+    def _ensure_scheduler(self):
+        if self.scheduler_thread is None:
+            self.scheduler_thread = threading.Thread(target=self._schedule, name="dbauth-timer-scheduler")
+            self.scheduler_thread.daemon = True
+            self.scheduler_thread.start()
+
+    def _schedule(self):
+        with self.condition:
+            while self.scheduler_thread is threading.current_thread():
+                if not self.timer_queue:
+                    self.condition.wait()
+                    continue
+
+                deadline, _, timer = self.timer_queue[0]
+                if timer.cancelled:
+                    heapq.heappop(self.timer_queue)
+                    self.cancelled_count = max(0, self.cancelled_count - 1)
+                    continue
+
+                timeout = deadline - self.clock.millis()
+                if timeout > 0:
+                    self.condition.wait(self.clock.real_timeout(timeout))
+                    continue
+
+                heapq.heappop(self.timer_queue)
+                if self.timer_map.get(timer.key) is timer:
+                    del self.timer_map[timer.key]
+                    Metrics.collector.gauge(Metrics.LIVE_TIMERS, len(self.timer_map))
+                Metrics.collector.observe(Metrics.SCHEDULER_LAG, -timeout)
+                self._dispatch(timer)
+
+    def _dispatch(self, timer):
+        """Hands a due timer to the worker pool, must be called with the lock held."""
+        self.running_map[timer.key] = timer
+        self.task_queue.put(timer)
+        if self.idle_workers > 0:
+            self.idle_workers -= 1
+        elif len(self.workers) < self.max_workers:
+            worker = threading.Thread(target=self._work, args=(self.task_queue,),
+                                      name=f"dbauth-timer-worker-{len(self.workers)}")
+            worker.daemon = True
+            self.workers.append(worker)
+            worker.start()
+
+    def _work(self, task_queue):
+        while True:
+            timer = task_queue.get()
+            if timer is None:
+                return
+            if not timer.cancelled:
+                try:
+                    timer.task()
+                except Exception as e:
+                    self.log.error(f"Timer task failed for key: {timer.key}", exc_info=e)
+            with self.lock:
+                if self.running_map.get(timer.key) is timer:
+                    del self.running_map[timer.key]
+                if task_queue is not self.task_queue:
+                    continue
+                self.idle_workers += 1
+
+    def reset_after_fork(self):
+        """Rebuilds the scheduler in a forked child process, where the threads of the parent do not exist.
+
+        The timers pending in the parent keep their deadlines, the tasks that were running in the parent run again.
+        """
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.scheduler_thread = None
+        self.task_queue, self.workers, self.idle_workers = queue.Queue(), [], 0
+
+        now = self.clock.millis()
+        for key, timer in self.running_map.items():
+            if key not in self.timer_map:
+                self.timer_map[key] = TimerManager.Timer(key, now, timer.task, timer.backoff)
+        self.running_map = {}
+        self.timer_queue = [(timer.deadline, next(self.sequence), timer) for timer in self.timer_map.values()]
+        heapq.heapify(self.timer_queue)
+        self.cancelled_count = 0
+        if self.timer_queue:
+            self._ensure_scheduler()
+
+    @staticmethod
+    def _drain(task_queue):
+        while True:
+            try:
+                task_queue.get_nowait()
+            except queue.Empty:
+                return
@@ -1,12 +1,17 @@
 class Token:
     """Represents an authentication token with its expiration time."""
 
-    def __init__(self, auth_token, expires):
+    def __init__(self, auth_token, expires, lifetime=None):
         self.auth_token = auth_token
         self.expires = expires
+        # The validity period reported by the server in milliseconds, None if the token was not issued by the server
+        self.lifetime = lifetime
 
     def get_auth_token(self):
         return self.auth_token
 
     def get_expires(self):
         return self.expires
+
+    def get_lifetime(self):
+        return self.lifetime
@@ -1,71 +1,154 @@
+import heapq
+import itertools
 import logging
-import os
-from pathlib import Path
 from threading import Lock
 
+from dbauth.fallback_provider import FileFallbackProvider
 from dbauth.internal.constants import Constants
 from dbauth.internal.token import Token
 from dbauth.internal.utils import Utils
+from dbauth.metrics import Metrics
 
 
 class TokenCache:
-    MAX_PASSWORD_SIZE = 200
+    """TokenCache holds the authentication tokens by key.
 
-    def __init__(self):
+    Reads take no lock, they rely on single dict operations being atomic, so that cache hits do not contend with each
+    other. Writes and evictions are serialized by the lock. The least recently requested keys are evicted first.
+    """
+    # The default maximum number of cached tokens
+    DEFAULT_MAX_SIZE = 10000
+    # The default time in milliseconds after which a token that is not requested is evicted
+    DEFAULT_IDLE_TIMEOUT = 60 * 60 * 1000
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT, fallback_provider=None):
+        if max_size <= 0:
+            raise ValueError(f"Invalid max size: {max_size}")
+        if idle_timeout <= 0:
+            raise ValueError(f"Invalid idle timeout: {idle_timeout}")
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        # Supplies the passwords used when no token can be requested
+        self.fallback_provider = fallback_provider or FileFallbackProvider()
         self.token_map = {}
+        # The time of the last request of each key
+        self.access_map = {}
+        # The order of the last request of each key, breaks the ties of access times
+        self.recency_map = {}
+        self.access_counter = itertools.count()
+        self.last_sweep = Utils.get_current_time_millis()
+        self.size_evictions = 0
+        self.idle_evictions = 0
         self.log = logging.getLogger(__name__)
         self.lock = Lock()
 
     def get_auth_token(self, key):
-        with self.lock:
-            return self.token_map.get(key)
+        token = self.token_map.get(key)
+        if token:
+            self.access_map[key] = Utils.get_current_time_millis()
+            self.recency_map[key] = next(self.access_counter)
+        return token
+
+    def peek_auth_token(self, key):
+        """Returns the token of the key without counting it as a request."""
+        return self.token_map.get(key)
 
     def set_auth_token(self, key, token):
-        if key and token:
-            with self.lock:
-                self.token_map[key] = token
+        """Caches the token, a refresh does not count as a request of the key.
+
+        Returns the keys evicted to make room for the token or because they were idle.
+        """
+        if not key or not token:
+            return []
+        now = Utils.get_current_time_millis()
+        with self.lock:
+            if key not in self.token_map:
+                self.access_map[key] = now
+                self.recency_map[key] = next(self.access_counter)
+            self.token_map[key] = token
+
+            evicted = []
+            if now - self.last_sweep >= self.idle_timeout // 2:
+                evicted.extend(self._sweep_idle(now))
+            if len(self.token_map) > self.max_size:
+                lru_keys = heapq.nsmallest(len(self.token_map) - self.max_size, self.token_map,
+                                           key=lambda k: self.recency_map.get(k, -1))
+                for lru_key in lru_keys:
+                    self._remove(lru_key)
+                self.size_evictions += len(lru_keys)
+                evicted.extend(lru_keys)
+            Metrics.collector.gauge(Metrics.LIVE_KEYS, len(self.token_map))
+        if evicted:
+            Metrics.collector.increment(Metrics.CACHE_EVICTIONS, len(evicted))
+            self.log.info(f"Evicted {len(evicted)} authentication tokens from the cache")
+        return evicted
 
     def remove_auth_token(self, key):
         with self.lock:
-            self.token_map.pop(key, None)
+            self._remove(key)
+            Metrics.collector.gauge(Metrics.LIVE_KEYS, len(self.token_map))
 
-    def fallback(self, request):
-        input_file_path = self.generate_input_file_path(request)
-        if not input_file_path or not input_file_path.exists():
-            return None
+    def reset_after_fork(self, keep_tokens=True):
+        """Replaces the lock inherited by a forked child process, optionally dropping the tokens of the parent."""
+        self.lock = Lock()
+        if hasattr(self.fallback_provider, "reset_after_fork"):
+            self.fallback_provider.reset_after_fork()
+        if not keep_tokens:
+            self.token_map.clear()
+            self.access_map.clear()
+            self.recency_map.clear()
 
-        try:
-            file_size = input_file_path.stat().st_size
-            self.log.info(f"File Name: {input_file_path}, File Size: {file_size}")
+    def is_idle(self, key):
+        """Returns whether the key was not requested within the idle timeout or is no longer cached."""
+        last_access = self.access_map.get(key)
+        return last_access is None or Utils.get_current_time_millis() - last_access >= self.idle_timeout
 
-            if file_size == 0 or file_size > self.MAX_PASSWORD_SIZE:
-                self.log.error(f"Invalid file size: {input_file_path}")
-                return None
+    def evict_idle(self, key):
+        """Evicts the key if it is idle, returns whether the key is no longer cached."""
+        with self.lock:
+            if key not in self.token_map:
+                return True
+            if not self.is_idle(key):
+                return False
+            self._remove(key)
+            self.idle_evictions += 1
+            Metrics.collector.gauge(Metrics.LIVE_KEYS, len(self.token_map))
+        Metrics.collector.increment(Metrics.CACHE_EVICTIONS)
+        return True
 
-            lines = input_file_path.read_text().splitlines()
-            if len(lines) == 0:
-                return None
-            if len(lines) > 1:
-                self.log.error(f"The file has more than one line, skip the file: {input_file_path}")
-                return None
+    def size(self):
+        return len(self.token_map)
 
-            password = lines[0]
-            if not password:
-                return None
+    def stats(self):
+        """Returns the cache size and eviction counters."""
+        with self.lock:
+            return {"size": len(self.token_map), "size_evictions": self.size_evictions,
+                    "idle_evictions": self.idle_evictions}
 
-            self.log.info(f"Reading password: {input_file_path}")
-            return Token(password, Utils.get_current_time_millis() + Constants.MAX_DELAY)
+    def _sweep_idle(self, now):
+        """Evicts the idle keys, must be called with the lock held."""
+        self.last_sweep = now
+        evicted = [key for key in self.token_map if now - self.access_map.get(key, now) >= self.idle_timeout]
+        for key in evicted:
+            self._remove(key)
+        # Drop the access records of the keys removed while a lock-free read was recording them
+        for key in [key for key in list(self.access_map) if key not in self.token_map]:
+            self.access_map.pop(key, None)
+            self.recency_map.pop(key, None)
+        self.idle_evictions += len(evicted)
+        return evicted
 
-        except Exception as e:
-            self.log.error(f"Failed to read password: {input_file_path}", exc_info=e)
-            return None
+    def _remove(self, key):
+        """Removes the key, must be called with the lock held."""
+        self.token_map.pop(key, None)
+        self.access_map.pop(key, None)
+        self.recency_map.pop(key, None)
 
-    def generate_input_file_path(self, request):
-        try:
-            region, instance_id, user_name = request.region, request.instance_id, request.user_name
-            path = Path(Constants.INPUT_PATH_DIR).joinpath(
-                f"{region}{Constants.DELIMITER}{instance_id}{Constants.DELIMITER}{user_name}.pwd")
-            return Path(os.getcwd()).joinpath(path)
-        except Exception as e:
-            self.log.error("Failed to decode key", exc_info=e)
+    def fallback(self, request):
+        """Returns the token built from the fallback password of the request, None if there is none."""
+        Metrics.collector.increment(Metrics.FALLBACK_LOOKUPS)
+        password = self.fallback_provider.get_password(request)
+        if not password:
             return None
+        Metrics.collector.increment(Metrics.FALLBACK_HITS)
+        return Token(password, Utils.get_current_time_millis() + Constants.MAX_DELAY)
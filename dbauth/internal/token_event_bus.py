@@ -0,0 +1,91 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dbauth.metrics import Metrics
+
+
+class TokenEventBus:
+    """TokenEventBus delivers token events to their subscribers on a bounded thread pool.
+
+    Callbacks never run on the thread that changed the token. When more than max_pending events wait for delivery,
+    new events are dropped so that slow callbacks cannot grow the memory of the process.
+    """
+    # The default number of threads running the callbacks
+    DEFAULT_MAX_WORKERS = 2
+    # The default number of events waiting for delivery beyond which events are dropped
+    DEFAULT_MAX_PENDING = 1000
+
+    class Subscription:
+        """A callback and the key it is subscribed to, None for all keys."""
+
+        def __init__(self, callback, auth_key):
+            self.callback = callback
+            self.auth_key = auth_key
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, max_pending=DEFAULT_MAX_PENDING):
+        if max_workers <= 0:
+            raise ValueError(f"Invalid max workers: {max_workers}")
+        if max_pending <= 0:
+            raise ValueError(f"Invalid max pending: {max_pending}")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.subscriptions = ()
+        self.executor = None
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.log = logging.getLogger(__name__)
+
+    def subscribe(self, callback, auth_key=None):
+        """Calls callback with each TokenEvent of the key, or of all keys if auth_key is None."""
+        subscription = TokenEventBus.Subscription(callback, auth_key)
+        with self.lock:
+            # Replace the tuple so that publish can read it without the lock
+            self.subscriptions = self.subscriptions + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = tuple(s for s in self.subscriptions if s is not subscription)
+
+    def publish(self, event):
+        subscriptions = self.subscriptions
+        if not subscriptions:
+            return
+        for subscription in subscriptions:
+            if subscription.auth_key is None or subscription.auth_key == event.auth_key:
+                self._submit(subscription.callback, event)
+
+    def _submit(self, callback, event):
+        with self.lock:
+            if self.pending >= self.max_pending:
+                Metrics.collector.increment(Metrics.TOKEN_EVENTS_DROPPED)
+                self.log.warning("Too many token events waiting for delivery, dropping %s", event)
+                return
+            self.pending += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="dbauth-events")
+            executor = self.executor
+        executor.submit(self._deliver, callback, event)
+
+    def _deliver(self, callback, event):
+        try:
+            callback(event)
+        except Exception as e:
+            self.log.error("Token event callback failed", exc_info=e)
+        finally:
+            with self.lock:
+                self.pending -= 1
+
+    def reset_after_fork(self):
+        """Drops the thread pool of a forked parent process, whose threads do not exist in the child."""
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+
+    def shutdown(self, wait=True):
+        """Stops the thread pool once the pending events are delivered, it is started again on the next event."""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor:
+            executor.shutdown(wait=wait)
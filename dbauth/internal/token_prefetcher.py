@@ -0,0 +1,56 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from dbauth.model.token_prefetch_result import TokenPrefetchResult
+
+
+class TokenPrefetcher:
+    """TokenPrefetcher fetches the authentication tokens of many requests in parallel."""
+    # The default number of tokens fetched at the same time
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    log = logging.getLogger(__name__)
+
+    @staticmethod
+    def prefetch(token_requests, generate, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """Calls generate for each request with at most max_concurrency calls at the same time.
+
+        Returns a dict mapping each request to its TokenPrefetchResult.
+        """
+        if max_concurrency <= 0:
+            raise ValueError(f"Invalid max concurrency: {max_concurrency}")
+        token_requests = list(token_requests)
+        if not token_requests:
+            return {}
+
+        def fetch(token_request):
+            try:
+                return TokenPrefetchResult(token_request, token=generate(token_request))
+            except Exception as e:
+                TokenPrefetcher.log.error("Failed to prefetch the authentication token", exc_info=e)
+                return TokenPrefetchResult(token_request, error=e)
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(token_requests)),
+                                thread_name_prefix="dbauth-prefetch") as executor:
+            results = list(executor.map(fetch, token_requests))
+        return {result.request: result for result in results}
+
+    @staticmethod
+    def load_requests(path, credential, client_profile=None):
+        """Loads token requests from a JSON file.
+
+        The file holds a list of objects with the region, instance_id and user_name of each token, all requests use
+        the given credential and client profile.
+        """
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError(f"The prefetch file must contain a list of requests: {path}")
+        return [GenerateAuthenticationTokenRequest(region=entry.get("region"),
+                                                   instance_id=entry.get("instance_id"),
+                                                   user_name=entry.get("user_name"),
+                                                   credential=credential,
+                                                   client_profile=client_profile)
+                for entry in entries]
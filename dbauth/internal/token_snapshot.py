@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+
+
+class TokenSnapshot:
+    """TokenSnapshot keeps the cached tokens in a file so that a restarted process can serve them immediately.
+
+    Each token is encrypted with AES-GCM under a key derived from the secret key of its credential and its cache key,
+    so the file is useless without the credentials. The file is replaced atomically. Since a token can only be
+    decrypted with its credential, the loaded tokens are restored when their key is first requested, and their refresh
+    is scheduled then.
+    """
+    # The default time in milliseconds between a token refresh and the write of the snapshot
+    DEFAULT_WRITE_DELAY = 5 * 1000
+    # The key of the write timer in the timer manager
+    TIMER_KEY = "dbauth-token-snapshot"
+    VERSION = 1
+
+    log = logging.getLogger(__name__)
+
+    def __init__(self, path, write_delay=DEFAULT_WRITE_DELAY):
+        # The write is scheduled with the timer manager, which rejects a delay of 0
+        if write_delay <= 0:
+            raise ValueError(f"Invalid write delay: {write_delay}")
+        self.path = str(path)
+        self.write_delay = write_delay
+        # The encrypted entries of the cached tokens, by key
+        self.entries = {}
+        # The entries loaded from the file and not restored yet, by key
+        self.pending = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Reads the unexpired tokens of the file, returns their number."""
+        try:
+            with open(self.path, encoding="utf-8") as snapshot:
+                data = json.load(snapshot)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            self.log.error(f"Failed to read the token snapshot {self.path}", exc_info=e)
+            return 0
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            self.log.warning(f"Ignoring the token snapshot {self.path} of an unknown version")
+            return 0
+
+        now = Utils.get_wall_time_millis()
+        entries = {key: entry for key, entry in data.get("tokens", {}).items() if entry.get("expires_at", 0) > now}
+        with self.lock:
+            self.pending.update(entries)
+            for key, entry in entries.items():
+                self.entries.setdefault(key, entry)
+        self.log.info(f"Loaded {len(entries)} tokens from the token snapshot {self.path}")
+        return len(entries)
+
+    def restore(self, signer):
+        """Returns the loaded token of the signer's key, once, None if there is none or it cannot be decrypted."""
+        with self.lock:
+            entry = self.pending.pop(signer.authKey, None)
+        if entry is None:
+            return None
+        remaining = entry["expires_at"] - Utils.get_wall_time_millis()
+        if remaining <= 0:
+            return None
+        from Crypto.Cipher import AES
+
+        try:
+            cipher = AES.new(self.derive_key(signer), AES.MODE_GCM, nonce=base64.b64decode(entry["nonce"]))
+            cipher.update(signer.authKey.encode())
+            auth_token = cipher.decrypt_and_verify(base64.b64decode(entry["token"]),
+                                                   base64.b64decode(entry["tag"])).decode()
+        except (KeyError, ValueError, TencentCloudSDKException) as e:
+            # The credential changed since the snapshot was written, or it cannot be resolved
+            self.log.warning("Failed to decrypt a token of the token snapshot", exc_info=e)
+            return None
+        return Token(auth_token, Utils.get_current_time_millis() + remaining, entry.get("lifetime"))
+
+    def record(self, signer, token, timer_manager=None):
+        """Adds the token to the snapshot, the file is written write_delay later with the timer manager, if given."""
+        from Crypto.Cipher import AES
+
+        cipher = AES.new(self.derive_key(signer), AES.MODE_GCM)
+        cipher.update(signer.authKey.encode())
+        encrypted, tag = cipher.encrypt_and_digest(token.get_auth_token().encode())
+        entry = {
+            "token": base64.b64encode(encrypted).decode(),
+            "nonce": base64.b64encode(cipher.nonce).decode(),
+            "tag": base64.b64encode(tag).decode(),
+            "expires_at": Utils.get_wall_time_millis(token.get_expires()),
+            "lifetime": token.get_lifetime(),
+        }
+        with self.lock:
+            self.entries[signer.authKey] = entry
+            self.pending.pop(signer.authKey, None)
+            schedule = not self.dirty
+            self.dirty = True
+        if schedule and timer_manager is not None:
+            timer_manager.save_timer(self.TIMER_KEY, self.write_delay, self.write)
+
+    def discard(self, key):
+        """Removes the token of the key, from the file at the next write."""
+        with self.lock:
+            self.entries.pop(key, None)
+            self.pending.pop(key, None)
+
+    def write(self):
+        """Writes the unexpired tokens to a temporary file then replaces the snapshot with it."""
+        now = Utils.get_wall_time_millis()
+        with self.lock:
+            self.dirty = False
+            self.entries = {key: entry for key, entry in self.entries.items() if entry["expires_at"] > now}
+            data = {"version": self.VERSION, "tokens": dict(self.entries)}
+
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as snapshot:
+                json.dump(data, snapshot)
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(temporary_path, self.path)
+        except OSError as e:
+            self.log.error(f"Failed to write the token snapshot {self.path}", exc_info=e)
+            try:
+                os.remove(temporary_path)
+            except OSError:
+                pass
+
+    def reset_after_fork(self):
+        """Replaces the lock inherited by a forked child process."""
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def derive_key(signer):
+        secret_key = signer.resolve_credential().secret_key
+        return hmac.new(secret_key.encode(), signer.authKey.encode(), hashlib.sha256).digest()
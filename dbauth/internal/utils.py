@@ -1,7 +1,23 @@
-from datetime import datetime
+from dbauth.internal.clock import SystemClock
 
 
 class Utils:
+    # The time source of the expiry and scheduling math, replaced to simulate time
+    clock = SystemClock()
+
     @staticmethod
     def get_current_time_millis():
-        return int(datetime.now().timestamp() * 1000)
+        """Returns the monotonic time in milliseconds, only meaningful to compute durations and deadlines."""
+        return Utils.clock.millis()
+
+    @staticmethod
+    def get_wall_time_millis(current_time_millis=None):
+        """Returns the wall time in milliseconds of a time returned by get_current_time_millis, or of now."""
+        if current_time_millis is None:
+            return Utils.clock.wall_millis()
+        return Utils.clock.wall_millis() + current_time_millis - Utils.clock.millis()
+
+    @staticmethod
+    def set_clock(clock):
+        """Replaces the time source, the tokens already cached keep deadlines of the previous clock."""
+        Utils.clock = clock
@@ -0,0 +1,139 @@
+import bisect
+import threading
+
+
+class MetricsCollector:
+    """MetricsCollector receives the metrics of the SDK, the default implementation discards them.
+
+    Implement this class to forward the metrics to a monitoring system and install it with Metrics.set_collector.
+    """
+
+    def increment(self, name, value=1):
+        """Adds value to a counter."""
+
+    def observe(self, name, value):
+        """Records a sample of a histogram, durations are in milliseconds."""
+
+    def gauge(self, name, value):
+        """Sets the current value of a gauge."""
+
+
+class InMemoryMetricsCollector(MetricsCollector):
+    """A thread-safe collector that keeps the metrics in process memory and can be snapshotted."""
+    # The default upper bounds of the histogram buckets in milliseconds
+    DEFAULT_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                # The bucket counts followed by the overflow count, the sample count and the sample sum
+                histogram = self.histograms[name] = [0] * (len(self.buckets) + 1) + [0, 0]
+            histogram[bisect.bisect_left(self.buckets, value)] += 1
+            histogram[-2] += 1
+            histogram[-1] += value
+
+    def gauge(self, name, value):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self):
+        """Returns a copy of the metrics, histogram buckets are cumulative like Prometheus buckets."""
+        with self.lock:
+            histograms = {}
+            for name, histogram in self.histograms.items():
+                cumulative, buckets = 0, {}
+                for bound, count in zip(self.buckets + ("+Inf",), histogram):
+                    cumulative += count
+                    buckets[bound] = cumulative
+                histograms[name] = {"buckets": buckets, "count": histogram[-2], "sum": histogram[-1]}
+            return {"counters": dict(self.counters), "gauges": dict(self.gauges), "histograms": histograms}
+
+    def reset_after_fork(self):
+        """Replaces the lock inherited by a forked child process."""
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def to_prometheus(self):
+        """Returns the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.extend([f"# TYPE {name} counter", f"{name} {value}"])
+        for name, value in sorted(snapshot["gauges"].items()):
+            lines.extend([f"# TYPE {name} gauge", f"{name} {value}"])
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {name} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+            lines.extend([f"{name}_sum {histogram['sum']}", f"{name}_count {histogram['count']}"])
+        return "\n".join(lines) + "\n"
+
+
+class Metrics:
+    """Metrics holds the collector of the SDK and the names of the metrics it reports."""
+    # Tokens returned from the cache by generate_authentication_token
+    CACHE_HITS = "dbauth_cache_hits_total"
+    # Calls of generate_authentication_token that had to request a token
+    CACHE_MISSES = "dbauth_cache_misses_total"
+    # Stale tokens returned while they are refreshed in the background
+    CACHE_STALE_HITS = "dbauth_cache_stale_hits_total"
+    # Tokens evicted from the cache
+    CACHE_EVICTIONS = "dbauth_cache_evictions_total"
+    # Callers that received the token built for another caller
+    SINGLE_FLIGHT_COALESCED = "dbauth_single_flight_coalesced_total"
+    # The latency of a BuildDataFlowAuthToken request in milliseconds
+    CAM_REQUEST_LATENCY = "dbauth_cam_request_latency_ms"
+    # BuildDataFlowAuthToken requests that failed
+    CAM_REQUEST_ERRORS = "dbauth_cam_request_errors_total"
+    # BuildDataFlowAuthToken requests retried after a failure
+    CAM_REQUEST_RETRIES = "dbauth_cam_request_retries_total"
+    # BuildDataFlowAuthToken requests sent again because the first request was slow
+    CAM_REQUEST_HEDGES = "dbauth_cam_request_hedges_total"
+    # Calls that stopped waiting for a token at their deadline
+    DEADLINE_EXCEEDED = "dbauth_deadline_exceeded_total"
+    # BuildDataFlowAuthToken requests rejected because the circuit of the endpoint is open
+    CAM_REQUEST_REJECTIONS = "dbauth_cam_request_rejections_total"
+    # The number of CAM requests waiting for a permit of the refresh queue
+    REFRESH_QUEUE_DEPTH = "dbauth_refresh_queue_depth"
+    # The time a CAM request waited for a permit of the refresh queue, in milliseconds
+    REFRESH_QUEUE_WAIT = "dbauth_refresh_queue_wait_ms"
+    # Token requests failed with a cached terminal error instead of calling CAM
+    NEGATIVE_CACHE_HITS = "dbauth_negative_cache_hits_total"
+    # The time to decrypt a token in milliseconds
+    DECRYPT_TIME = "dbauth_decrypt_time_ms"
+    # Lookups of the fallback password file
+    FALLBACK_LOOKUPS = "dbauth_fallback_lookups_total"
+    # Fallback passwords used in place of a CAM token
+    FALLBACK_HITS = "dbauth_fallback_hits_total"
+    # Token events dropped because too many events were waiting for delivery
+    TOKEN_EVENTS_DROPPED = "dbauth_token_events_dropped_total"
+    # The delay between the deadline of a timer and the moment it is dispatched, in milliseconds
+    SCHEDULER_LAG = "dbauth_scheduler_lag_ms"
+    # The number of cached tokens
+    LIVE_KEYS = "dbauth_live_keys"
+    # The number of scheduled timers
+    LIVE_TIMERS = "dbauth_live_timers"
+
+    collector = MetricsCollector()
+
+    @staticmethod
+    def set_collector(collector):
+        """Installs the collector receiving the metrics, None restores the no-op collector."""
+        Metrics.collector = collector or MetricsCollector()
@@ -1,10 +1,20 @@
+import base64
+from typing import TYPE_CHECKING
+
 from tencentcloud.cam.v20190116 import errorcodes
-from tencentcloud.common import credential as Credential
 from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 
+from dbauth.credential_provider import CredentialProvider
+from dbauth.internal.constants import Constants
+
+if TYPE_CHECKING:
+    # The credential module imports requests, it is loaded by the caller creating the credential
+    from tencentcloud.common import credential as Credential
+
 
 class GenerateAuthenticationTokenRequest:
-    def __init__(self, region: str, instance_id: str, user_name: str, credential: Credential, client_profile=None):
+    def __init__(self, region: str, instance_id: str, user_name: str, credential: "Credential", client_profile=None):
+        """credential is a credential of the SDK or a CredentialProvider, resolved when a token is requested."""
         if not region:
             raise TencentCloudSDKException(
                 errorcodes.INVALIDPARAMETER_RESOURCEREGIONERROR, "The region is invalid."
@@ -17,7 +27,9 @@ class GenerateAuthenticationTokenRequest:
             raise TencentCloudSDKException(
                 errorcodes.INVALIDPARAMETER_USERNAMEILLEGAL, "The userName is invalid."
             )
-        if not credential or not credential.secretId or not credential.secretKey:
+        # The credential of a provider is resolved when a token is requested
+        if not isinstance(credential, CredentialProvider) and (
+                not credential or not credential.secretId or not credential.secretKey):
             raise TencentCloudSDKException(
                 errorcodes.RESOURCENOTFOUND_SECRETNOTEXIST, "The credential is invalid."
             )
@@ -27,3 +39,27 @@ class GenerateAuthenticationTokenRequest:
         self.user_name = user_name
         self.credential = credential
         self.client_profile = client_profile
+        # The secret id and the auth key computed from it
+        self._auth_key = None
+
+    def get_auth_key(self) -> str:
+        """Returns the key of the request in the token cache, computed again only when the identity changes."""
+        identity = self.get_identity()
+        auth_key = self._auth_key
+        if auth_key is None or auth_key[0] != identity:
+            key = (self.region + Constants.DELIMITER + self.instance_id + Constants.DELIMITER + self.user_name
+                   + Constants.DELIMITER + identity)
+            auth_key = self._auth_key = (identity, base64.b64encode(key.encode()).decode())
+        return auth_key[1]
+
+    def get_identity(self) -> str:
+        """Returns the identity of the credential, the identity of a provider or the secret id of a credential."""
+        if isinstance(self.credential, CredentialProvider):
+            return self.credential.identity
+        return self.credential.secret_id
+
+    def get_credential(self):
+        """Returns the credential to sign a CAM request with, resolved from the provider if there is one."""
+        if isinstance(self.credential, CredentialProvider):
+            return self.credential.get_credential()
+        return self.credential
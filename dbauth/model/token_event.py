@@ -0,0 +1,20 @@
+class TokenEvent:
+    """A change of the authentication token of a key, delivered to the subscribers of the key."""
+    # The token was replaced by a token with a different value
+    ROTATED = "rotated"
+    # The token could not be requested and the fallback password is used instead
+    FALLBACK = "fallback"
+    # The token was removed from the cache, after a terminal error or because it was evicted
+    REMOVED = "removed"
+
+    def __init__(self, event_type, auth_key, request=None, auth_token=None):
+        self.event_type = event_type
+        # The key of the token in the cache, see GenerateAuthenticationTokenRequest.get_auth_key
+        self.auth_key = auth_key
+        # The request of the token, None when the token was evicted by another key
+        self.request = request
+        # The new token, None if the token was removed
+        self.auth_token = auth_token
+
+    def __repr__(self):
+        return f"TokenEvent({self.event_type}, {self.auth_key})"
@@ -0,0 +1,10 @@
+class TokenPrefetchResult:
+    """The outcome of prefetching the authentication token of a request."""
+
+    def __init__(self, request, token=None, error=None):
+        self.request = request
+        self.token = token
+        self.error = error
+
+    def is_success(self) -> bool:
+        return self.error is None
@@ -0,0 +1,46 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from dbauth.internal.circuit_breaker import CircuitBreakerRegistry
+from dbauth.internal.client_pool import ClientPool
+from dbauth.internal.deadline_executor import DeadlineExecutor
+from dbauth.internal.negative_cache import NegativeCache
+from dbauth.internal.refresh_queue import RefreshQueue
+from dbauth.internal.signer import Signer
+from dbauth.internal.single_flight import SingleFlight
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.token_event_bus import TokenEventBus
+
+
+class SignerTestCase(unittest.TestCase):
+    """A TestCase whose tests can run against fresh Signer singletons.
+
+    The stateful singletons of Signer are listed once in isolate_signer, a new singleton only has to be added there.
+    """
+
+    def isolate_signer(self, **overrides):
+        """Replaces the stateful Signer singletons with fresh ones until the end of the test and returns them by name.
+
+        The keywords replace the defaults or other Signer attributes, e.g. a policy. The timers are a MagicMock, tests
+        that run them pass a TimerManager.
+        """
+        values = {"timer_manager": MagicMock(), "token_cache": TokenCache(), "single_flight": SingleFlight(),
+                  "client_pool": ClientPool(), "refresh_queue": RefreshQueue(),
+                  "circuit_breakers": CircuitBreakerRegistry(), "negative_cache": NegativeCache(),
+                  "deadline_executor": DeadlineExecutor(), "hedging_policy": None, "token_events": TokenEventBus(),
+                  "shared_store": None, "token_snapshot": None}
+        values.update(overrides)
+        self.patch_attributes(Signer, **values)
+        if isinstance(values["client_pool"], ClientPool):
+            # Close the keep-alive connections of the clients created by the test
+            self.addCleanup(values["client_pool"].invalidate)
+        if isinstance(values["deadline_executor"], DeadlineExecutor):
+            self.addCleanup(values["deadline_executor"].shutdown)
+        return values
+
+    def patch_attributes(self, target, **values):
+        """Replaces the attributes of target until the end of the test."""
+        for name, value in values.items():
+            patcher = patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
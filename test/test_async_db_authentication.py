@@ -0,0 +1,166 @@
+import asyncio
+import gc
+import threading
+import weakref
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.async_db_authentication import AsyncDBAuthentication
+from dbauth.internal.async_token_manager import AsyncTokenManager
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+class TestAsyncDBAuthentication(unittest.TestCase):
+
+    def setUp(self):
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    @staticmethod
+    def token(password, lifetime=60 * 1000):
+        return Token(password, Utils.get_current_time_millis() + lifetime, lifetime)
+
+    def test_generates_and_caches_token(self):
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=self.token("password")) as mock_get:
+            first = self.run_async(AsyncDBAuthentication.generate_authentication_token(self.request))
+            second = self.run_async(AsyncDBAuthentication.generate_authentication_token(self.request))
+            self.run_async(self.shutdown())
+
+        self.assertEqual("password", first)
+        self.assertEqual("password", second)
+        self.assertEqual(1, mock_get.call_count)
+
+    def test_concurrent_callers_share_one_request(self):
+        release = threading.Event()
+
+        def get_auth_token(signer):
+            release.wait(2)
+            return self.token("password")
+
+        async def generate_concurrently():
+            self.loop.call_later(0.1, release.set)
+            results = await asyncio.gather(*[AsyncDBAuthentication.generate_authentication_token(self.request)
+                                             for _ in range(20)])
+            stats = AsyncDBAuthentication.get_single_flight_stats()
+            AsyncDBAuthentication.shutdown()
+            return results, stats
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token) as mock_get:
+            results, stats = self.run_async(generate_concurrently())
+
+        self.assertEqual(["password"] * 20, results)
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual({"executions": 1, "coalesced": 19}, stats)
+
+    def test_event_loop_is_not_blocked(self):
+        ticks = []
+        release = threading.Event()
+
+        def get_auth_token(signer):
+            release.wait(2)
+            return self.token("password")
+
+        async def tick():
+            for _ in range(5):
+                ticks.append(1)
+                await asyncio.sleep(0.01)
+            release.set()
+
+        async def generate():
+            results = await asyncio.gather(AsyncDBAuthentication.generate_authentication_token(self.request), tick())
+            AsyncDBAuthentication.shutdown()
+            return results[0]
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token):
+            self.assertEqual("password", self.run_async(generate()))
+        self.assertEqual(5, len(ticks))
+
+    def test_refreshes_token_in_background(self):
+        tokens = iter([self.token("first", 100), self.token("second")])
+        policy = RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0, min_delay=10)
+
+        async def generate():
+            first = await AsyncDBAuthentication.generate_authentication_token(self.request)
+            await asyncio.sleep(0.3)
+            second = await AsyncDBAuthentication.generate_authentication_token(self.request)
+            AsyncDBAuthentication.shutdown()
+            return first, second
+
+        with patch.object(Signer, "refresh_policy", policy), \
+                patch.object(Signer, "get_auth_token", autospec=True, side_effect=lambda signer: next(tokens)):
+            self.assertEqual(("first", "second"), self.run_async(generate()))
+
+    def test_raises_notification_error(self):
+        error = TencentCloudSDKException("AuthFailure.SecretIdNotFound", "secret not found")
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=error):
+            with self.assertRaises(TencentCloudSDKException) as context:
+                self.run_async(AsyncDBAuthentication.generate_authentication_token(self.request))
+        self.assertEqual("AuthFailure.SecretIdNotFound", context.exception.get_code())
+
+    def test_managers_are_per_event_loop(self):
+        async def current():
+            return AsyncTokenManager.current()
+
+        other_loop = asyncio.new_event_loop()
+        self.addCleanup(other_loop.close)
+        self.assertIsNot(self.run_async(current()), other_loop.run_until_complete(current()))
+
+    def test_managers_are_dropped_with_their_loops(self):
+        async def generate():
+            return await AsyncDBAuthentication.generate_authentication_token(self.request)
+
+        managers = weakref.WeakKeyDictionary()
+        with patch.object(AsyncTokenManager, "managers", managers), \
+                patch.object(Signer, "get_auth_token", autospec=True, return_value=self.token("password")):
+            for _ in range(5):
+                self.assertEqual("password", asyncio.run(generate()))
+            gc.collect()
+            self.assertEqual(0, len(managers))
+
+    def test_tokens_are_bounded_like_the_sync_cache(self):
+        other = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-654321", "camtest",
+                                                   credential.Credential("secretId", "secretKey"))
+
+        async def generate():
+            await AsyncDBAuthentication.generate_authentication_token(self.request)
+            await AsyncDBAuthentication.generate_authentication_token(other)
+            manager = AsyncTokenManager.current()
+            cached = (manager.token_cache.size(), sorted(manager.timer_handles.keys()))
+            AsyncDBAuthentication.shutdown()
+            return cached
+
+        with patch.object(Signer, "token_cache", TokenCache(max_size=1)), \
+                patch.object(Signer, "get_auth_token", autospec=True, return_value=self.token("password")):
+            self.assertEqual((1, [other.get_auth_key()]), self.run_async(generate()))
+
+    def test_stops_refreshing_idle_token(self):
+        async def refresh():
+            await AsyncDBAuthentication.generate_authentication_token(self.request)
+            manager = AsyncTokenManager.current()
+            with patch.object(manager.token_cache, "is_idle", return_value=True):
+                await manager.auth_token_update_callback(Signer(self.request))
+            return manager.token_cache.size()
+
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=self.token("password")) as mock_get:
+            self.assertEqual(0, self.run_async(refresh()))
+        self.assertEqual(1, mock_get.call_count)
+
+    async def shutdown(self):
+        AsyncDBAuthentication.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from benchmark.fake_cam_server import FakeCamServer
+from dbauth.db_authentication import DBAuthentication
+from dbauth.fallback_provider import MemoryFallbackProvider
+from dbauth.internal.broker import BrokerClient, TokenBroker
+from dbauth.internal.retry_policy import RetryPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestTokenBroker(SignerTestCase):
+
+    def setUp(self):
+        self.server = FakeCamServer().start()
+        self.addCleanup(self.server.stop)
+        self.isolate_signer()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.socket_path = os.path.join(directory.name, "broker.sock")
+        self.broker = TokenBroker(self.socket_path, credential.Credential("brokerSecretId", "brokerSecretKey"),
+                                  self.server.client_profile()).start()
+        self.addCleanup(self.broker.stop)
+        self.client = BrokerClient(self.socket_path)
+        self.addCleanup(self.client.close)
+        # The client process does not need the credential of the broker
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("clientSecretId", "clientSecretKey"))
+
+    def test_serves_tokens_from_fake_cam(self):
+        expected = self.server.current_password("cdb-123456", "ap-guangzhou", "camtest")
+        self.assertEqual(expected, self.client.get_token(self.request))
+        other_client = BrokerClient(self.socket_path)
+        self.addCleanup(other_client.close)
+        self.assertEqual(expected, other_client.get_token(self.request))
+        self.assertEqual(1, self.server.call_count())
+
+    def test_socket_is_private(self):
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.socket_path).st_mode))
+
+    def test_client_caches_tokens_until_expiry(self):
+        self.client.get_token(self.request)
+        with patch.object(self.client, "call", side_effect=AssertionError("call")):
+            self.client.get_token(self.request)
+
+    def test_returns_cam_errors(self):
+        self.server.error_rate = 1
+        self.server.error_code = "AuthFailure.SecretIdNotFound"
+        with self.assertRaises(TencentCloudSDKException) as context:
+            self.client.get_token(self.request)
+        self.assertEqual("AuthFailure.SecretIdNotFound", context.exception.code)
+
+    def test_fallback_password_is_not_cached_by_clients(self):
+        Signer.token_cache.fallback_provider = MemoryFallbackProvider()
+        Signer.token_cache.fallback_provider.set_password("ap-guangzhou", "cdb-123456", "camtest", "fallback")
+        self.server.error_rate = 1
+        self.server.error_code = "InternalError"
+        with patch.object(Signer, "retry_policy", RetryPolicy(max_attempts=1)):
+            self.assertEqual({"ok": True, "token": "fallback", "expires_in": 0},
+                             self.client.call({"op": "get", "region": "ap-guangzhou", "instance_id": "cdb-123456",
+                                               "user_name": "camtest"}))
+            self.assertEqual("fallback", self.client.get_token(self.request))
+
+        # The broker refreshes the token, the client gets it on its next call
+        self.server.error_rate = 0
+        broker_request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                            self.broker.credential)
+        Signer.token_cache.set_auth_token(broker_request.get_auth_key(),
+                                          Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000))
+        self.assertEqual("password", self.client.get_token(self.request))
+
+    def test_rejects_invalid_requests(self):
+        self.assertEqual("InvalidParameter", self.client.call({"op": "unknown"})["code"])
+        self.assertFalse(self.client.call({"op": "get", "region": "ap-guangzhou"})["ok"])
+        self.assertTrue(self.client.call({"op": "ping"})["ok"])
+
+    def test_refuses_to_replace_running_broker(self):
+        with self.assertRaises(OSError):
+            TokenBroker(self.socket_path, credential.Credential("secretId", "secretKey")).bind()
+
+    def test_generate_authentication_token_asks_broker(self):
+        DBAuthentication.enable_broker_client(self.socket_path)
+        self.addCleanup(DBAuthentication.disable_broker_client)
+        password = DBAuthentication.generate_authentication_token(self.request)
+        self.assertEqual(self.server.current_password("cdb-123456", "ap-guangzhou", "camtest"), password)
+        self.assertIn(self.request.get_auth_key(), DBAuthentication.broker_client.token_map)
+        self.assertEqual(0, DBAuthentication.broker_client.unavailable_until)
+
+    def test_falls_back_to_in_process_fetch(self):
+        self.broker.stop()
+        DBAuthentication.enable_broker_client(self.socket_path)
+        self.addCleanup(DBAuthentication.disable_broker_client)
+        token = Token("in-process", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=token) as mock_get:
+            self.assertEqual("in-process", DBAuthentication.generate_authentication_token(self.request))
+        self.assertEqual(1, mock_get.call_count)
+        self.assertGreater(DBAuthentication.broker_client.unavailable_until, 0)
+
+
+class TestBrokerProcess(unittest.TestCase):
+
+    def test_python_m_dbauth_serves_tokens(self):
+        with FakeCamServer() as server, tempfile.TemporaryDirectory() as directory:
+            socket_path = os.path.join(directory, "broker.sock")
+            env = dict(os.environ, TENCENTCLOUD_SECRET_ID="secretId", TENCENTCLOUD_SECRET_KEY="secretKey")
+            process = subprocess.Popen([sys.executable, "-m", "dbauth", "--socket", socket_path, "--protocol", "http",
+                                        "--endpoint", server.endpoint, "--log-level", "ERROR"], env=env)
+            try:
+                deadline = time.monotonic() + 10
+                while not os.path.exists(socket_path) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                             credential.Credential("secretId", "secretKey"))
+                client = BrokerClient(socket_path, timeout=5000)
+                self.assertEqual(server.current_password("cdb-123456", "ap-guangzhou", "camtest"),
+                                 client.get_token(request))
+                client.close()
+            finally:
+                process.terminate()
+                process.wait(10)
+            self.assertFalse(os.path.exists(socket_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
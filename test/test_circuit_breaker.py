@@ -0,0 +1,66 @@
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
+
+from dbauth.internal.circuit_breaker import CircuitBreaker, CircuitBreakerRegistry
+from dbauth.internal.clock import ManualClock
+from dbauth.internal.utils import Utils
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock(millis=10 ** 6)
+        patcher = patch.object(Utils, "clock", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker("endpoint", failure_threshold=2, open_timeout=1000)
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+
+    def test_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_lets_one_probe_through_after_timeout(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.advance(1000)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertFalse(self.breaker.allow_request())
+
+        self.breaker.record_success()
+        self.assertEqual(CircuitBreaker.CLOSED, self.breaker.state)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_failed_probe_opens_again(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.advance(1000)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+        self.clock.advance(999)
+        self.assertFalse(self.breaker.allow_request())
+
+
+class TestCircuitBreakerRegistry(unittest.TestCase):
+
+    def test_shares_breaker_per_region_and_endpoint(self):
+        registry = CircuitBreakerRegistry()
+        profile = ClientProfile(httpProfile=HttpProfile(endpoint="cam.internal.tencentcloudapi.com"))
+        self.assertIs(registry.get("ap-guangzhou"), registry.get("ap-guangzhou", ClientProfile()))
+        self.assertIsNot(registry.get("ap-guangzhou"), registry.get("ap-beijing"))
+        self.assertIsNot(registry.get("ap-guangzhou"), registry.get("ap-guangzhou", profile))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.profile.client_profile import ClientProfile
+from tencentcloud.common.profile.http_profile import HttpProfile
+
+from dbauth.internal.client_pool import ClientPool
+from dbauth.internal.signer import Signer
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = ClientPool(idle_timeout=60 * 1000)
+        self.cred = credential.Credential("secretId", "secretKey")
+
+    def test_reuses_client_for_same_key(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        first = self.pool.get_client(self.cred, "ap-guangzhou", None, factory)
+        second = self.pool.get_client(self.cred, "ap-guangzhou", None, factory)
+        self.assertIs(first, second)
+        self.assertEqual(1, factory.call_count)
+
+    def test_separates_clients_by_region_and_profile(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        profile = ClientProfile(httpProfile=HttpProfile(endpoint="cam.tencentcloudapi.com"))
+        guangzhou = self.pool.get_client(self.cred, "ap-guangzhou", None, factory)
+        shanghai = self.pool.get_client(self.cred, "ap-shanghai", None, factory)
+        profiled = self.pool.get_client(self.cred, "ap-guangzhou", profile, factory)
+        self.assertEqual(3, len({id(guangzhou), id(shanghai), id(profiled)}))
+
+    def test_equal_profiles_share_client(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        first = self.pool.get_client(self.cred, "ap-guangzhou",
+                                     ClientProfile(httpProfile=HttpProfile(endpoint="cam.tencentcloudapi.com")),
+                                     factory)
+        second = self.pool.get_client(self.cred, "ap-guangzhou",
+                                      ClientProfile(httpProfile=HttpProfile(endpoint="cam.tencentcloudapi.com")),
+                                      factory)
+        self.assertIs(first, second)
+
+    def test_invalidates_client_when_credential_changes(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        first = self.pool.get_client(self.cred, "ap-guangzhou", None, factory)
+        rotated = credential.Credential("secretId", "newSecretKey")
+        second = self.pool.get_client(rotated, "ap-guangzhou", None, factory)
+        self.assertIsNot(first, second)
+        self.assertEqual(1, self.pool.size())
+        first.request.conn._session.close.assert_called_once()
+
+    def test_evicts_idle_clients(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        with patch("dbauth.internal.client_pool.Utils.get_current_time_millis", return_value=0):
+            pool = ClientPool(idle_timeout=1000)
+            idle = pool.get_client(self.cred, "ap-guangzhou", None, factory)
+        with patch("dbauth.internal.client_pool.Utils.get_current_time_millis", return_value=1000):
+            pool.get_client(self.cred, "ap-shanghai", None, factory)
+        self.assertEqual(1, pool.size())
+        idle.request.conn._session.close.assert_called_once()
+
+    def test_invalidate_by_secret_id(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        self.pool.get_client(self.cred, "ap-guangzhou", None, factory)
+        self.pool.get_client(credential.Credential("otherId", "otherKey"), "ap-guangzhou", None, factory)
+        self.pool.invalidate("secretId")
+        self.assertEqual(1, self.pool.size())
+
+    def test_concurrent_get_creates_one_client(self):
+        factory = MagicMock(side_effect=lambda: MagicMock())
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(
+            self.pool.get_client(self.cred, "ap-guangzhou", None, factory))) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(1, factory.call_count)
+        self.assertEqual(1, len({id(client) for client in clients}))
+
+    def test_signer_reuses_client_across_requests(self):
+        request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", self.cred)
+        with patch.object(Signer, "client_pool", ClientPool()), \
+                patch.object(Signer, "create_client", autospec=True) as mock_create:
+            Signer(request).request_auth_token()
+            Signer(request).request_auth_token()
+        self.assertEqual(1, mock_create.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
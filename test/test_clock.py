@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.clock import Clock, ManualClock, SystemClock
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.single_flight import SingleFlight
+from dbauth.internal.timer_manager import TimerManager
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+class TestClock(unittest.TestCase):
+
+    def test_clock_must_implement_the_time_sources(self):
+        class MonotonicOnly(Clock):
+            def millis(self):
+                return 0
+
+        with self.assertRaises(TypeError):
+            MonotonicOnly()
+
+
+class TestSystemClock(unittest.TestCase):
+
+    def test_ignores_wall_clock_steps(self):
+        clock = SystemClock()
+        before = clock.millis()
+        with patch("time.time", return_value=0):
+            self.assertGreaterEqual(clock.millis(), before)
+            self.assertEqual(0, clock.wall_millis())
+
+
+class TestManualClock(unittest.TestCase):
+
+    def test_advance_moves_time_and_notifies_listeners(self):
+        clock = ManualClock(millis=1000, wall_millis=5000)
+        listener = MagicMock()
+        clock.add_listener(listener)
+        clock.advance(500)
+        self.assertEqual(1500, clock.millis())
+        self.assertEqual(5500, clock.wall_millis())
+        listener.assert_called_once()
+
+    def test_wall_time_of_deadline(self):
+        clock = ManualClock(millis=1000, wall_millis=5000)
+        with patch.object(Utils, "clock", clock):
+            self.assertEqual(6000, Utils.get_wall_time_millis(2000))
+
+
+class TestSimulatedTime(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock(millis=10 ** 6)
+        patcher = patch.object(Utils, "clock", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.timer_manager = TimerManager(clock=self.clock)
+        self.addCleanup(self.timer_manager.shutdown)
+
+    def test_timer_fires_only_when_simulated_time_reaches_deadline(self):
+        event = threading.Event()
+        self.timer_manager.save_timer("key", 1000, event.set)
+
+        self.clock.advance(999)
+        self.assertFalse(event.wait(0.2))
+        self.clock.advance(1)
+        self.assertTrue(event.wait(2))
+
+    def test_token_refresh_follows_simulated_time(self):
+        request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                     credential.Credential("secretId", "secretKey"))
+        policy = RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0, max_delay=60 * 60 * 1000)
+        passwords = iter(["first", "second"])
+
+        def get_auth_token(signer):
+            return Token(next(passwords), Utils.get_current_time_millis() + 10 * 60 * 1000, 10 * 60 * 1000)
+
+        def wait_for_token(password):
+            deadline = time.monotonic() + 2
+            while time.monotonic() < deadline:
+                if DBAuthentication.generate_authentication_token(request) == password:
+                    return True
+                time.sleep(0.01)
+            return False
+
+        with patch.object(Signer, "timer_manager", self.timer_manager), \
+                patch.object(Signer, "token_cache", TokenCache()), \
+                patch.object(Signer, "single_flight", SingleFlight()), \
+                patch.object(Signer, "refresh_policy", policy), \
+                patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token):
+            self.assertEqual("first", DBAuthentication.generate_authentication_token(request))
+
+            # Half of the lifetime has not passed
+            self.clock.advance(5 * 60 * 1000 - 1)
+            time.sleep(0.2)
+            self.assertEqual("first", DBAuthentication.generate_authentication_token(request))
+
+            self.clock.advance(1)
+            self.assertTrue(wait_for_token("second"))
+
+    def test_wall_clock_step_does_not_expire_token(self):
+        request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                     credential.Credential("secretId", "secretKey"))
+        token_cache = TokenCache()
+        signer = Signer(request)
+        token_cache.set_auth_token(signer.authKey, Token("cached", Utils.get_current_time_millis() + 60 * 1000))
+
+        with patch.object(Signer, "token_cache", token_cache), \
+                patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            # An NTP step of the wall clock by one hour
+            self.clock.wall_offset += 60 * 60 * 1000
+            self.assertEqual("cached", DBAuthentication.generate_authentication_token(request))
+        mock_get.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
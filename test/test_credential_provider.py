@@ -0,0 +1,130 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.cam.v20190116 import errorcodes
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.credential_provider import CredentialProvider, RefreshingCredentialProvider, SdkCredentialProvider
+from dbauth.internal.client_pool import ClientPool
+from dbauth.internal.clock import ManualClock
+from dbauth.internal.retry_policy import RetryPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestRefreshingCredentialProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock()
+        patcher = patch.object(Utils, "clock", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generation = 0
+
+    def load(self):
+        self.generation += 1
+        return (credential.Credential(f"tmpSecretId{self.generation}", "tmpSecretKey", "sessionToken"),
+                Utils.get_wall_time_millis() + 60 * 60 * 1000)
+
+    def test_loads_once_until_refresh_ahead(self):
+        provider = RefreshingCredentialProvider("role/dbauth", self.load, refresh_ahead=5 * 60 * 1000)
+        first = provider.get_credential()
+        self.clock.advance(54 * 60 * 1000)
+        self.assertIs(first, provider.get_credential())
+        self.clock.advance(2 * 60 * 1000)
+        self.assertEqual("tmpSecretId2", provider.get_credential().secret_id)
+        self.assertEqual(2, self.generation)
+
+    def test_uses_previous_credential_while_loading_fails(self):
+        provider = RefreshingCredentialProvider("role/dbauth", self.load, refresh_ahead=5 * 60 * 1000)
+        first = provider.get_credential()
+        provider.load = MagicMock(side_effect=RuntimeError("sts unavailable"))
+        self.clock.advance(56 * 60 * 1000)
+        self.assertIs(first, provider.get_credential())
+        self.clock.advance(4 * 60 * 1000)
+        with self.assertRaises(RuntimeError):
+            provider.get_credential()
+
+    def test_credential_without_expiry_is_loaded_once(self):
+        load = MagicMock(return_value=(credential.Credential("secretId", "secretKey"), None))
+        provider = RefreshingCredentialProvider("role/dbauth", load)
+        provider.get_credential()
+        self.clock.advance(365 * 24 * 60 * 60 * 1000)
+        provider.get_credential()
+        self.assertEqual(1, load.call_count)
+        provider.invalidate()
+        provider.get_credential()
+        self.assertEqual(2, load.call_count)
+
+    def test_rejects_empty_identity(self):
+        with self.assertRaises(ValueError):
+            RefreshingCredentialProvider("", self.load)
+
+    def test_sdk_provider_defaults_identity_to_secret_id(self):
+        cred = credential.Credential("secretId", "secretKey")
+        provider = SdkCredentialProvider(cred)
+        self.assertEqual("secretId", provider.identity)
+        self.assertIs(cred, provider.get_credential())
+        self.assertEqual("role/dbauth", SdkCredentialProvider(cred, "role/dbauth").identity)
+
+    def test_provider_must_implement_get_credential(self):
+        with self.assertRaises(TypeError):
+            CredentialProvider("role/dbauth")
+
+
+class TestCredentialProviderRequests(SignerTestCase):
+
+    def setUp(self):
+        self.cred = credential.Credential("tmpSecretId1", "tmpSecretKey1", "sessionToken1")
+        self.provider = SdkCredentialProvider(self.cred, "role/dbauth")
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", self.provider)
+        self.client_pool = ClientPool()
+        self.isolate_signer(client_pool=self.client_pool, retry_policy=RetryPolicy(max_attempts=1))
+
+    def test_auth_key_does_not_change_when_credential_rotates(self):
+        auth_key = self.request.get_auth_key()
+        self.cred.secret_id = "tmpSecretId2"
+        self.assertEqual(auth_key, self.request.get_auth_key())
+        self.assertEqual(auth_key, Signer(self.request).authKey)
+
+    def test_provider_is_not_resolved_when_the_request_is_created(self):
+        provider = MagicMock(spec=CredentialProvider, identity="role/dbauth")
+        request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", provider)
+        request.get_auth_key()
+        provider.get_credential.assert_not_called()
+
+    def test_credential_is_resolved_at_request_time(self):
+        with patch.object(Signer, "create_client", autospec=True) as mock_create:
+            signer = Signer(self.request)
+            signer.request_auth_token()
+            self.cred.secret_id = "tmpSecretId2"
+            signer.request_auth_token()
+        self.assertEqual(2, mock_create.call_count)
+        self.assertEqual("tmpSecretId2", mock_create.call_args[0][1].secret_id)
+
+    def test_rotation_replaces_the_client_of_the_identity(self):
+        clients = []
+        with patch.object(Signer, "create_client", autospec=True,
+                          side_effect=lambda *args: clients.append(MagicMock()) or clients[-1]), \
+                patch.object(self.client_pool, "_close") as mock_close:
+            Signer(self.request).request_auth_token()
+            Signer(self.request).request_auth_token()
+            self.cred.secret_key = "tmpSecretKey2"
+            Signer(self.request).request_auth_token()
+        self.assertEqual(2, len(clients))
+        self.assertEqual(1, self.client_pool.size())
+        mock_close.assert_called_once_with(clients[0])
+
+    def test_resolution_failure_is_an_internal_error(self):
+        provider = RefreshingCredentialProvider("role/dbauth", MagicMock(side_effect=RuntimeError("sts unavailable")))
+        request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", provider)
+        with self.assertRaises(TencentCloudSDKException) as context:
+            Signer(request).request_auth_token()
+        self.assertEqual(errorcodes.INTERNALERROR, context.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,23 @@
 import logging
 import os
+import threading
+import time
 import unittest
+from unittest.mock import MagicMock, patch
 
 from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
 from tencentcloud.common.profile.client_profile import ClientProfile
 from tencentcloud.common.profile.http_profile import HttpProfile
 
 from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.signer import Signer
+from dbauth.internal.timer_manager import TimerManager
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
 from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
 
 # Configure root logger
 logging.basicConfig(
@@ -39,5 +49,151 @@ class TestDBAuthentication(unittest.TestCase):
         self.log.info(f"Generated authentication token: {result}")
 
 
+class TestDBAuthenticationSingleFlight(SignerTestCase):
+
+    def setUp(self):
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.isolate_signer()
+
+    def generate_concurrently(self, count):
+        results, errors = [], []
+        barrier = threading.Barrier(count)
+
+        def generate():
+            barrier.wait()
+            try:
+                results.append(DBAuthentication.generate_authentication_token(self.request))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=generate) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_concurrent_cache_misses_request_token_once(self):
+        release = threading.Event()
+        threading.Timer(0.2, release.set).start()
+
+        def get_auth_token(signer):
+            release.wait(2)
+            return Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token) as mock_get:
+            results, errors = self.generate_concurrently(32)
+
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual(["password"] * 32, results)
+        self.assertEqual([], errors)
+        self.assertEqual({"executions": 1, "coalesced": 31}, DBAuthentication.get_single_flight_stats())
+
+    def test_concurrent_cache_misses_share_error(self):
+        release = threading.Event()
+        threading.Timer(0.2, release.set).start()
+
+        def get_auth_token(signer):
+            release.wait(2)
+            raise TencentCloudSDKException("AuthFailure.SecretIdNotFound", "secret not found")
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token) as mock_get:
+            results, errors = self.generate_concurrently(16)
+
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual([], results)
+        self.assertEqual(16, len(errors))
+        self.assertTrue(all(e.get_code() == "AuthFailure.SecretIdNotFound" for e in errors))
+
+
+class TestDBAuthenticationStaleWhileRevalidate(SignerTestCase):
+
+    def setUp(self):
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.timer_manager = MagicMock()
+        self.token_cache = TokenCache()
+        self.isolate_signer(timer_manager=self.timer_manager, token_cache=self.token_cache)
+        self.patch_attributes(DBAuthentication, stale_while_revalidate=10 * 1000, hard_expiry_grace=5 * 1000)
+        self.key = Signer(self.request).authKey
+
+    def cache_token(self, expires_in):
+        self.token_cache.set_auth_token(self.key, Token("cached", Utils.get_current_time_millis() + expires_in))
+
+    @staticmethod
+    def fresh_token(signer):
+        return Token("fresh", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+    def test_returns_fresh_token_without_refresh(self):
+        self.cache_token(60 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            self.assertEqual("cached", DBAuthentication.generate_authentication_token(self.request))
+        mock_get.assert_not_called()
+        self.timer_manager.expedite.assert_not_called()
+
+    def test_returns_stale_token_and_refreshes_in_background(self):
+        self.cache_token(5 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            self.assertEqual("cached", DBAuthentication.generate_authentication_token(self.request))
+        mock_get.assert_not_called()
+        self.timer_manager.expedite.assert_called_once()
+        self.assertEqual((self.key, 1), self.timer_manager.expedite.call_args[0][:2])
+
+    def test_returns_expired_token_within_grace(self):
+        self.cache_token(-2 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            self.assertEqual("cached", DBAuthentication.generate_authentication_token(self.request))
+        mock_get.assert_not_called()
+        self.timer_manager.expedite.assert_called_once()
+
+    def test_blocks_after_hard_deadline(self):
+        self.cache_token(-6 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.fresh_token):
+            self.assertEqual("fresh", DBAuthentication.generate_authentication_token(self.request))
+
+    def test_background_refresh_replaces_stale_token(self):
+        self.cache_token(5 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.fresh_token):
+            DBAuthentication.generate_authentication_token(self.request)
+            # Run the scheduled background refresh
+            self.timer_manager.expedite.call_args[0][2]()
+            self.assertEqual("fresh", DBAuthentication.generate_authentication_token(self.request))
+
+    def test_stale_hits_do_not_shorten_the_retry_of_a_failing_refresh(self):
+        timer_manager = TimerManager()
+        self.addCleanup(timer_manager.shutdown)
+        self.patch_attributes(Signer, timer_manager=timer_manager)
+        self.cache_token(5 * 1000)
+        failed = threading.Event()
+
+        def fail(signer):
+            failed.set()
+            raise TencentCloudSDKException("InternalError", "CAM is unavailable", "")
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=fail) as mock_get:
+            self.assertEqual("cached", DBAuthentication.generate_authentication_token(self.request))
+            self.assertTrue(failed.wait(2))
+            # Wait for the failed refresh to schedule its retry
+            for _ in range(100):
+                timer = timer_manager.timer_map.get(self.key)
+                if timer and timer.backoff:
+                    break
+                time.sleep(0.01)
+            self.assertTrue(timer.backoff)
+            for _ in range(100):
+                self.assertEqual("cached", DBAuthentication.generate_authentication_token(self.request))
+            time.sleep(0.1)
+        self.assertEqual(1, mock_get.call_count)
+        self.assertIs(timer, timer_manager.timer_map[self.key])
+
+    def test_disabled_by_default(self):
+        with patch.object(DBAuthentication, "stale_while_revalidate", 0), \
+                patch.object(DBAuthentication, "hard_expiry_grace", 0):
+            self.cache_token(-1)
+            with patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.fresh_token):
+                self.assertEqual("fresh", DBAuthentication.generate_authentication_token(self.request))
+
+
 if __name__ == '__main__':
     unittest.main()
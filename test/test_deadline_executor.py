@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.async_db_authentication import AsyncDBAuthentication
+from dbauth.db_authentication import DBAuthentication
+from dbauth.fallback_provider import MemoryFallbackProvider
+from dbauth.internal.constants import Constants
+from dbauth.internal.deadline_executor import DeadlineExecutor
+from dbauth.internal.signer import Signer
+from dbauth.internal.single_flight import SingleFlight
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.metrics import InMemoryMetricsCollector, Metrics
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestDeadlineExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = DeadlineExecutor(max_workers=2)
+        self.addCleanup(self.executor.shutdown)
+        self.single_flight = SingleFlight()
+        self.collector = InMemoryMetricsCollector()
+        patcher = patch.object(Metrics, "collector", self.collector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_returns_the_result_within_the_deadline(self):
+        self.assertEqual("token", self.executor.run(self.single_flight, "key", lambda: "token", 1000))
+
+    def test_raises_timeout_error_and_completes_in_the_background(self):
+        release = threading.Event()
+        completed = []
+        with self.assertRaises(TencentCloudSDKException) as context:
+            self.executor.run(self.single_flight, "key", lambda: release.wait(5) and completed.append(True), 10)
+        self.assertEqual(Constants.TIMEOUT_ERROR, context.exception.code)
+        self.assertEqual(1, self.collector.snapshot()["counters"][Metrics.DEADLINE_EXCEEDED])
+        release.set()
+        self.executor.shutdown()
+        self.assertEqual([True], completed)
+
+    def test_errors_of_the_build_are_raised(self):
+        def fail():
+            raise TencentCloudSDKException("InternalError", "failed", "")
+
+        with self.assertRaises(TencentCloudSDKException) as context:
+            self.executor.run(self.single_flight, "key", fail, 1000)
+        self.assertEqual("InternalError", context.exception.code)
+
+    def test_only_the_leader_of_a_key_takes_a_thread(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        for _ in range(4):
+            with self.assertRaises(TencentCloudSDKException):
+                self.executor.run(self.single_flight, "slow", lambda: release.wait(5), 10)
+        self.assertEqual("token", self.executor.run(self.single_flight, "fast", lambda: "token", 1000))
+        self.assertEqual({"executions": 2, "coalesced": 3}, self.single_flight.stats())
+
+    def test_rejects_invalid_max_workers(self):
+        with self.assertRaises(ValueError):
+            DeadlineExecutor(max_workers=0)
+
+
+class TestGenerateWithTimeout(SignerTestCase):
+
+    def setUp(self):
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.fallback_provider = MemoryFallbackProvider()
+        self.deadline_executor = self.isolate_signer(
+            token_cache=TokenCache(fallback_provider=self.fallback_provider))["deadline_executor"]
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def get_auth_token(self, signer):
+        self.release.wait(5)
+        return Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+    def test_timeout_raises_without_cached_or_fallback_token(self):
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.get_auth_token):
+            with self.assertRaises(TencentCloudSDKException) as context:
+                DBAuthentication.generate_authentication_token(self.request, timeout=20)
+            self.assertEqual(Constants.TIMEOUT_ERROR, context.exception.code)
+
+            # The build completes in the background and caches its token
+            self.release.set()
+            self.deadline_executor.shutdown()
+            self.assertEqual("password", DBAuthentication.generate_authentication_token(self.request, timeout=20))
+
+    def test_slow_key_does_not_hold_up_other_keys(self):
+        requested = []
+
+        def get_auth_token(signer):
+            requested.append(signer.request.instance_id)
+            if signer.request.instance_id == "cdb-a":
+                self.release.wait(5)
+            return Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+        def generate(instance_id, timeout):
+            request = GenerateAuthenticationTokenRequest("ap-guangzhou", instance_id, "camtest",
+                                                         credential.Credential("secretId", "secretKey"))
+            return DBAuthentication.generate_authentication_token(request, timeout=timeout)
+
+        errors = []
+
+        def generate_slow():
+            try:
+                generate("cdb-a", 200)
+            except TencentCloudSDKException as e:
+                errors.append(e.code)
+
+        # More callers of the slow key than threads in the pool
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token):
+            threads = [threading.Thread(target=generate_slow) for _ in range(12)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(5)
+            self.assertEqual("password", generate("cdb-b", 500))
+        self.assertEqual([Constants.TIMEOUT_ERROR] * 12, errors)
+        self.assertEqual(["cdb-a", "cdb-b"], requested)
+
+    def test_timeout_returns_the_fallback_password(self):
+        self.fallback_provider.set_password("ap-guangzhou", "cdb-123456", "camtest", "fallback")
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.get_auth_token):
+            start = time.monotonic()
+            self.assertEqual("fallback", DBAuthentication.generate_authentication_token(self.request, timeout=20))
+        self.assertLess(time.monotonic() - start, 2)
+
+    def test_async_timeout_raises_and_completes_in_the_background(self):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def generate():
+            with self.assertRaises(TencentCloudSDKException) as context:
+                await AsyncDBAuthentication.generate_authentication_token(self.request, timeout=20)
+            self.assertEqual(Constants.TIMEOUT_ERROR, context.exception.code)
+            self.release.set()
+            token = await AsyncDBAuthentication.generate_authentication_token(self.request, timeout=2000)
+            AsyncDBAuthentication.shutdown()
+            return token
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.get_auth_token) as mock_get:
+            self.assertEqual("password", loop.run_until_complete(generate()))
+        self.assertEqual(1, mock_get.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
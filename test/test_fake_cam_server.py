@@ -0,0 +1,52 @@
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from benchmark.fake_cam_server import FakeCamServer
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.retry_policy import RetryPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.token_cache import TokenCache
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestFakeCamServer(SignerTestCase):
+
+    def setUp(self):
+        self.server = FakeCamServer(rotation_interval=60 * 60 * 1000).start()
+        self.addCleanup(self.server.stop)
+        self.isolate_signer(retry_policy=RetryPolicy(base_delay=1, max_delay=1))
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"),
+                                                          self.server.client_profile())
+
+    def test_token_is_decrypted_end_to_end(self):
+        password = DBAuthentication.generate_authentication_token(self.request)
+        self.assertEqual(self.server.current_password("cdb-123456", "ap-guangzhou", "camtest"), password)
+        self.assertEqual(password, DBAuthentication.generate_authentication_token(self.request))
+        self.assertEqual(1, self.server.call_count(("cdb-123456", "ap-guangzhou", "camtest")))
+
+    def test_lifetime_follows_rotation_time(self):
+        token = Signer(self.request).get_auth_token()
+        self.assertLessEqual(token.get_lifetime(), self.server.rotation_interval)
+
+    def test_errors_are_returned_with_their_code(self):
+        self.server.error_rate = 1
+        self.server.error_code = "AuthFailure.SecretIdNotFound"
+        with self.assertRaises(TencentCloudSDKException) as context:
+            DBAuthentication.generate_authentication_token(self.request)
+        self.assertEqual("AuthFailure.SecretIdNotFound", context.exception.code)
+        self.assertEqual(1, self.server.call_count())
+
+    def test_outage_is_retried(self):
+        self.server.outage = True
+        with patch.object(TokenCache, "fallback", return_value=None), self.assertRaises(TencentCloudSDKException):
+            DBAuthentication.generate_authentication_token(self.request)
+        self.assertEqual(RetryPolicy.DEFAULT_MAX_ATTEMPTS, self.server.call_count())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tencentcloud.common import credential
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.fallback_provider import EnvFallbackProvider, FileFallbackProvider, MemoryFallbackProvider
+from dbauth.internal.clock import ManualClock
+from dbauth.internal.constants import Constants
+from dbauth.internal.signer import Signer
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+class TestFileFallbackProvider(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock(millis=10 ** 6)
+        patcher = patch.object(Utils, "clock", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.base_dir = Path(directory.name)
+        self.provider = FileFallbackProvider(base_dir=self.base_dir, poll_interval=1000)
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.path = self.base_dir / Constants.INPUT_PATH_DIR / "ap-guangzhou_cdb-123456_camtest.pwd"
+
+    def write(self, content):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(content)
+        # Make the change visible even within the resolution of the file system timestamps
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_reads_password_from_base_dir(self):
+        self.write("password\n")
+        self.assertEqual(self.path, self.provider.path(self.request))
+        self.assertEqual("password", self.provider.get_password(self.request))
+
+    def test_does_not_touch_disk_within_poll_interval(self):
+        self.write("password")
+        self.provider.get_password(self.request)
+        with patch.object(Path, "stat", side_effect=AssertionError("stat")), \
+                patch.object(Path, "read_text", side_effect=AssertionError("read")):
+            self.clock.advance(999)
+            self.assertEqual("password", self.provider.get_password(self.request))
+
+    def test_reads_file_again_only_when_changed(self):
+        self.write("password")
+        self.provider.get_password(self.request)
+        self.clock.advance(1000)
+        with patch.object(Path, "read_text", side_effect=AssertionError("read")):
+            self.assertEqual("password", self.provider.get_password(self.request))
+
+        self.write("rotated")
+        self.assertEqual("password", self.provider.get_password(self.request))
+        self.clock.advance(1000)
+        self.assertEqual("rotated", self.provider.get_password(self.request))
+
+    def test_missing_file_is_cached_until_it_appears(self):
+        self.assertIsNone(self.provider.get_password(self.request))
+        self.write("password")
+        self.assertIsNone(self.provider.get_password(self.request))
+        self.clock.advance(1000)
+        self.assertEqual("password", self.provider.get_password(self.request))
+
+    def test_rejects_invalid_files(self):
+        self.write("first\nsecond")
+        self.assertIsNone(self.provider.get_password(self.request))
+        self.clock.advance(1000)
+        self.write("x" * (FileFallbackProvider.MAX_PASSWORD_SIZE + 1))
+        self.assertIsNone(self.provider.get_password(self.request))
+
+
+class TestFallbackProviders(unittest.TestCase):
+
+    def setUp(self):
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+
+    def test_memory_provider(self):
+        provider = MemoryFallbackProvider()
+        provider.set_password("ap-guangzhou", "cdb-123456", "camtest", "password")
+        self.assertEqual("password", provider.get_password(self.request))
+        provider.remove_password("ap-guangzhou", "cdb-123456", "camtest")
+        self.assertIsNone(provider.get_password(self.request))
+
+    def test_env_provider(self):
+        provider = EnvFallbackProvider()
+        self.assertEqual("DBAUTH_FALLBACK_AP_GUANGZHOU_CDB_123456_CAMTEST", provider.variable_name(self.request))
+        with patch.dict(os.environ, {"DBAUTH_FALLBACK_AP_GUANGZHOU_CDB_123456_CAMTEST": "password"}):
+            self.assertEqual("password", provider.get_password(self.request))
+        self.assertIsNone(provider.get_password(self.request))
+
+    def test_token_cache_uses_installed_provider(self):
+        with patch.object(Signer, "token_cache", TokenCache()):
+            DBAuthentication.set_fallback_provider(MemoryFallbackProvider(
+                {("ap-guangzhou", "cdb-123456", "camtest"): "password"}))
+            token = Signer.token_cache.fallback(self.request)
+            self.assertEqual("password", token.get_auth_token())
+            self.assertIsNone(token.get_lifetime())
+
+            DBAuthentication.set_fallback_provider(None)
+            self.assertIsInstance(Signer.token_cache.fallback_provider, FileFallbackProvider)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.common import credential
+
+from dbauth.credential_provider import RefreshingCredentialProvider
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.fork_handler import ForkHandler
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.timer_manager import TimerManager
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+@unittest.skipUnless(hasattr(os, "register_at_fork"), "os.register_at_fork is not available")
+class TestForkHandler(SignerTestCase):
+
+    def setUp(self):
+        self.timer_manager = TimerManager()
+        self.addCleanup(self.timer_manager.shutdown)
+        self.isolate_signer(timer_manager=self.timer_manager)
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.calls = []
+
+    def get_auth_token(self, signer):
+        self.calls.append(os.getpid())
+        return Token(f"password-{len(self.calls)}", Utils.get_current_time_millis() + 400, 400)
+
+    def run_in_child(self, check):
+        """Forks, runs check in the child and returns its exit code, 0 on success."""
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = 0 if check() else 2
+            finally:
+                os._exit(code)
+        _, status = os.waitpid(pid, 0)
+        return os.WEXITSTATUS(status)
+
+    def test_child_reuses_tokens_and_refreshes_them(self):
+        policy = RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0, min_delay=10)
+        with patch.object(Signer, "refresh_policy", policy), \
+                patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.get_auth_token):
+            DBAuthentication.generate_authentication_token(self.request)
+
+            def check():
+                # The token of the parent is served without a CAM request
+                if DBAuthentication.generate_authentication_token(self.request) != "password-1" or \
+                        len(self.calls) != 1:
+                    return False
+                # The refresh timer of the parent fires in the child
+                deadline = time.monotonic() + 2
+                while time.monotonic() < deadline:
+                    if any(pid == os.getpid() for pid in self.calls):
+                        return True
+                    time.sleep(0.01)
+                return False
+
+            self.assertEqual(0, self.run_in_child(check))
+
+    def test_child_requests_tokens_again_without_reuse(self):
+        with patch.object(ForkHandler, "reuse_tokens", False), \
+                patch.object(Signer, "get_auth_token", autospec=True, side_effect=self.get_auth_token):
+            DBAuthentication.generate_authentication_token(self.request)
+
+            def check():
+                return Signer.token_cache.size() == 0 and not Signer.timer_manager.timer_map
+
+            self.assertEqual(0, self.run_in_child(check))
+
+    def test_child_does_not_wait_for_build_in_flight_in_parent(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking_get_auth_token(signer):
+            if os.getpid() == parent:
+                started.set()
+                release.wait(5)
+            return Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+        parent = os.getpid()
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=blocking_get_auth_token):
+            thread = threading.Thread(target=DBAuthentication.generate_authentication_token, args=(self.request,))
+            thread.start()
+            started.wait(2)
+
+            def check():
+                return DBAuthentication.generate_authentication_token(self.request) == "password"
+
+            code = self.run_in_child(check)
+            release.set()
+            thread.join()
+        self.assertEqual(0, code)
+
+    def test_child_does_not_wait_for_credential_load_in_parent(self):
+        release = threading.Event()
+        started = threading.Event()
+        parent = os.getpid()
+
+        def load():
+            if os.getpid() == parent:
+                started.set()
+                release.wait(5)
+            return credential.Credential("secretId", "secretKey"), None
+
+        provider = RefreshingCredentialProvider("role/dbauth", load)
+        thread = threading.Thread(target=provider.get_credential)
+        thread.start()
+        started.wait(2)
+
+        def check():
+            loaded = []
+            child_thread = threading.Thread(target=lambda: loaded.append(provider.get_credential()), daemon=True)
+            child_thread.start()
+            child_thread.join(2)
+            return len(loaded) == 1 and loaded[0].secret_id == "secretId"
+
+        code = self.run_in_child(check)
+        release.set()
+        thread.join()
+        self.assertEqual(0, code)
+
+    def test_fork_waits_for_lock_held_by_another_thread(self):
+        lock = Signer.token_cache.lock
+        lock.acquire()
+        threading.Timer(0.2, lock.release).start()
+        token = Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+        def check():
+            Signer.token_cache.set_auth_token("key", token)
+            return Signer.token_cache.get_auth_token("key") is token
+
+        self.assertEqual(0, self.run_in_child(check))
+
+
+if __name__ == '__main__':
+    unittest.main()
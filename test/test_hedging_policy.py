@@ -0,0 +1,124 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.client_pool import ClientPool
+from dbauth.internal.hedging_policy import HedgingPolicy
+from dbauth.internal.signer import Signer
+from dbauth.metrics import InMemoryMetricsCollector, Metrics
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestHedgingPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.policy = HedgingPolicy(min_samples=4, window=4, initial_delay=50, min_delay=10)
+        self.collector = InMemoryMetricsCollector()
+        patcher = patch.object(Metrics, "collector", self.collector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def slow(self):
+        self.release.wait(5)
+        return "slow"
+
+    def hedges(self):
+        return self.collector.snapshot()["counters"].get(Metrics.CAM_REQUEST_HEDGES, 0)
+
+    def test_fast_request_is_not_hedged(self):
+        hedge = MagicMock()
+        self.assertEqual("fast", self.policy.call(lambda: "fast", hedge, lambda: True))
+        hedge.assert_not_called()
+        self.assertEqual(0, self.hedges())
+
+    def test_slow_request_is_hedged_and_the_first_response_wins(self):
+        self.assertEqual("hedge", self.policy.call(self.slow, lambda: "hedge", lambda: True))
+        self.assertEqual(1, self.hedges())
+
+    def test_hedge_is_not_sent_without_permission(self):
+        hedge = MagicMock()
+        self.release.set()
+        self.assertEqual("slow", self.policy.call(self.slow, hedge, lambda: False))
+        hedge.assert_not_called()
+
+    def test_failed_hedge_waits_for_the_first_request(self):
+        def hedge():
+            raise TencentCloudSDKException("InternalError", "hedge failed", "")
+
+        threading.Timer(0.2, self.release.set).start()
+        self.assertEqual("slow", self.policy.call(self.slow, hedge, lambda: True))
+
+    def test_last_error_is_raised_when_both_fail(self):
+        def fail(message):
+            def request():
+                raise TencentCloudSDKException("InternalError", message, "")
+            return request
+
+        def first():
+            self.release.wait(5)
+            fail("first failed")()
+
+        threading.Timer(0.2, self.release.set).start()
+        with self.assertRaises(TencentCloudSDKException) as context:
+            self.policy.call(first, fail("hedge failed"), lambda: True)
+        self.assertEqual("first failed", context.exception.message)
+
+    def test_delay_is_a_percentile_of_recent_latencies(self):
+        self.assertEqual(50, self.policy.delay())
+        for latency in [5, 100, 20, 30]:
+            self.policy.record(latency)
+        self.assertEqual(100, self.policy.delay())
+        # The oldest latencies leave the window
+        for _ in range(2):
+            self.policy.record(1)
+        self.assertEqual(30, self.policy.delay())
+        for _ in range(2):
+            self.policy.record(1)
+        self.assertEqual(10, self.policy.delay())
+
+    def test_rejects_invalid_arguments(self):
+        for kwargs in [{"percentile": 100}, {"window": 10, "min_samples": 11}, {"initial_delay": 5, "min_delay": 10},
+                       {"max_workers": 0}]:
+            with self.assertRaises(ValueError):
+                HedgingPolicy(**kwargs)
+
+
+class TestSignerHedging(SignerTestCase):
+
+    def setUp(self):
+        self.refresh_queue = MagicMock()
+        self.client_pool = ClientPool()
+        self.isolate_signer(hedging_policy=HedgingPolicy(initial_delay=0, min_delay=0),
+                            refresh_queue=self.refresh_queue, client_pool=self.client_pool)
+        self.cred = credential.Credential("secretId", "secretKey")
+        self.signer = Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", self.cred))
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def test_hedge_uses_another_client_and_a_spare_permit(self):
+        client, hedge_client = MagicMock(), MagicMock()
+        client.BuildDataFlowAuthToken.side_effect = lambda req: self.release.wait(5) and "slow"
+        hedge_client.BuildDataFlowAuthToken.return_value = "hedge"
+        self.refresh_queue.try_acquire.return_value = True
+        with patch.object(Signer, "create_client", autospec=True, return_value=hedge_client):
+            self.assertEqual("hedge", self.signer.send_request(client, "req", self.cred))
+        self.refresh_queue.try_acquire.assert_called_once_with()
+        self.assertEqual(1, self.client_pool.size())
+
+    def test_no_hedge_without_a_spare_permit(self):
+        client = MagicMock()
+        client.BuildDataFlowAuthToken.side_effect = lambda req: self.release.wait(0.1) or "slow"
+        self.refresh_queue.try_acquire.return_value = False
+        with patch.object(Signer, "create_client", autospec=True) as mock_create:
+            self.assertEqual("slow", self.signer.send_request(client, "req", self.cred))
+        mock_create.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from benchmark.import_time import loaded, measure
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_import_does_not_load_cam_client_crypto_or_protobuf(self):
+        result = measure("dbauth.db_authentication")
+        self.assertIsNotNone(result["cumulative_us"])
+        self.assertEqual([], loaded(result["modules"]))
+
+    def test_cache_hit_does_not_load_cam_client_crypto_or_protobuf(self):
+        # A credential stub, tencentcloud.common.credential and unittest.mock import requests and asyncio
+        code = ("from types import SimpleNamespace\n"
+                "from dbauth.db_authentication import DBAuthentication\n"
+                "from dbauth.internal.signer import Signer\n"
+                "from dbauth.internal.token import Token\n"
+                "from dbauth.internal.utils import Utils\n"
+                "from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest\n"
+                "credential = SimpleNamespace(secretId='id', secretKey='key', secret_id='id')\n"
+                "request = GenerateAuthenticationTokenRequest('ap-guangzhou', 'cdb-123456', 'camtest', credential)\n"
+                "Signer.token_cache.set_auth_token(request.get_auth_key(),\n"
+                "                                  Token('password', Utils.get_current_time_millis() + 60000, 60000))\n"
+                "assert DBAuthentication.generate_authentication_token(request) == 'password'\n")
+        self.assertEqual([], loaded(measure("dbauth.db_authentication", code)["modules"]))
+
+    def test_decrypt_loads_crypto_and_protobuf(self):
+        code = ("from dbauth.internal.auth_token_parser import AuthTokenParser\n"
+                "sealed = AuthTokenParser.seal('cdb-123456', 'ap-guangzhou', 'camtest', 'password')\n"
+                "assert AuthTokenParser.unseal('cdb-123456', 'ap-guangzhou', 'camtest', sealed) == 'password'\n"
+                "try:\n"
+                "    AuthTokenParser.parse_auth_token('cdb-123456', 'ap-guangzhou', 'camtest', sealed)\n"
+                "except AuthTokenParser.AuthTokenParserError:\n"
+                "    pass\n")
+        self.assertEqual(["Crypto", "google.protobuf"],
+                         loaded(measure("dbauth.db_authentication", code)["modules"], ("Crypto", "google.protobuf")))
+
+    def test_cam_request_loads_cam_client(self):
+        code = ("from tencentcloud.common import credential\n"
+                "from dbauth.internal.signer import Signer\n"
+                "from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest\n"
+                "request = GenerateAuthenticationTokenRequest('ap-guangzhou', 'cdb-123456', 'camtest',\n"
+                "                                             credential.Credential('id', 'key'))\n"
+                "Signer(request).create_client()\n")
+        self.assertIn("tencentcloud.cam.v20190116.cam_client",
+                      loaded(measure("dbauth.db_authentication", code)["modules"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+
+from dbauth.integrations.connector import TokenConnector
+from dbauth.integrations.psycopg2_connector import Psycopg2Connector
+from dbauth.integrations.pymysql_connector import PyMySQLConnector
+from dbauth.integrations.sqlalchemy_integration import SQLAlchemyIntegration
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class FakeMySQLError(Exception):
+    pass
+
+
+class FakePostgresError(Exception):
+
+    def __init__(self, message, pgcode=None):
+        super().__init__(message)
+        self.pgcode = pgcode
+
+
+class FakeDatabase:
+    """A stand-in connect function accepting only the current password."""
+
+    def __init__(self, password, error):
+        self.password = password
+        self.error = error
+        self.attempts = []
+
+    def connect(self, **kwargs):
+        self.attempts.append(kwargs)
+        if kwargs["password"] != self.password:
+            raise self.error
+        return MagicMock(kwargs=kwargs)
+
+
+class TestIntegrations(SignerTestCase):
+
+    def setUp(self):
+        self.isolate_signer()
+        self.passwords = iter(["old", "new"])
+        patcher = patch.object(Signer, "get_auth_token", autospec=True, side_effect=lambda signer: Token(
+            next(self.passwords), Utils.get_current_time_millis() + 20 * 60 * 1000, 20 * 60 * 1000))
+        self.get_auth_token = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+
+    def test_pymysql_connects_with_cached_token(self):
+        database = FakeDatabase("old", FakeMySQLError(1045, "Access denied"))
+        PyMySQLConnector.connect(self.request, database.connect, host="127.0.0.1", port=3306)
+        PyMySQLConnector.connect(self.request, database.connect, host="127.0.0.1", port=3306)
+        self.assertEqual({"host": "127.0.0.1", "port": 3306, "user": "camtest", "password": "old"},
+                         database.attempts[0])
+        self.assertEqual(1, self.get_auth_token.call_count)
+
+    def test_pymysql_retries_once_with_refreshed_token(self):
+        database = FakeDatabase("new", FakeMySQLError(1045, "Access denied"))
+        connection = PyMySQLConnector.connect(self.request, database.connect)
+        self.assertEqual("new", connection.kwargs["password"])
+        self.assertEqual(["old", "new"], [attempt["password"] for attempt in database.attempts])
+
+    def test_gives_up_after_one_retry(self):
+        database = FakeDatabase("other", FakeMySQLError(1045, "Access denied"))
+        with self.assertRaises(FakeMySQLError):
+            PyMySQLConnector.connect(self.request, database.connect)
+        self.assertEqual(2, len(database.attempts))
+
+    def test_does_not_retry_other_errors(self):
+        database = FakeDatabase("new", FakeMySQLError(2003, "Can't connect"))
+        with self.assertRaises(FakeMySQLError):
+            PyMySQLConnector.connect(self.request, database.connect)
+        self.assertEqual(1, len(database.attempts))
+
+    def test_uses_token_refreshed_by_another_connection(self):
+        database = FakeDatabase("new", FakeMySQLError(1045, "Access denied"))
+
+        def connect(**kwargs):
+            # Another connection refreshes the token while this one is rejected
+            Signer.token_cache.set_auth_token(self.request.get_auth_key(), Token("new", 2 ** 62, 60 * 1000))
+            return database.connect(**kwargs)
+
+        PyMySQLConnector.connect(self.request, connect)
+        self.assertEqual(1, self.get_auth_token.call_count)
+
+    def test_psycopg2_retries_on_invalid_password(self):
+        database = FakeDatabase("new", FakePostgresError("FATAL", pgcode="28P01"))
+        connection = Psycopg2Connector.connect(self.request, database.connect, dbname="postgres")
+        self.assertEqual({"dbname": "postgres", "user": "camtest", "password": "new"}, connection.kwargs)
+
+    def test_psycopg2_retries_on_startup_failure_message(self):
+        database = FakeDatabase("new", FakePostgresError('FATAL:  password authentication failed for user "camtest"'))
+        self.assertEqual("new", Psycopg2Connector.connect(self.request, database.connect).kwargs["password"])
+
+    def test_sqlalchemy_do_connect_handler(self):
+        database = FakeDatabase("new", FakeMySQLError(1045, "Access denied"))
+        dialect = MagicMock()
+        dialect.connect.side_effect = lambda *cargs, **cparams: database.connect(**cparams)
+        handler = SQLAlchemyIntegration.do_connect_handler(self.request)
+
+        cparams = {"host": "127.0.0.1"}
+        connection = handler(dialect, MagicMock(), [], cparams)
+        self.assertEqual({"host": "127.0.0.1", "user": "camtest", "password": "new"}, connection.kwargs)
+        self.assertEqual({"host": "127.0.0.1"}, cparams)
+
+    def test_sqlalchemy_creator(self):
+        database = FakeDatabase("old", FakeMySQLError(1045, "Access denied"))
+        create = SQLAlchemyIntegration.creator(self.request, database.connect, host="127.0.0.1")
+        self.assertEqual("old", create().kwargs["password"])
+
+    def test_pool_recycle_follows_token_lifetime(self):
+        self.assertEqual(TokenConnector.DEFAULT_POOL_RECYCLE, TokenConnector.pool_recycle(self.request))
+        self.assertEqual(20 * 60, SQLAlchemyIntegration.pool_recycle(self.request))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.auth_token_parser import AuthTokenParser
+from dbauth.internal.signer import Signer
+from dbauth.internal.single_flight import SingleFlight
+from dbauth.internal.timer_manager import TimerManager
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+from dbauth.metrics import InMemoryMetricsCollector, Metrics, MetricsCollector
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestInMemoryMetricsCollector(unittest.TestCase):
+
+    def setUp(self):
+        self.collector = InMemoryMetricsCollector(buckets=(10, 100))
+
+    def test_snapshot(self):
+        self.collector.increment("calls")
+        self.collector.increment("calls", 2)
+        self.collector.gauge("keys", 5)
+        for value in [1, 10, 50, 500]:
+            self.collector.observe("latency", value)
+
+        snapshot = self.collector.snapshot()
+
+        self.assertEqual({"calls": 3}, snapshot["counters"])
+        self.assertEqual({"keys": 5}, snapshot["gauges"])
+        self.assertEqual({"buckets": {10: 2, 100: 3, "+Inf": 4}, "count": 4, "sum": 561},
+                         snapshot["histograms"]["latency"])
+
+    def test_to_prometheus(self):
+        self.collector.increment("calls_total")
+        self.collector.observe("latency_ms", 50)
+        text = self.collector.to_prometheus()
+        self.assertIn("# TYPE calls_total counter\ncalls_total 1\n", text)
+        self.assertIn('latency_ms_bucket{le="100"} 1\n', text)
+        self.assertIn("latency_ms_count 1\n", text)
+
+    def test_reset(self):
+        self.collector.increment("calls")
+        self.collector.reset()
+        self.assertEqual({"counters": {}, "gauges": {}, "histograms": {}}, self.collector.snapshot())
+
+
+class TestMetricsInstrumentation(SignerTestCase):
+
+    def setUp(self):
+        self.collector = InMemoryMetricsCollector()
+        DBAuthentication.set_metrics_collector(self.collector)
+        self.addCleanup(DBAuthentication.set_metrics_collector, None)
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.isolate_signer()
+
+    def counters(self):
+        return self.collector.snapshot()["counters"]
+
+    def test_restores_no_op_collector(self):
+        DBAuthentication.set_metrics_collector(None)
+        self.assertEqual(MetricsCollector, type(Metrics.collector))
+
+    def test_cache_hits_and_misses(self):
+        token = Token("password", Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=token):
+            DBAuthentication.generate_authentication_token(self.request)
+            DBAuthentication.generate_authentication_token(self.request)
+            DBAuthentication.generate_authentication_token(self.request)
+
+        self.assertEqual(1, self.counters()[Metrics.CACHE_MISSES])
+        self.assertEqual(2, self.counters()[Metrics.CACHE_HITS])
+        self.assertEqual(1, self.collector.snapshot()["gauges"][Metrics.LIVE_KEYS])
+
+    def test_cam_request_latency_and_retries(self):
+        client = MagicMock()
+        client.BuildDataFlowAuthToken.side_effect = [TencentCloudSDKException("InternalError", "error"),
+                                                     MagicMock()]
+        with patch.object(Signer, "create_client", autospec=True, return_value=client):
+            Signer(self.request).request_auth_token()
+
+        self.assertEqual(1, self.counters()[Metrics.CAM_REQUEST_RETRIES])
+        self.assertEqual(1, self.counters()[Metrics.CAM_REQUEST_ERRORS])
+        self.assertEqual(2, self.collector.snapshot()["histograms"][Metrics.CAM_REQUEST_LATENCY]["count"])
+
+    def test_decrypt_time(self):
+        with self.assertRaises(Exception):
+            AuthTokenParser.parse_auth_token("cdb-123456", "ap-guangzhou", "camtest", "0" * 64 + "invalid")
+        self.assertEqual(1, self.collector.snapshot()["histograms"][Metrics.DECRYPT_TIME]["count"])
+
+    def test_fallback_lookups(self):
+        Signer.token_cache.fallback(self.request)
+        self.assertEqual(1, self.counters()[Metrics.FALLBACK_LOOKUPS])
+        self.assertNotIn(Metrics.FALLBACK_HITS, self.counters())
+
+    def test_single_flight_coalesced(self):
+        release = threading.Event()
+        single_flight = SingleFlight()
+        threading.Timer(0.1, release.set).start()
+        threads = [threading.Thread(target=single_flight.do, args=("key", lambda: release.wait(2)))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(3, self.counters()[Metrics.SINGLE_FLIGHT_COALESCED])
+
+    def test_scheduler_lag_and_live_timers(self):
+        timer_manager = TimerManager()
+        self.addCleanup(timer_manager.shutdown)
+        event = threading.Event()
+        timer_manager.save_timer("key", 10, event.set)
+        timer_manager.save_timer("other", 60 * 1000, MagicMock())
+        self.assertTrue(event.wait(2))
+
+        snapshot = self.collector.snapshot()
+        self.assertEqual(1, snapshot["histograms"][Metrics.SCHEDULER_LAG]["count"])
+        self.assertEqual(1, snapshot["gauges"][Metrics.LIVE_TIMERS])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import patch
+
+from tencentcloud.cam.v20190116 import errorcodes
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.clock import ManualClock
+from dbauth.internal.negative_cache import NegativeCache
+from dbauth.internal.signer import Signer
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.metrics import InMemoryMetricsCollector, Metrics
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestNegativeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock(millis=10 ** 6)
+        patcher = patch.object(Utils, "clock", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.cache = NegativeCache(ttl=1000)
+
+    def test_returns_copy_of_error_until_ttl(self):
+        error = TencentCloudSDKException("AuthFailure.SecretIdNotFound", "not found", "request-id")
+        self.cache.set_error("key", error)
+
+        cached = self.cache.get_error("key")
+        self.assertIsNot(error, cached)
+        self.assertEqual(("AuthFailure.SecretIdNotFound", "not found", "request-id"),
+                         (cached.code, cached.message, cached.requestId))
+
+        self.clock.advance(1000)
+        self.assertIsNone(self.cache.get_error("key"))
+        self.assertEqual(0, self.cache.size())
+
+    def test_clear(self):
+        self.cache.set_error("first", TencentCloudSDKException("AuthFailure", ""))
+        self.cache.set_error("second", TencentCloudSDKException("AuthFailure", ""))
+        self.cache.clear("first")
+        self.assertIsNone(self.cache.get_error("first"))
+        self.assertIsNotNone(self.cache.get_error("second"))
+        self.cache.clear()
+        self.assertEqual(0, self.cache.size())
+
+
+class TestDBAuthenticationNegativeCache(SignerTestCase):
+
+    def setUp(self):
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+        self.collector = InMemoryMetricsCollector()
+        self.isolate_signer()
+        self.patch_attributes(Metrics, collector=self.collector)
+
+    def test_terminal_error_is_not_requested_again(self):
+        error = TencentCloudSDKException("AuthFailure.UnauthorizedOperation", "denied")
+        with patch.object(Signer, "request_auth_token", autospec=True, side_effect=error) as mock_request:
+            for _ in range(5):
+                with self.assertRaises(TencentCloudSDKException) as context:
+                    DBAuthentication.generate_authentication_token(self.request)
+                self.assertEqual("AuthFailure.UnauthorizedOperation", context.exception.code)
+
+        self.assertEqual(1, mock_request.call_count)
+        self.assertEqual(4, self.collector.snapshot()["counters"][Metrics.NEGATIVE_CACHE_HITS])
+
+    def test_clear_requests_again(self):
+        error = TencentCloudSDKException("AuthFailure.UnauthorizedOperation", "denied")
+        with patch.object(Signer, "request_auth_token", autospec=True, side_effect=error) as mock_request:
+            for _ in range(2):
+                with self.assertRaises(TencentCloudSDKException):
+                    DBAuthentication.generate_authentication_token(self.request)
+                DBAuthentication.clear_negative_cache(self.request)
+        self.assertEqual(2, mock_request.call_count)
+
+    def test_internal_errors_are_not_cached(self):
+        error = TencentCloudSDKException(errorcodes.INTERNALERROR, "error")
+        with patch.object(Signer, "request_auth_token", autospec=True, side_effect=error) as mock_request, \
+                patch.object(TokenCache, "fallback", return_value=None):
+            for _ in range(2):
+                with self.assertRaises(TencentCloudSDKException):
+                    DBAuthentication.generate_authentication_token(self.request)
+        self.assertEqual(2, mock_request.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+from unittest.mock import MagicMock
+
+from tencentcloud.common import credential
+
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestRefreshPolicy(unittest.TestCase):
+
+    def test_refreshes_at_fraction_of_lifetime(self):
+        policy = RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0, max_delay=60 * 60 * 1000)
+        self.assertEqual(15 * 60 * 1000, policy.next_refresh_delay(30 * 60 * 1000, 30 * 60 * 1000))
+
+    def test_jitter_stays_within_bounds(self):
+        policy = RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0.2, max_delay=60 * 60 * 1000)
+        for _ in range(100):
+            delay = policy.next_refresh_delay(20 * 60 * 1000, 20 * 60 * 1000)
+            self.assertGreaterEqual(delay, 8 * 60 * 1000)
+            self.assertLessEqual(delay, 12 * 60 * 1000)
+
+    def test_delay_counts_the_age_of_the_token(self):
+        policy = RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0, max_delay=60 * 60 * 1000)
+        self.assertEqual(5 * 60 * 1000, policy.next_refresh_delay(20 * 60 * 1000, 15 * 60 * 1000))
+        # Past the refresh point the token is refreshed after the floor
+        self.assertEqual(RefreshPolicy.DEFAULT_MIN_DELAY, policy.next_refresh_delay(20 * 60 * 1000, 3 * 60 * 1000))
+
+    def test_delay_is_clamped_to_floor_and_ceiling(self):
+        policy = RefreshPolicy(jitter_fraction=0, min_delay=10 * 1000, max_delay=60 * 1000)
+        self.assertEqual(10 * 1000, policy.next_refresh_delay(15 * 1000, 15 * 1000))
+        self.assertEqual(60 * 1000, policy.next_refresh_delay(60 * 60 * 1000, 60 * 60 * 1000))
+
+    def test_delay_does_not_exceed_remaining_time(self):
+        policy = RefreshPolicy(jitter_fraction=0, min_delay=10 * 1000)
+        self.assertEqual(3000, policy.next_refresh_delay(1000, 3000))
+
+    def test_retry_delay(self):
+        self.assertEqual(7000, RefreshPolicy(retry_interval=7000).next_retry_delay())
+
+    def test_invalid_parameters_raise_exception(self):
+        with self.assertRaises(ValueError):
+            RefreshPolicy(refresh_fraction=0)
+        with self.assertRaises(ValueError):
+            RefreshPolicy(jitter_fraction=1)
+        with self.assertRaises(ValueError):
+            RefreshPolicy(min_delay=10, max_delay=5)
+
+
+class TestSignerRefreshScheduling(SignerTestCase):
+
+    def setUp(self):
+        cred = credential.Credential("secretId", "secretKey")
+        self.signer = Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", cred))
+        self.timer_manager = MagicMock()
+        self.isolate_signer(timer_manager=self.timer_manager,
+                            refresh_policy=RefreshPolicy(refresh_fraction=0.5, jitter_fraction=0,
+                                                         max_delay=60 * 60 * 1000))
+
+    def scheduled_delay(self):
+        return self.timer_manager.save_timer.call_args[0][1]
+
+    def test_schedules_refresh_from_server_lifetime(self):
+        lifetime = 20 * 60 * 1000
+        token = Token("token", Utils.get_current_time_millis() + lifetime, lifetime)
+        self.signer.update_auth_token_task(token)
+        self.assertEqual(10 * 60 * 1000, self.scheduled_delay())
+
+    def test_schedules_retry_for_fallback_token(self):
+        token = Token("token", Utils.get_current_time_millis() + 24 * 60 * 60 * 1000)
+        self.signer.update_auth_token_task(token)
+        # The first retry waits between half and the whole retry interval
+        self.assertLessEqual(RefreshPolicy.DEFAULT_RETRY_INTERVAL / 2, self.scheduled_delay())
+        self.assertGreaterEqual(RefreshPolicy.DEFAULT_RETRY_INTERVAL, self.scheduled_delay())
+
+    def test_schedules_retry_after_failure(self):
+        self.signer.retry_auth_token_task()
+        self.assertLessEqual(RefreshPolicy.DEFAULT_RETRY_INTERVAL / 2, self.scheduled_delay())
+        self.assertGreaterEqual(RefreshPolicy.DEFAULT_RETRY_INTERVAL, self.scheduled_delay())
+
+    def test_lifetime_from_server_times(self):
+        self.assertEqual(60000, self.signer.lifetime(1000, 61000))
+        self.assertEqual(Signer.TOKEN_UPDATE_INTERVAL, self.signer.lifetime(61000, 1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
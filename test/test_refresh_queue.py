@@ -0,0 +1,183 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+
+from dbauth.internal.clock import ManualClock
+from dbauth.internal.refresh_queue import RefreshQueue
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.utils import Utils
+from dbauth.metrics import InMemoryMetricsCollector, Metrics
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestRefreshQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock()
+        self.queue = RefreshQueue(rate=1, burst=2, clock=self.clock)
+        self.collector = InMemoryMetricsCollector()
+        patcher = patch.object(Metrics, "collector", self.collector)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def start_waiter(self, priority, order, granted, key=None):
+        thread = threading.Thread(target=lambda: (self.queue.acquire(priority, order, key), granted.append(order)))
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+
+    def test_burst_is_granted_without_waiting(self):
+        self.assertEqual(0, self.queue.acquire(RefreshQueue.ON_DEMAND, 0))
+        self.assertEqual(0, self.queue.acquire(RefreshQueue.BACKGROUND, 0))
+        self.assertEqual(0, self.queue.depth())
+
+    def test_waits_for_permits_at_the_rate(self):
+        self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        granted = []
+        thread = self.start_waiter(RefreshQueue.ON_DEMAND, 0, granted)
+        self.wait_until(lambda: self.queue.depth() == 1)
+        self.clock.advance(500)
+        time.sleep(0.05)
+        self.assertEqual([], granted)
+        self.clock.advance(500)
+        thread.join(5)
+        self.assertEqual([0], granted)
+        self.assertEqual(1000, self.collector.snapshot()["histograms"][Metrics.REFRESH_QUEUE_WAIT]["sum"])
+
+    def test_misses_go_first_then_refreshes_by_expiry(self):
+        self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        granted = []
+        threads = []
+        for priority, order in [(RefreshQueue.BACKGROUND, 500), (RefreshQueue.BACKGROUND, 100),
+                                (RefreshQueue.ON_DEMAND, 900)]:
+            threads.append(self.start_waiter(priority, order, granted))
+            self.wait_until(lambda: self.queue.depth() == len(threads))
+        self.assertEqual(3, self.collector.snapshot()["gauges"][Metrics.REFRESH_QUEUE_DEPTH])
+
+        for count in range(1, 4):
+            self.clock.advance(1000)
+            self.wait_until(lambda: len(granted) == count)
+        self.assertEqual([900, 100, 500], granted)
+        self.assertEqual(0, self.collector.snapshot()["gauges"][Metrics.REFRESH_QUEUE_DEPTH])
+
+    def test_joined_refresh_is_promoted_ahead_of_other_misses(self):
+        self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        granted = []
+        threads = []
+        for priority, order, key in [(RefreshQueue.BACKGROUND, 100, "a"), (RefreshQueue.ON_DEMAND, 900, "b")]:
+            threads.append(self.start_waiter(priority, order, granted, key))
+            self.wait_until(lambda: self.queue.depth() == len(threads))
+        # A caller that missed the cache at 500 joins the refresh of "a"
+        self.queue.promote("a", RefreshQueue.ON_DEMAND, 500)
+
+        for count in range(1, 3):
+            self.clock.advance(1000)
+            self.wait_until(lambda: len(granted) == count)
+        self.assertEqual([100, 900], granted)
+
+    def test_promotion_applies_until_forgotten(self):
+        self.queue.promote("a", RefreshQueue.ON_DEMAND, 500)
+        self.queue.acquire(RefreshQueue.BACKGROUND, 100, "a")
+        self.assertEqual({"a": (RefreshQueue.ON_DEMAND, 500)}, self.queue.promotions)
+        self.queue.forget("a")
+        self.assertEqual({}, self.queue.promotions)
+        self.assertEqual({}, self.queue.waiting)
+
+    def test_permits_do_not_exceed_burst(self):
+        self.clock.advance(60 * 1000)
+        for _ in range(2):
+            self.queue.acquire(RefreshQueue.ON_DEMAND, 0)
+        granted = []
+        thread = self.start_waiter(RefreshQueue.ON_DEMAND, 0, granted)
+        self.wait_until(lambda: self.queue.depth() == 1)
+        self.assertEqual([], granted)
+        self.clock.advance(1000)
+        thread.join(5)
+        self.assertEqual([0], granted)
+
+    def test_reset_after_fork_drops_waiters(self):
+        self.queue.waiters.append((RefreshQueue.ON_DEMAND, 0, 0))
+        self.queue.reset_after_fork()
+        self.assertEqual(0, self.queue.depth())
+
+    def test_rejects_invalid_limits(self):
+        with self.assertRaises(ValueError):
+            RefreshQueue(rate=0)
+        with self.assertRaises(ValueError):
+            RefreshQueue(burst=0)
+
+
+class TestSignerRefreshQueue(SignerTestCase):
+
+    def setUp(self):
+        self.clock = ManualClock(millis=10 * 1000)
+        self.refresh_queue = MagicMock()
+        self.token_cache = TokenCache()
+        self.patch_attributes(Utils, clock=self.clock)
+        self.isolate_signer(refresh_queue=self.refresh_queue, token_cache=self.token_cache)
+        request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                     credential.Credential("secretId", "secretKey"))
+        self.signer = Signer(request)
+
+    def test_cache_miss_requests_on_demand(self):
+        with patch.object(Signer, "create_client", autospec=True):
+            self.signer.request_auth_token()
+        self.refresh_queue.acquire.assert_called_once_with(RefreshQueue.ON_DEMAND, 10 * 1000,
+                                                           key=self.signer.authKey)
+
+    def test_background_refresh_is_ordered_by_expiry(self):
+        self.token_cache.set_auth_token(self.signer.authKey, Token("password", 70 * 1000, 60 * 1000))
+        priorities = []
+        with patch.object(Signer, "get_auth_token", autospec=True,
+                          side_effect=lambda signer: priorities.append(signer.refresh_priority()) or
+                          Token("password", 130 * 1000, 60 * 1000)):
+            self.signer.auth_token_update_callback()
+        self.assertEqual([(RefreshQueue.BACKGROUND, 70 * 1000)], priorities)
+        self.assertEqual((RefreshQueue.ON_DEMAND, 10 * 1000), self.signer.refresh_priority())
+
+    def test_miss_joining_a_background_refresh_promotes_it(self):
+        self.token_cache.set_auth_token(self.signer.authKey, Token("password", 70 * 1000, 60 * 1000))
+        started, release = threading.Event(), threading.Event()
+        self.addCleanup(release.set)
+
+        def get_auth_token(signer):
+            started.set()
+            release.wait(5)
+            return Token("password", 130 * 1000, 60 * 1000)
+
+        with patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token):
+            refresh = threading.Thread(target=self.signer.auth_token_update_callback)
+            refresh.start()
+            started.wait(5)
+            miss = threading.Thread(target=Signer(self.signer.request).build_auth_token_once)
+            miss.start()
+            self.wait_until(lambda: self.refresh_queue.promote.called)
+            release.set()
+            refresh.join(5)
+            miss.join(5)
+        self.refresh_queue.promote.assert_called_once_with(self.signer.authKey, RefreshQueue.ON_DEMAND, 10 * 1000)
+
+    def wait_until(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.001)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.cam.v20190116 import errorcodes
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.internal.circuit_breaker import CircuitBreakerRegistry
+from dbauth.internal.clock import ManualClock
+from dbauth.internal.constants import Constants
+from dbauth.internal.retry_policy import RetryPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_backoff_is_jittered_below_exponential_bound(self):
+        policy = RetryPolicy(base_delay=100, max_delay=1000)
+        for retry, bound in [(1, 100), (2, 200), (3, 400), (5, 1000), (10, 1000)]:
+            for _ in range(100):
+                delay = policy.backoff(retry)
+                self.assertLessEqual(0, delay)
+                self.assertGreaterEqual(bound, delay)
+
+    def test_background_delay_doubles_with_failures(self):
+        policy = RetryPolicy(max_background_delay=60 * 1000)
+        for failures, bound in [(1, 5000), (2, 10000), (3, 20000), (8, 60000)]:
+            for _ in range(100):
+                delay = policy.next_background_delay(failures, 5000)
+                self.assertLessEqual(bound / 2, delay)
+                self.assertGreaterEqual(bound, delay)
+
+    def test_rejects_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(max_attempts=0)
+        with self.assertRaises(ValueError):
+            RetryPolicy(base_delay=10, max_delay=5)
+        with self.assertRaises(ValueError):
+            RetryPolicy(deadline=0)
+
+
+class TestSignerRetries(SignerTestCase):
+
+    def setUp(self):
+        self.client = MagicMock()
+        self.client_pool = MagicMock()
+        self.client_pool.get_client.return_value = self.client
+        self.clock = ManualClock(millis=10 ** 6)
+        self.patch_attributes(Utils, clock=self.clock)
+        self.isolate_signer(client_pool=self.client_pool, circuit_breakers=CircuitBreakerRegistry(failure_threshold=3),
+                            retry_policy=RetryPolicy(max_attempts=3, base_delay=100, max_delay=100))
+        patcher = patch("dbauth.internal.signer.time.sleep", side_effect=lambda s: self.clock.advance(s * 1000))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cred = credential.Credential("secretId", "secretKey")
+        self.signer = Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest", cred))
+
+    def test_retries_internal_errors_with_backoff(self):
+        response = MagicMock()
+        self.client.BuildDataFlowAuthToken.side_effect = [
+            TencentCloudSDKException(errorcodes.INTERNALERROR, "error"), response]
+        start = Utils.get_current_time_millis()
+        self.assertIs(response, self.signer.request_auth_token())
+        self.assertEqual(2, self.client.BuildDataFlowAuthToken.call_count)
+        self.assertGreaterEqual(100, Utils.get_current_time_millis() - start)
+
+    def test_does_not_retry_notification_errors(self):
+        self.client.BuildDataFlowAuthToken.side_effect = TencentCloudSDKException("AuthFailure.SecretIdNotFound", "")
+        with self.assertRaises(TencentCloudSDKException):
+            self.signer.request_auth_token()
+        self.assertEqual(1, self.client.BuildDataFlowAuthToken.call_count)
+
+    def test_stops_retrying_at_deadline(self):
+        def slow_request(req):
+            self.clock.advance(20 * 1000)
+            raise TencentCloudSDKException(errorcodes.INTERNALERROR, "error")
+
+        self.client.BuildDataFlowAuthToken.side_effect = slow_request
+        with patch.object(Signer, "retry_policy", RetryPolicy(max_attempts=5, deadline=30 * 1000)):
+            with self.assertRaises(TencentCloudSDKException):
+                self.signer.request_auth_token()
+        self.assertEqual(2, self.client.BuildDataFlowAuthToken.call_count)
+
+    def test_open_circuit_fails_fast(self):
+        self.client.BuildDataFlowAuthToken.side_effect = TencentCloudSDKException(errorcodes.INTERNALERROR, "error")
+        with self.assertRaises(TencentCloudSDKException):
+            self.signer.request_auth_token()
+        self.assertEqual(3, self.client.BuildDataFlowAuthToken.call_count)
+
+        with self.assertRaises(TencentCloudSDKException) as context:
+            self.signer.request_auth_token()
+        self.assertEqual(Constants.CIRCUIT_OPEN_ERROR, context.exception.code)
+        self.assertEqual(3, self.client.BuildDataFlowAuthToken.call_count)
+
+    def test_open_circuit_falls_back(self):
+        self.client.BuildDataFlowAuthToken.side_effect = TencentCloudSDKException(errorcodes.INTERNALERROR, "error")
+        with self.assertRaises(TencentCloudSDKException):
+            self.signer.request_auth_token()
+
+        fallback_token = MagicMock()
+        fallback_token.get_lifetime.return_value = None
+        with patch.object(Signer, "token_cache") as token_cache, patch.object(Signer, "timer_manager"):
+            token_cache.fallback.return_value = fallback_token
+            token_cache.set_auth_token.return_value = []
+            self.assertIs(fallback_token, self.signer.build_auth_token())
+
+    def test_background_retries_back_off_until_success(self):
+        delays = [self.signer.next_retry_delay() for _ in range(4)]
+        self.assertEqual(4, self.signer.consecutive_failures)
+        self.assertLess(delays[0], delays[3])
+
+        token = MagicMock()
+        token.get_lifetime.return_value = 60 * 1000
+        token.get_expires.return_value = Utils.get_current_time_millis() + 60 * 1000
+        self.signer.next_update_delay(token)
+        self.assertEqual(0, self.signer.consecutive_failures)
+
+
+if __name__ == '__main__':
+    unittest.main()
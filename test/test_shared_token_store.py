@@ -0,0 +1,180 @@
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.shared_token_store import SharedTokenStore
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+def new_token(password, lifetime=60 * 1000):
+    return Token(password, Utils.get_current_time_millis() + lifetime, lifetime)
+
+
+def fetch_in_process(path, counter_path, results):
+    request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                 credential.Credential("secretId", "secretKey"))
+
+    def fetch():
+        with open(counter_path, "a") as f:
+            f.write("fetch\n")
+        time.sleep(0.3)
+        return new_token("password")
+
+    token = SharedTokenStore(path).get_or_fetch(request, "key", lambda t: True, fetch)
+    results.put(token.get_auth_token())
+
+
+class TestSharedTokenStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "tokens.db")
+        self.store = SharedTokenStore(self.path, wait_timeout=1000)
+        self.addCleanup(self.store.close)
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+
+    def test_round_trip(self):
+        self.store.set_token(self.request, "key", new_token("password"))
+        token = self.store.get_token(self.request, "key")
+        self.assertEqual("password", token.get_auth_token())
+        self.assertEqual(60 * 1000, token.get_lifetime())
+        self.assertAlmostEqual(Utils.get_current_time_millis() + 60 * 1000, token.get_expires(), delta=100)
+
+    def test_tokens_are_encrypted_at_rest(self):
+        umask = os.umask(0o022)
+        self.addCleanup(os.umask, umask)
+        self.store.set_token(self.request, "key", new_token("password"))
+        with sqlite3.connect(self.path) as connection:
+            stored = connection.execute("SELECT token FROM tokens").fetchone()[0]
+        self.assertNotIn("password", stored)
+        # The WAL holds the tokens until it is checkpointed
+        for path in [self.path, self.path + "-wal", self.path + "-shm"]:
+            self.assertEqual(0o600, os.stat(path).st_mode & 0o777, path)
+
+    def test_expired_token_is_ignored(self):
+        self.store.set_token(self.request, "key", new_token("password", lifetime=-1))
+        self.assertIsNone(self.store.get_token(self.request, "key"))
+
+    def test_lease_is_exclusive(self):
+        other = SharedTokenStore(self.path)
+        self.addCleanup(other.close)
+        self.assertTrue(self.store.try_acquire_lease("key"))
+        self.assertFalse(other.try_acquire_lease("key"))
+        self.store.release_lease("key")
+        self.assertTrue(other.try_acquire_lease("key"))
+
+    def test_expired_lease_can_be_taken_over(self):
+        other = SharedTokenStore(self.path, lease_timeout=1)
+        self.addCleanup(other.close)
+        self.assertTrue(other.try_acquire_lease("key"))
+        time.sleep(0.01)
+        self.assertTrue(self.store.try_acquire_lease("key"))
+
+    def test_returns_fresh_shared_token_without_fetch(self):
+        self.store.set_token(self.request, "key", new_token("shared"))
+        fetch = MagicMock()
+        token = self.store.get_or_fetch(self.request, "key", lambda t: True, fetch)
+        self.assertEqual("shared", token.get_auth_token())
+        fetch.assert_not_called()
+
+    def test_fetches_and_publishes_when_elected(self):
+        token = self.store.get_or_fetch(self.request, "key", lambda t: True, lambda: new_token("fetched"))
+        self.assertEqual("fetched", token.get_auth_token())
+        self.assertEqual("fetched", self.store.get_token(self.request, "key").get_auth_token())
+        # The lease is released after publishing
+        self.assertTrue(SharedTokenStore(self.path).try_acquire_lease("key"))
+
+    def test_fetches_itself_when_lease_holder_does_not_publish(self):
+        other = SharedTokenStore(self.path)
+        self.addCleanup(other.close)
+        other.try_acquire_lease("key")
+        store = SharedTokenStore(self.path, wait_timeout=200)
+        self.addCleanup(store.close)
+        token = store.get_or_fetch(self.request, "key", lambda t: True, lambda: new_token("fetched"))
+        self.assertEqual("fetched", token.get_auth_token())
+
+    def test_one_process_fetches_for_the_host(self):
+        try:
+            context = multiprocessing.get_context("fork")
+        except ValueError:
+            self.skipTest("fork is not available")
+        counter_path = os.path.join(self.directory, "fetches")
+        results = context.Queue()
+        processes = [context.Process(target=fetch_in_process, args=(self.path, counter_path, results))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(10)
+
+        self.assertEqual(["password"] * 4, [results.get(timeout=1) for _ in range(4)])
+        with open(counter_path) as f:
+            self.assertEqual(1, len(f.readlines()))
+
+
+class TestSignerSharedStore(SignerTestCase):
+
+    def setUp(self):
+        self.timer_manager = MagicMock()
+        self.isolate_signer(timer_manager=self.timer_manager, refresh_policy=RefreshPolicy(jitter_fraction=0))
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        DBAuthentication.enable_shared_cache(os.path.join(directory, "tokens.db"))
+        self.addCleanup(DBAuthentication.disable_shared_cache)
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+
+    def test_adopts_token_published_by_another_process(self):
+        signer = Signer(self.request)
+        Signer.shared_store.set_token(self.request, signer.authKey, new_token("shared"))
+        with patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            self.assertEqual("shared", DBAuthentication.generate_authentication_token(self.request))
+        mock_get.assert_not_called()
+
+    def test_adopted_token_is_refreshed_at_its_refresh_point(self):
+        signer = Signer(self.request)
+        # Published by another process 5 of its 20 minutes ago
+        shared = Token("shared", Utils.get_current_time_millis() + 15 * 60 * 1000, 20 * 60 * 1000)
+        Signer.shared_store.set_token(self.request, signer.authKey, shared)
+        with patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            self.assertEqual("shared", DBAuthentication.generate_authentication_token(self.request))
+        mock_get.assert_not_called()
+        key, delay = self.timer_manager.save_timer.call_args[0][:2]
+        self.assertEqual(signer.authKey, key)
+        self.assertAlmostEqual(5 * 60 * 1000, delay, delta=1000)
+
+    def test_forced_refresh_replaces_the_shared_token(self):
+        signer = Signer(self.request)
+        Signer.shared_store.set_token(self.request, signer.authKey, new_token("old"))
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=new_token("new")) as mock_get:
+            self.assertEqual("new", DBAuthentication.refresh_authentication_token(self.request))
+        self.assertEqual(1, mock_get.call_count)
+        self.assertEqual("new", Signer.shared_store.get_token(self.request, signer.authKey).get_auth_token())
+        self.assertEqual("new", DBAuthentication.generate_authentication_token(self.request))
+
+    def test_refreshes_token_past_its_refresh_point(self):
+        signer = Signer(self.request)
+        stale = Token("stale", Utils.get_current_time_millis() + 10 * 1000, 60 * 1000)
+        Signer.shared_store.set_token(self.request, signer.authKey, stale)
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=new_token("fresh")):
+            self.assertEqual("fresh", DBAuthentication.generate_authentication_token(self.request))
+        self.assertEqual("fresh", Signer.shared_store.get_token(self.request, signer.authKey).get_auth_token())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import unittest
+
+from dbauth.internal.single_flight import SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.single_flight = SingleFlight()
+
+    def run_concurrently(self, count, fn):
+        results, errors = [], []
+        barrier = threading.Barrier(count)
+
+        def call():
+            barrier.wait()
+            try:
+                results.append(self.single_flight.do("key", fn))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, errors
+
+    def test_returns_result(self):
+        self.assertEqual("token", self.single_flight.do("key", lambda: "token"))
+        self.assertFalse(self.single_flight.in_flight("key"))
+
+    def test_coalesces_concurrent_calls(self):
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            release.wait(2)
+            return "token"
+
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(20, fn)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(["token"] * 20, results)
+        self.assertEqual([], errors)
+        self.assertEqual({"executions": 1, "coalesced": 19}, self.single_flight.stats())
+
+    def test_shares_error_with_waiters(self):
+        release = threading.Event()
+        error = RuntimeError("boom")
+
+        def fn():
+            release.wait(2)
+            raise error
+
+        timer = threading.Timer(0.2, release.set)
+        timer.start()
+        results, errors = self.run_concurrently(10, fn)
+
+        self.assertEqual([], results)
+        self.assertEqual([error] * 10, errors)
+
+    def test_runs_again_after_completion(self):
+        self.single_flight.do("key", lambda: "first")
+        self.assertEqual("second", self.single_flight.do("key", lambda: "second"))
+        self.assertEqual({"executions": 2, "coalesced": 0}, self.single_flight.stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
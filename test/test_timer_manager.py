@@ -44,6 +44,19 @@ class TestTimerManager(unittest.TestCase):
         self.timer_manager.cancel_timer("test_key")
         self.assertNotIn("test_key", self.timer_manager.timer_map)
 
+    def test_expedite_runs_a_later_timer_sooner_but_keeps_a_backoff(self):
+        mock_task = MagicMock()
+        self.assertTrue(self.timer_manager.expedite("key", 60 * 1000, mock_task))
+        self.timer_manager.save_timer("key", 60 * 60 * 1000, mock_task)
+        self.assertTrue(self.timer_manager.expedite("key", 60 * 1000, mock_task))
+        # The timer is due sooner than the expedited run
+        self.assertFalse(self.timer_manager.expedite("key", 2 * 60 * 1000, mock_task))
+
+        self.timer_manager.save_timer("key", 60 * 60 * 1000, mock_task, backoff=True)
+        deadline = self.timer_manager.timer_map["key"].deadline
+        self.assertFalse(self.timer_manager.expedite("key", 60 * 1000, mock_task))
+        self.assertEqual(deadline, self.timer_manager.timer_map["key"].deadline)
+
     def test_does_not_cancel_nonexistent_timer(self):
         with self.assertLogs(self.timer_manager.log, level='WARNING') as log:
             self.timer_manager.cancel_timer("nonexistent_key")
@@ -78,6 +91,63 @@ class TestTimerManager(unittest.TestCase):
         event.wait(3)  # Wait for the task to complete
         self.assertEqual(2, counter)
 
+    def test_thread_count_stays_flat_as_keys_grow(self):
+        mock_task = MagicMock()
+        self.timer_manager.save_timer("key_0", 60 * 1000, mock_task)
+        baseline = threading.active_count()
+
+        for i in range(10000):
+            self.timer_manager.save_timer(f"key_{i}", 60 * 1000, mock_task)
+
+        self.assertEqual(10000, len(self.timer_manager.timer_map))
+        self.assertEqual(baseline, threading.active_count())
+
+    def test_due_tasks_run_on_bounded_worker_pool(self):
+        baseline = threading.active_count()
+        lock = threading.Lock()
+        event = threading.Event()
+        counter = 0
+
+        def increment_counter():
+            nonlocal counter
+            with lock:
+                counter += 1
+                if counter == 10000:
+                    event.set()
+
+        for i in range(10000):
+            self.timer_manager.save_timer(f"key_{i}", 10, increment_counter)
+
+        self.assertTrue(event.wait(10))
+        self.assertEqual(10000, counter)
+        # One scheduler thread plus the worker pool
+        self.assertLessEqual(threading.active_count(), baseline + 1 + TimerManager.DEFAULT_MAX_WORKERS)
+        self.assertLessEqual(len(self.timer_manager.workers), TimerManager.DEFAULT_MAX_WORKERS)
+
+    def test_cancelled_timer_does_not_run(self):
+        mock_task = MagicMock()
+        self.timer_manager.save_timer("test_key", 100, mock_task)
+        self.timer_manager.cancel_timer("test_key")
+        threading.Event().wait(0.3)
+        mock_task.assert_not_called()
+
+    def test_saves_timer_after_shutdown(self):
+        event = threading.Event()
+        self.timer_manager.save_timer("test_key", 1000, MagicMock())
+        self.timer_manager.shutdown()
+        self.timer_manager.save_timer("test_key", 100, event.set)
+        self.assertTrue(event.wait(2))
+
+    def test_failing_task_does_not_stop_worker(self):
+        event = threading.Event()
+
+        def failing_task():
+            raise RuntimeError("boom")
+
+        self.timer_manager.save_timer("failing_key", 10, failing_task)
+        self.timer_manager.save_timer("test_key", 50, event.set)
+        self.assertTrue(event.wait(2))
+
 
 if __name__ == '__main__':
     unittest.main()
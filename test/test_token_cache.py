@@ -0,0 +1,132 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        patcher = patch("dbauth.internal.token_cache.Utils.get_current_time_millis", side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.token_cache = TokenCache(max_size=3, idle_timeout=1000)
+
+    def test_evicts_least_recently_requested_key(self):
+        for key in ["a", "b", "c"]:
+            self.token_cache.set_auth_token(key, Token(key, 0))
+        self.token_cache.get_auth_token("a")
+
+        evicted = self.token_cache.set_auth_token("d", Token("d", 0))
+
+        self.assertEqual(["b"], evicted)
+        self.assertIsNone(self.token_cache.get_auth_token("b"))
+        self.assertEqual(3, self.token_cache.size())
+        self.assertEqual(1, self.token_cache.stats()["size_evictions"])
+
+    def test_refresh_does_not_count_as_request(self):
+        self.token_cache.set_auth_token("a", Token("a", 0))
+        self.now = 1000
+        self.token_cache.set_auth_token("a", Token("a2", 0))
+        self.assertTrue(self.token_cache.is_idle("a"))
+
+    def test_request_resets_idle_time(self):
+        self.token_cache.set_auth_token("a", Token("a", 0))
+        self.now = 900
+        self.token_cache.get_auth_token("a")
+        self.now = 1800
+        self.assertFalse(self.token_cache.is_idle("a"))
+        self.assertFalse(self.token_cache.evict_idle("a"))
+
+    def test_evict_idle_key(self):
+        self.token_cache.set_auth_token("a", Token("a", 0))
+        self.now = 1000
+        self.assertTrue(self.token_cache.evict_idle("a"))
+        self.assertEqual(0, self.token_cache.size())
+        self.assertEqual(1, self.token_cache.stats()["idle_evictions"])
+
+    def test_evict_idle_missing_key(self):
+        self.assertTrue(self.token_cache.evict_idle("missing"))
+        self.assertEqual(0, self.token_cache.stats()["idle_evictions"])
+
+    def test_sweeps_idle_keys_on_set(self):
+        self.token_cache.set_auth_token("a", Token("a", 0))
+        self.token_cache.set_auth_token("b", Token("b", 0))
+        self.now = 500
+        self.token_cache.get_auth_token("b")
+        self.now = 1200
+
+        evicted = self.token_cache.set_auth_token("c", Token("c", 0))
+
+        self.assertEqual(["a"], evicted)
+        self.assertEqual({"size": 2, "size_evictions": 0, "idle_evictions": 1}, self.token_cache.stats())
+
+    def test_invalid_limits_raise_exception(self):
+        with self.assertRaises(ValueError):
+            TokenCache(max_size=0)
+        with self.assertRaises(ValueError):
+            TokenCache(idle_timeout=0)
+
+
+class TestSignerTokenEviction(SignerTestCase):
+
+    def setUp(self):
+        self.timer_manager = MagicMock()
+        self.token_cache = TokenCache(max_size=1)
+        self.isolate_signer(timer_manager=self.timer_manager, token_cache=self.token_cache)
+        cred = credential.Credential("secretId", "secretKey")
+        self.first = Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-1", "camtest", cred))
+        self.second = Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-2", "camtest", cred))
+
+    def test_cancels_timer_of_evicted_key(self):
+        self.first.set_token_and_update_task(Token("first", 0))
+        self.second.set_token_and_update_task(Token("second", 0))
+        self.timer_manager.cancel_timer.assert_called_once_with(self.first.authKey)
+
+    def test_stops_refreshing_idle_key(self):
+        self.first.set_token_and_update_task(Token("first", 0))
+        with patch.object(self.token_cache, "is_idle", return_value=True), \
+                patch.object(Signer, "build_auth_token") as mock_build:
+            self.first.auth_token_update_callback()
+        mock_build.assert_not_called()
+        self.assertIsNone(self.first.get_auth_token_from_cache())
+
+    def test_stops_refreshing_evicted_key(self):
+        with patch.object(Signer, "build_auth_token") as mock_build:
+            self.first.auth_token_update_callback()
+        mock_build.assert_not_called()
+
+
+class TestCacheHitPath(SignerTestCase):
+
+    def setUp(self):
+        self.token_cache = TokenCache()
+        self.isolate_signer(token_cache=self.token_cache)
+        self.cred = credential.Credential("secretId", "secretKey")
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-1", "camtest", self.cred)
+
+    def test_auth_key_is_memoized_per_secret_id(self):
+        auth_key = self.request.get_auth_key()
+        self.assertIs(auth_key, self.request.get_auth_key())
+        self.assertEqual(auth_key, Signer(self.request).authKey)
+
+        self.cred.secret_id = "rotatedSecretId"
+        self.assertNotEqual(auth_key, self.request.get_auth_key())
+        self.assertEqual(Signer(self.request).authKey, self.request.get_auth_key())
+
+    def test_cache_hit_creates_no_signer(self):
+        self.token_cache.set_auth_token(self.request.get_auth_key(), Token("password", 2 ** 62, 60 * 1000))
+        with patch.object(Signer, "__init__", side_effect=AssertionError("Signer created on a cache hit")):
+            self.assertEqual("password", DBAuthentication.generate_authentication_token(self.request))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import queue
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.cam.v20190116 import errorcodes
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.token_event_bus import TokenEventBus
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from dbauth.model.token_event import TokenEvent
+from test.signer_test_case import SignerTestCase
+
+
+class TestTokenEventBus(unittest.TestCase):
+
+    def setUp(self):
+        self.bus = TokenEventBus(max_workers=1, max_pending=2)
+        self.addCleanup(self.bus.shutdown)
+
+    def test_delivers_events_of_subscribed_key_on_another_thread(self):
+        events = queue.Queue()
+        self.bus.subscribe(lambda event: events.put((event, threading.current_thread())), "key")
+        self.bus.publish(TokenEvent(TokenEvent.ROTATED, "other"))
+        self.bus.publish(TokenEvent(TokenEvent.ROTATED, "key"))
+
+        event, thread = events.get(timeout=2)
+        self.assertEqual(("rotated", "key"), (event.event_type, event.auth_key))
+        self.assertIsNot(threading.current_thread(), thread)
+        self.bus.shutdown()
+        self.assertTrue(events.empty())
+
+    def test_unsubscribe(self):
+        callback = MagicMock()
+        subscription = self.bus.subscribe(callback)
+        self.bus.unsubscribe(subscription)
+        self.bus.publish(TokenEvent(TokenEvent.REMOVED, "key"))
+        self.bus.shutdown()
+        callback.assert_not_called()
+
+    def test_drops_events_beyond_max_pending(self):
+        release = threading.Event()
+        delivered = []
+
+        def callback(event):
+            release.wait(2)
+            delivered.append(event)
+
+        self.bus.subscribe(callback)
+        for i in range(5):
+            self.bus.publish(TokenEvent(TokenEvent.ROTATED, f"key-{i}"))
+        release.set()
+        self.bus.shutdown()
+        self.assertEqual(["key-0", "key-1"], [event.auth_key for event in delivered])
+
+    def test_callback_errors_do_not_stop_delivery(self):
+        events = queue.Queue()
+        self.bus.subscribe(MagicMock(side_effect=RuntimeError("boom")))
+        self.bus.subscribe(events.put)
+        self.bus.publish(TokenEvent(TokenEvent.ROTATED, "key"))
+        self.assertEqual("key", events.get(timeout=2).auth_key)
+
+
+class TestSignerTokenEvents(SignerTestCase):
+
+    def setUp(self):
+        self.bus = TokenEventBus()
+        self.token_cache = TokenCache(max_size=1)
+        self.isolate_signer(token_cache=self.token_cache, token_events=self.bus)
+        cred = credential.Credential("secretId", "secretKey")
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-1", "camtest", cred)
+        self.signer = Signer(self.request)
+        self.events = []
+        DBAuthentication.subscribe(self.events.append, self.request)
+
+    def received(self):
+        self.bus.shutdown()
+        return [(event.event_type, event.auth_token) for event in self.events]
+
+    def token(self, value):
+        return Token(value, Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+    def test_publishes_rotation_only_when_value_changes(self):
+        self.signer.set_token_and_update_task(self.token("first"))
+        self.signer.set_token_and_update_task(self.token("first"))
+        self.signer.set_token_and_update_task(self.token("second"))
+        self.assertEqual([(TokenEvent.ROTATED, "second")], self.received())
+        self.assertIs(self.request, self.events[0].request)
+
+    def test_publishes_fallback(self):
+        self.signer.set_token_and_update_task(self.token("first"))
+        with patch.object(Signer, "fetch_auth_token",
+                          side_effect=TencentCloudSDKException(errorcodes.INTERNALERROR, "error")), \
+                patch.object(TokenCache, "fallback", return_value=Token("fallback", 2 ** 62)):
+            self.signer.build_auth_token()
+            self.signer.build_auth_token()
+        self.assertEqual([(TokenEvent.FALLBACK, "fallback")], self.received())
+
+    def test_publishes_removal_after_terminal_error(self):
+        self.signer.set_token_and_update_task(self.token("first"))
+        with patch.object(Signer, "fetch_auth_token",
+                          side_effect=TencentCloudSDKException("AuthFailure.SecretIdNotFound", "")):
+            self.signer.auth_token_update_callback()
+        self.assertEqual([(TokenEvent.REMOVED, None)], self.received())
+
+    def test_publishes_removal_of_evicted_key(self):
+        self.signer.set_token_and_update_task(self.token("first"))
+        other = Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-2", "camtest",
+                                                          credential.Credential("secretId", "secretKey")))
+        other.set_token_and_update_task(self.token("other"))
+        self.assertEqual([(TokenEvent.REMOVED, None)], self.received())
+        self.assertIsNone(self.events[0].request)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+from tencentcloud.common.exception.tencent_cloud_sdk_exception import TencentCloudSDKException
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.token_prefetcher import TokenPrefetcher
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+
+
+class TestTokenPrefetcher(unittest.TestCase):
+
+    def setUp(self):
+        self.cred = credential.Credential("secretId", "secretKey")
+        self.requests = [GenerateAuthenticationTokenRequest("ap-guangzhou", f"cdb-{i}", "camtest", self.cred)
+                         for i in range(20)]
+
+    def test_limits_concurrency(self):
+        lock = threading.Lock()
+        running, peak = 0, 0
+
+        def generate(token_request):
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            time.sleep(0.02)
+            with lock:
+                running -= 1
+            return token_request.instance_id
+
+        results = TokenPrefetcher.prefetch(self.requests, generate, max_concurrency=4)
+
+        self.assertLessEqual(peak, 4)
+        self.assertGreater(peak, 1)
+        self.assertEqual(20, len(results))
+        for token_request in self.requests:
+            self.assertTrue(results[token_request].is_success())
+            self.assertEqual(token_request.instance_id, results[token_request].token)
+
+    def test_reports_errors_per_request(self):
+        error = TencentCloudSDKException("AuthFailure.SecretIdNotFound", "secret not found")
+
+        def generate(token_request):
+            if token_request.instance_id == "cdb-3":
+                raise error
+            return "password"
+
+        results = TokenPrefetcher.prefetch(self.requests, generate)
+
+        self.assertFalse(results[self.requests[3]].is_success())
+        self.assertIs(error, results[self.requests[3]].error)
+        self.assertEqual(19, sum(1 for result in results.values() if result.is_success()))
+
+    def test_empty_requests(self):
+        self.assertEqual({}, TokenPrefetcher.prefetch([], MagicMock()))
+
+    def test_invalid_concurrency_raises_exception(self):
+        with self.assertRaises(ValueError):
+            TokenPrefetcher.prefetch(self.requests, MagicMock(), max_concurrency=0)
+
+    def test_load_requests_from_file(self):
+        entries = [{"region": "ap-guangzhou", "instance_id": "cdb-1", "user_name": "camtest"},
+                   {"region": "ap-shanghai", "instance_id": "cdb-2", "user_name": "reader"}]
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump(entries, f)
+        self.addCleanup(os.remove, f.name)
+
+        token_requests = TokenPrefetcher.load_requests(f.name, self.cred)
+
+        self.assertEqual([("ap-guangzhou", "cdb-1", "camtest"), ("ap-shanghai", "cdb-2", "reader")],
+                         [(r.region, r.instance_id, r.user_name) for r in token_requests])
+        self.assertTrue(all(r.credential is self.cred for r in token_requests))
+
+    def test_load_requests_rejects_invalid_entry(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+            json.dump([{"region": "ap-guangzhou", "instance_id": "cdb-1"}], f)
+        self.addCleanup(os.remove, f.name)
+
+        with self.assertRaises(TencentCloudSDKException):
+            TokenPrefetcher.load_requests(f.name, self.cred)
+
+    def test_db_authentication_fills_cache_and_schedules_refresh(self):
+        timer_manager, token_cache = MagicMock(), TokenCache()
+
+        def get_auth_token(signer):
+            return Token(signer.request.instance_id, Utils.get_current_time_millis() + 60 * 1000, 60 * 1000)
+
+        with patch.object(Signer, "timer_manager", timer_manager), patch.object(Signer, "token_cache", token_cache), \
+                patch.object(Signer, "get_auth_token", autospec=True, side_effect=get_auth_token):
+            results = DBAuthentication.prefetch_authentication_tokens(self.requests, max_concurrency=4)
+
+            for token_request in self.requests:
+                self.assertEqual(token_request.instance_id, results[token_request].token)
+                self.assertEqual(token_request.instance_id,
+                                 Signer(token_request).get_auth_token_from_cache().get_auth_token())
+        self.assertEqual(20, timer_manager.save_timer.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
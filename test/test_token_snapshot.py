@@ -0,0 +1,121 @@
+import json
+import os
+import stat
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+from tencentcloud.common import credential
+
+from dbauth.db_authentication import DBAuthentication
+from dbauth.internal.refresh_policy import RefreshPolicy
+from dbauth.internal.signer import Signer
+from dbauth.internal.token import Token
+from dbauth.internal.token_cache import TokenCache
+from dbauth.internal.token_snapshot import TokenSnapshot
+from dbauth.internal.utils import Utils
+from dbauth.model.generate_authentication_token_request import GenerateAuthenticationTokenRequest
+from test.signer_test_case import SignerTestCase
+
+
+class TestTokenSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.path = os.path.join(self.directory, "tokens.json")
+        self.signer = self.make_signer("secretKey")
+
+    @staticmethod
+    def make_signer(secret_key):
+        return Signer(GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                         credential.Credential("secretId", secret_key)))
+
+    def write(self, token):
+        snapshot = TokenSnapshot(self.path)
+        snapshot.record(self.signer, token)
+        snapshot.write()
+
+    def test_restores_token_once(self):
+        self.write(Token("password", Utils.get_current_time_millis() + 60 * 1000, 120 * 1000))
+        snapshot = TokenSnapshot(self.path)
+        self.assertEqual(1, snapshot.load())
+
+        token = snapshot.restore(self.signer)
+        self.assertEqual("password", token.get_auth_token())
+        self.assertEqual(120 * 1000, token.get_lifetime())
+        self.assertAlmostEqual(Utils.get_current_time_millis() + 60 * 1000, token.get_expires(), delta=1000)
+        self.assertIsNone(snapshot.restore(self.signer))
+
+    def test_file_is_encrypted_and_private(self):
+        self.write(Token("password", Utils.get_current_time_millis() + 60 * 1000, 120 * 1000))
+        with open(self.path) as snapshot:
+            self.assertNotIn("password", snapshot.read())
+        self.assertEqual(0o600, stat.S_IMODE(os.stat(self.path).st_mode))
+        self.assertEqual(["tokens.json"], os.listdir(self.directory))
+
+    def test_other_credential_cannot_restore(self):
+        self.write(Token("password", Utils.get_current_time_millis() + 60 * 1000, 120 * 1000))
+        snapshot = TokenSnapshot(self.path)
+        snapshot.load()
+        self.assertIsNone(snapshot.restore(self.make_signer("rotatedSecretKey")))
+
+    def test_skips_expired_tokens(self):
+        self.write(Token("password", Utils.get_current_time_millis() - 1, 120 * 1000))
+        self.assertEqual(0, TokenSnapshot(self.path).load())
+
+    def test_discarded_tokens_are_not_written(self):
+        snapshot = TokenSnapshot(self.path)
+        snapshot.record(self.signer, Token("password", Utils.get_current_time_millis() + 60 * 1000, 120 * 1000))
+        snapshot.discard(self.signer.authKey)
+        snapshot.write()
+        with open(self.path) as data:
+            self.assertEqual({}, json.load(data)["tokens"])
+
+    def test_ignores_corrupt_file(self):
+        with open(self.path, "w") as snapshot:
+            snapshot.write("{")
+        self.assertEqual(0, TokenSnapshot(self.path).load())
+
+    def test_rejects_a_write_delay_the_timers_cannot_schedule(self):
+        for write_delay in [0, -1]:
+            with self.assertRaises(ValueError):
+                TokenSnapshot(self.path, write_delay=write_delay)
+
+
+class TestDBAuthenticationTokenSnapshot(SignerTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "tokens.json")
+        self.timer_manager = MagicMock()
+        self.isolate_signer(timer_manager=self.timer_manager, refresh_policy=RefreshPolicy(jitter_fraction=0))
+        self.request = GenerateAuthenticationTokenRequest("ap-guangzhou", "cdb-123456", "camtest",
+                                                          credential.Credential("secretId", "secretKey"))
+
+    def test_restarted_process_serves_snapshot_and_schedules_refresh(self):
+        DBAuthentication.enable_token_snapshot(self.path)
+        token = Token("password", Utils.get_current_time_millis() + 15 * 60 * 1000, 20 * 60 * 1000)
+        with patch.object(Signer, "get_auth_token", autospec=True, return_value=token):
+            self.assertEqual("password", DBAuthentication.generate_authentication_token(self.request))
+        self.timer_manager.save_timer.assert_any_call(TokenSnapshot.TIMER_KEY, TokenSnapshot.DEFAULT_WRITE_DELAY,
+                                                      Signer.token_snapshot.write)
+        DBAuthentication.disable_token_snapshot()
+
+        # A new process
+        Signer.token_cache = TokenCache()
+        self.timer_manager.reset_mock()
+        self.assertEqual(1, DBAuthentication.enable_token_snapshot(self.path))
+        with patch.object(Signer, "get_auth_token", autospec=True) as mock_get:
+            self.assertEqual("password", DBAuthentication.generate_authentication_token(self.request))
+        mock_get.assert_not_called()
+        delays = {call[0][0]: call[0][1] for call in self.timer_manager.save_timer.call_args_list}
+        # The token is a quarter of its lifetime old, it is refreshed at half of its lifetime
+        self.assertAlmostEqual(5 * 60 * 1000, delays[self.request.get_auth_key()], delta=1000)
+        DBAuthentication.disable_token_snapshot()
+
+
+if __name__ == '__main__':
+    unittest.main()